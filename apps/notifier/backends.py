@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+
+from utils.generals import get_model
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Write email to outbox table in current transaction,
+    real delivery by `deliver_mail_outbox` with MAIL_OUTBOX_DELIVERY_BACKEND
+    """
+
+    def send_messages(self, email_messages):
+        from .tasks import deliver_mail_outbox
+
+        MailOutbox = get_model('notifier', 'MailOutbox')
+        mails = [MailOutbox.from_message(message) for message in email_messages
+                 if message.recipients()]
+
+        if not mails:
+            return 0
+
+        MailOutbox.objects.bulk_create(mails)
+
+        if settings.DEBUG:
+            transaction.on_commit(lambda: deliver_mail_outbox())  # without celery
+        else:
+            transaction.on_commit(lambda: deliver_mail_outbox.delay())  # with celery
+        return len(mails)
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+
+import redis
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from apps.notifier import settings as notifier_settings
+from apps.notifier.presence import group_name, heartbeat, leave
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceConsumerMixin:
+    """
+    Mark user online while connected and receive event routed by
+    `apps.notifier.delivery` as {"type": "notification", "event": {...}}.
+    Call presence_join after accept and presence_leave on disconnect.
+    """
+
+    async def presence_join(self):
+        self.presence_user_id = self.scope['user'].id
+        await self.channel_layer.group_add(group_name(self.presence_user_id), self.channel_name)
+        self._presence_stop = asyncio.Event()
+        self._heartbeat = asyncio.ensure_future(self.presence_heartbeat())
+
+    async def presence_leave(self):
+        user_id = getattr(self, 'presence_user_id', None)
+        if user_id is None:
+            return
+
+        # cancel not stop heartbeat already running in thread, let it
+        # finish so user never marked online again after leave
+        self._presence_stop.set()
+        await self._heartbeat
+
+        await self.channel_layer.group_discard(group_name(user_id), self.channel_name)
+        try:
+            await sync_to_async(leave, thread_sensitive=False)(user_id, self.channel_name)
+        except redis.RedisError as e:
+            logger.error('Presence not removed: %s', e)
+
+    async def presence_heartbeat(self):
+        while not self._presence_stop.is_set():
+            try:
+                await sync_to_async(heartbeat, thread_sensitive=False)(
+                    self.presence_user_id, self.channel_name)
+            except redis.RedisError as e:
+                # user treated offline, still get push
+                logger.error('Presence not refreshed: %s', e)
+
+            try:
+                await asyncio.wait_for(self._presence_stop.wait(),
+                                       notifier_settings.PRESENCE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def notification_event(self, event):
+        await self.send_json({'type': 'notification', 'event': event['event']})
+
+
+class NotificationConsumer(PresenceConsumerMixin, AsyncJsonWebsocketConsumer):
+    """
+    In-app notification of user, ws/notifier/notifications/
+
+    Receive;
+    --------
+        {"type": "notification", "event": {...}}
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        await self.accept()
+        await self.presence_join()
+
+    async def disconnect(self, code):
+        await self.presence_leave()
+
+    async def receive_json(self, content, **kwargs):
+        await self.send_json({'type': 'error', 'detail': "Unknown type"})
@@ -0,0 +1,76 @@
+"""
+Presence aware delivery
+
+    deliver(user_ids, {'verb': ..., 'data': ...}, push=send_push)
+
+Online user get the event over channel layer to every websocket
+connection of it, the fan out published through outbox so request
+never wait on channel layer. Only offline user passed to `push` (FCM).
+Count of both kept in `notifier:delivery:stats`.
+"""
+import asyncio
+import logging
+
+import redis
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from utils.cache import get_redis_connection
+from apps.notifier.outbox import publish
+from apps.notifier.presence import get_online, group_name
+from apps.notifier.tasks import send_online_event
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_STATS_KEY = 'notifier:delivery:stats'
+
+
+def send_online(user_ids, event):
+    channel_layer = get_channel_layer()
+
+    async def send():
+        await asyncio.gather(*[
+            channel_layer.group_send(group_name(user_id), {
+                'type': 'notification.event',
+                'event': event,
+            }) for user_id in user_ids
+        ])
+
+    try:
+        async_to_sync(send)()
+    except Exception as e:
+        # in-app event only a hint, notification still in inbox
+        logger.error('Websocket delivery failed: %s', e)
+
+
+def deliver(user_ids, event, push=None):
+    """
+    Route event to websocket for online user after commit by worker,
+    `push(offline_user_ids)` called for the rest.
+    Return (online user ids, offline user ids)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    online = get_online(user_ids) if get_channel_layer() is not None else set()
+    offline = [user_id for user_id in user_ids if user_id not in online]
+    online = [user_id for user_id in user_ids if user_id in online]
+
+    if online:
+        publish(send_online_event, user_ids=online, event=event)
+
+    if offline and push is not None:
+        push(offline)
+
+    record_stats(len(online), len(offline))
+    return online, offline
+
+
+def record_stats(online, offline):
+    """HGETALL notifier:delivery:stats"""
+    try:
+        pipe = get_redis_connection().pipeline(transaction=False)
+        pipe.hincrby(DELIVERY_STATS_KEY, 'websocket', online)
+        pipe.hincrby(DELIVERY_STATS_KEY, 'push', offline)
+        pipe.execute()
+    except redis.RedisError:
+        pass
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utils.generals import get_model
+from apps.notifier import settings as notifier_settings
+from apps.notifier.outbox import relay
+
+
+class Command(BaseCommand):
+    help = "Publish outbox event to celery broker, run forever unless --once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=notifier_settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--interval', type=float,
+                            default=notifier_settings.OUTBOX_RELAY_INTERVAL)
+        parser.add_argument('--once', action='store_true',
+                            help="Drain backlog then exit")
+        parser.add_argument('--stats', action='store_true',
+                            help="Only print backlog and lag")
+
+    def handle(self, *args, **options):
+        Outbox = get_model('notifier', 'Outbox')
+
+        if options['stats']:
+            self.stdout.write("Unpublished %s, failed %s, lag %.1f seconds." % (
+                Outbox.objects.unpublished().count(),
+                Outbox.objects.filter(is_failed=True).count(),
+                Outbox.objects.lag()
+            ))
+            return
+
+        batch_size = options['batch_size']
+        while True:
+            published = relay(batch_size)
+
+            # full batch mean backlog left, continue without sleep
+            if published < batch_size:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
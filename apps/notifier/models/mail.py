@@ -0,0 +1,120 @@
+import base64
+
+from email.mime.base import MIMEBase
+
+from django.db import models
+from django.core.mail import EmailMultiAlternatives
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .abstract import AbstractCommonField
+
+
+class MailOutboxQuerySet(models.query.QuerySet):
+    def deliverable(self):
+        return self.filter(status=self.model.Status.PENDING,
+                           next_attempt_at__lte=timezone.now())
+
+
+class AbstractMailOutbox(AbstractCommonField):
+    """
+    Email written in same transaction as the event,
+    delivered later by `deliver_mail_outbox` task
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', _("Pending")
+        SENT = 'sent', _("Sent")
+        FAILED = 'failed', _("Failed")
+
+    subject = models.TextField()
+    body = models.TextField(blank=True)
+    html = models.TextField(null=True, blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+
+    # [{"filename": "", "content": "base64", "mimetype": ""}]
+    attachments = models.JSONField(default=list, blank=True)
+
+    status = models.CharField(choices=Status.choices, default=Status.PENDING,
+                              max_length=15)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = MailOutboxQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+        app_label = 'notifier'
+        ordering = ['create_at']
+        verbose_name = _("Mail Outbox")
+        verbose_name_plural = _("Mail Outboxes")
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return self.subject
+
+    @classmethod
+    def from_message(cls, message):
+        html = next((content for content, mimetype in getattr(message, 'alternatives', [])
+                     if mimetype == 'text/html'), None)
+
+        return cls(
+            subject=message.subject,
+            body=message.body,
+            html=html,
+            from_email=message.from_email,
+            to=list(message.to),
+            cc=list(message.cc),
+            bcc=list(message.bcc),
+            reply_to=list(message.reply_to),
+            headers=message.extra_headers,
+            attachments=[cls.serialize_attachment(attachment)
+                         for attachment in message.attachments],
+        )
+
+    @staticmethod
+    def serialize_attachment(attachment):
+        if isinstance(attachment, MIMEBase):
+            filename = attachment.get_filename()
+            content = attachment.get_payload(decode=True)
+            mimetype = attachment.get_content_type()
+        else:
+            filename, content, mimetype = attachment
+
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+
+        return {
+            'filename': filename,
+            'content': base64.b64encode(content or b'').decode('ascii'),
+            'mimetype': mimetype,
+        }
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.to,
+            cc=self.cc,
+            bcc=self.bcc,
+            reply_to=self.reply_to,
+            headers=self.headers,
+            connection=connection
+        )
+
+        if self.html:
+            message.attach_alternative(self.html, 'text/html')
+
+        for attachment in self.attachments:
+            message.attach(attachment['filename'], base64.b64decode(attachment['content']),
+                           attachment['mimetype'])
+        return message
@@ -1,4 +1,6 @@
 from .notification import *
+from .mail import *
+from .outbox import *
 
 from utils.generals import is_model_registered
 
@@ -12,3 +14,21 @@ if not is_model_registered('notifier', 'Notification'):
             pass
 
     __all__.append('Notification')
+
+
+# 2
+if not is_model_registered('notifier', 'MailOutbox'):
+    class MailOutbox(AbstractMailOutbox):
+        class Meta(AbstractMailOutbox.Meta):
+            pass
+
+    __all__.append('MailOutbox')
+
+
+# 3
+if not is_model_registered('notifier', 'Outbox'):
+    class Outbox(AbstractOutbox):
+        class Meta(AbstractOutbox.Meta):
+            pass
+
+    __all__.append('Outbox')
@@ -127,17 +127,18 @@ class NotificationQuerySet(models.query.QuerySet):
         return qset.update(emailed=True)
 
     def mark_as_read(self, recipient=None, actor_object_id=None, target_object_id=None, action_object_id=None):
-        qset = self.unread(True)
-
-        if recipient and actor_object_id and target_object_id:
-            qset = qset.filter(recipient=recipient,
-                               actor_object_id=actor_object_id,
-                               target_object_id=target_object_id)
-
-            if action_object_id:
-                qset = qset.filter(action_object_object_id=action_object_id)
+        """Each given filter applied, refuse without any so whole table not updated"""
+        filters = {
+            'recipient': recipient,
+            'actor_object_id': actor_object_id,
+            'target_object_id': target_object_id,
+            'action_object_object_id': action_object_id,
+        }
+        filters = {key: value for key, value in filters.items() if value is not None}
+        if not filters:
+            raise ValueError("mark_as_read need at least one filter")
 
-        return qset.update(unread=False)
+        return self.unread(True).filter(**filters).update(unread=False)
 
 
 class AbstractNotification(AbstractCommonField):
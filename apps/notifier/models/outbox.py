@@ -0,0 +1,51 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .abstract import AbstractCommonField
+
+
+class OutboxQuerySet(models.query.QuerySet):
+    def unpublished(self):
+        return self.filter(published_at__isnull=True, is_failed=False)
+
+    def lag(self):
+        """Seconds oldest unpublished event waiting, 0 if none"""
+        oldest = self.unpublished().order_by('id') \
+            .values_list('create_at', flat=True).first()
+
+        if oldest is None:
+            return 0
+        return max((timezone.now() - oldest).total_seconds(), 0)
+
+
+class AbstractOutbox(AbstractCommonField):
+    """
+    Celery task written in same transaction as the event,
+    published later by relay. Outbox uuid used as celery task_id
+    so worker can run each event exactly once.
+    """
+    task = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    is_failed = models.BooleanField(default=False)
+    published_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = OutboxQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+        app_label = 'notifier'
+        ordering = ['create_at']
+        verbose_name = _("Outbox")
+        verbose_name_plural = _("Outboxes")
+        indexes = [
+            models.Index(fields=['published_at', 'is_failed', 'id']),
+        ]
+
+    def __str__(self):
+        return self.task
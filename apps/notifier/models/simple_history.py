@@ -3,9 +3,10 @@ import uuid
 from django.db import models
 from simple_history import register
 from utils.generals import get_model
+from utils.history import BufferedHistoricalRecords
 
 Notification = get_model('notifier', 'Notification')
 
 
-register(Notification, app=__package__,
+register(Notification, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
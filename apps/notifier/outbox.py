@@ -0,0 +1,133 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+import redis
+from celery import Task
+
+from utils.cache import get_redis_connection
+from utils.generals import get_model
+from apps.notifier import settings as notifier_settings
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_STATS_KEY = 'notifier:outbox:stats'
+
+
+def publish(task, **kwargs):
+    """
+    Append celery task to outbox in current transaction,
+    nothing sent to broker until relay pick it up
+    """
+    Outbox = get_model('notifier', 'Outbox')
+    event = Outbox.objects.create(task=task.name, kwargs=kwargs)
+
+    if settings.DEBUG:
+        transaction.on_commit(lambda: relay())  # without relay process
+    return event
+
+
+class OutboxTask(Task):
+    """
+    Base for task published from outbox. Event claimed in same
+    transaction as task work, so redelivered event run only once.
+    """
+
+    def __call__(self, *args, **kwargs):
+        Outbox = get_model('notifier', 'Outbox')
+        event_id = self.request.id
+
+        if not event_id:
+            return super().__call__(*args, **kwargs)
+
+        with transaction.atomic():
+            now = timezone.now()
+            claimed = Outbox.objects \
+                .filter(uuid=event_id, processed_at__isnull=True) \
+                .update(processed_at=now, update_at=now)
+
+            if not claimed and Outbox.objects.filter(uuid=event_id).exists():
+                logger.info('Outbox %s already processed, skipped', event_id)
+                return None
+            return super().__call__(*args, **kwargs)
+
+
+def dispatch(event):
+    task = import_string(event.task)
+    task_id = str(event.uuid)
+
+    if settings.DEBUG:
+        result = task.apply(kwargs=event.kwargs, task_id=task_id)
+        if result.failed():
+            raise result.result
+    else:
+        task.apply_async(kwargs=event.kwargs, task_id=task_id)
+
+
+def relay(batch_size=None):
+    """
+    Publish one batch of outbox event, locked rows skipped
+    so many relay can run together. Return published count.
+    """
+    Outbox = get_model('notifier', 'Outbox')
+    batch_size = batch_size or notifier_settings.OUTBOX_BATCH_SIZE
+    published = 0
+
+    with transaction.atomic():
+        events = list(
+            Outbox.objects
+            .select_for_update(skip_locked=True)
+            .unpublished()
+            .order_by('id')[:batch_size]
+        )
+
+        now = timezone.now()
+        for event in events:
+            # bulk_update not apply auto_now
+            event.update_at = now
+            event.attempts += 1
+
+            try:
+                dispatch(event)
+            except Exception as e:
+                # broker down, keep event for next run
+                event.last_error = '%s: %s' % (e.__class__.__name__, e)
+                event.is_failed = event.attempts >= notifier_settings.OUTBOX_MAX_ATTEMPTS
+                logger.error('Outbox %s publish failed: %s' % (event.uuid, event.last_error))
+            else:
+                event.published_at = timezone.now()
+                event.last_error = None
+                published += 1
+
+        if events:
+            Outbox.objects.bulk_update(
+                events,
+                ['attempts', 'last_error', 'is_failed', 'published_at', 'update_at']
+            )
+
+    record_stats(published)
+    return published
+
+
+def record_stats(published):
+    """Keep outbox lag, ie: HGETALL notifier:outbox:stats"""
+    Outbox = get_model('notifier', 'Outbox')
+    lag = Outbox.objects.lag()
+
+    if lag > notifier_settings.OUTBOX_LAG_WARNING:
+        logger.warning('Outbox lag %.1f seconds', lag)
+
+    try:
+        pipe = get_redis_connection().pipeline(transaction=False)
+        pipe.hset(OUTBOX_STATS_KEY, mapping={
+            'lag': lag,
+            'relay_at': timezone.now().timestamp(),
+        })
+        pipe.hincrby(OUTBOX_STATS_KEY, 'published', published)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+    return lag
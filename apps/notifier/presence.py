@@ -0,0 +1,90 @@
+"""
+Online presence of user
+
+Sorted set `notifier:presence` hold user_id scored by the time its
+presence expire, `notifier:presence:<user_id>` hold each websocket
+connection of the user the same way. Consumer refresh both every
+PRESENCE_HEARTBEAT_INTERVAL, crashed worker simply stop refreshing
+and its user become offline after PRESENCE_TIMEOUT.
+"""
+import time
+import logging
+
+import redis
+
+from utils.cache import get_redis_connection
+from apps.notifier import settings as notifier_settings
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_KEY = 'notifier:presence'
+
+
+def connection_key(user_id):
+    return 'notifier:presence:%s' % user_id
+
+
+def group_name(user_id):
+    """Channel layer group of every connection of user"""
+    return 'user_%s' % user_id
+
+
+def heartbeat(user_id, channel_name):
+    """Mark connection alive, called on connect and every interval"""
+    now = time.time()
+    expire_at = now + notifier_settings.PRESENCE_TIMEOUT
+    key = connection_key(user_id)
+
+    pipe = get_redis_connection().pipeline(transaction=True)
+    pipe.zadd(key, {channel_name: expire_at})
+    pipe.zremrangebyscore(key, '-inf', now)
+    pipe.expire(key, notifier_settings.PRESENCE_TIMEOUT)
+    pipe.zadd(PRESENCE_KEY, {user_id: expire_at})
+    pipe.zremrangebyscore(PRESENCE_KEY, '-inf', now)
+    pipe.execute()
+
+
+def leave(user_id, channel_name):
+    """Remove connection, user offline when it was the last one"""
+    key = connection_key(user_id)
+
+    with get_redis_connection().pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                now = time.time()
+                others = [name for name in pipe.zrangebyscore(key, '(%s' % now, '+inf')
+                          if name != channel_name]
+
+                pipe.multi()
+                pipe.zrem(key, channel_name)
+                if not others:
+                    pipe.delete(key)
+                    pipe.zrem(PRESENCE_KEY, user_id)
+                pipe.execute()
+                return
+            except redis.WatchError:
+                continue
+
+
+def get_online(user_ids):
+    """
+    Set of online user among user_ids. Empty when redis not
+    available, so every user treated offline and still get push.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return set()
+
+    try:
+        pipe = get_redis_connection().pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zscore(PRESENCE_KEY, user_id)
+        scores = pipe.execute()
+    except redis.RedisError as e:
+        logger.error('Presence unavailable: %s', e)
+        return set()
+
+    now = time.time()
+    return {user_id for user_id, score in zip(user_ids, scores)
+            if score is not None and score > now}
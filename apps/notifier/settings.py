@@ -1 +1,23 @@
 SOFT_DELETE = False
+
+# mail outbox
+MAIL_OUTBOX_BATCH_SIZE = 50
+MAIL_OUTBOX_MAX_ATTEMPTS = 5
+
+# seconds, multiplied by attempts
+MAIL_OUTBOX_RETRY_DELAY = 60
+
+# celery task outbox
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 10
+
+# seconds, relay process poll interval
+OUTBOX_RELAY_INTERVAL = 1
+
+# seconds, warn when oldest unpublished event older than this
+OUTBOX_LAG_WARNING = 60
+
+# seconds, websocket consumer refresh presence every interval,
+# user offline when not refreshed within timeout
+PRESENCE_HEARTBEAT_INTERVAL = 30
+PRESENCE_TIMEOUT = 90
@@ -1,4 +1,17 @@
+import socket
+import logging
+import smtplib
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
 from celery import shared_task
+
+from utils.generals import get_model
+from apps.notifier import settings as notifier_settings
+from apps.notifier.outbox import OutboxTask
 from .signals import notify
 
 
@@ -10,3 +23,114 @@ def send_notification(context):
         actor,
         **context
     )
+
+
+def is_connection_error(error):
+    # SMTPException is subclass of OSError, check it first
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, socket.error) and not isinstance(error, smtplib.SMTPException)
+
+
+def is_transient_mail_error(error):
+    """4xx reply and lost connection worth to retry, other is permanent"""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return is_connection_error(error)
+
+
+@shared_task
+def deliver_mail_outbox(batch_size=None):
+    """
+    Deliver pending outbox mail over single SMTP connection,
+    locked rows skipped so many worker can run together
+    """
+    MailOutbox = get_model('notifier', 'MailOutbox')
+    batch_size = batch_size or notifier_settings.MAIL_OUTBOX_BATCH_SIZE
+    connection = get_connection(settings.MAIL_OUTBOX_DELIVERY_BACKEND,
+                                fail_silently=False)
+    delivered = 0
+
+    with transaction.atomic():
+        mails = list(
+            MailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .deliverable()
+            .order_by('id')[:batch_size]
+        )
+
+        if not mails:
+            return delivered
+
+        try:
+            connection.open()
+        except (smtplib.SMTPException, socket.error) as e:
+            # server unreachable, whole batch wait next run
+            logging.error('Mail outbox connection failed: %s' % e)
+            return delivered
+
+        try:
+            for mail in mails:
+                mail.attempts += 1
+
+                try:
+                    connection.send_messages([mail.to_message()])
+                except Exception as e:
+                    # any error of this mail, ie: bad address, not the batch
+                    mail.last_error = '%s: %s' % (e.__class__.__name__, e)
+                    logging.error('Mail outbox %s failed: %s' % (mail.uuid, mail.last_error))
+
+                    if (
+                        is_transient_mail_error(e)
+                        and mail.attempts < notifier_settings.MAIL_OUTBOX_MAX_ATTEMPTS
+                    ):
+                        mail.next_attempt_at = timezone.now() + timezone.timedelta(
+                            seconds=notifier_settings.MAIL_OUTBOX_RETRY_DELAY * mail.attempts)
+                    else:
+                        mail.status = MailOutbox.Status.FAILED
+
+                    # reconnect, server may closed the connection
+                    if is_connection_error(e):
+                        connection.close()
+                        connection.open()
+                else:
+                    mail.status = MailOutbox.Status.SENT
+                    mail.sent_at = timezone.now()
+                    mail.last_error = None
+                    delivered += 1
+        except (smtplib.SMTPException, socket.error) as e:
+            # reconnect failed, rest of batch retried next run
+            logging.error('Mail outbox connection lost: %s' % e)
+        finally:
+            connection.close()
+
+            # bulk_update not apply auto_now
+            now = timezone.now()
+            for mail in mails:
+                mail.update_at = now
+
+            MailOutbox.objects.bulk_update(
+                mails,
+                ['status', 'attempts', 'last_error', 'next_attempt_at',
+                 'sent_at', 'update_at']
+            )
+
+    # continue while backlog left
+    if len(mails) == batch_size and not settings.DEBUG:
+        deliver_mail_outbox.delay(batch_size)
+    return delivered
+
+
+@shared_task
+def relay_outbox(batch_size=None):
+    """Fallback relay run by beat, `manage.py relay_outbox` keep lag low"""
+    from .outbox import relay
+    return relay(batch_size)
+
+
+@shared_task(base=OutboxTask)
+def send_online_event(user_ids, event):
+    """Fan out in-app event to websocket of online user, off request path"""
+    from .delivery import send_online
+    send_online(user_ids, event)
+    return len(user_ids)
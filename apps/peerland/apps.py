@@ -1,7 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class PeerlandConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.peerland'
     label = 'peerland'
+
+    def ready(self):
+        Attachment = self.get_model('Attachment')
+
+        from utils.files import release_file_handler, replace_file_handler
+
+        post_delete.connect(release_file_handler, sender=Attachment,
+                            dispatch_uid='attachment_file_delete_signal')
+
+        post_save.connect(replace_file_handler, sender=Attachment,
+                          dispatch_uid='attachment_file_replace_signal')
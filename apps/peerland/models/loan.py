@@ -6,11 +6,13 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey  # noqa
 
+from utils.mixin.generals import TrackedFieldsMixin
+from utils.files import ContentAddressedStorage, fill_file_metadata
 from utils.validators import non_python_keyword, identifier_validator
 from .abstract import AbstractCommonField
 
 
-class AbstractSubmission(AbstractCommonField):
+class AbstractSubmission(TrackedFieldsMixin, AbstractCommonField):
     class Status(models.TextChoices):
         PENDING = 'pending', _("Pending")
         APPROVED = 'approved', _("Approved")
@@ -40,6 +42,8 @@ class AbstractSubmission(AbstractCommonField):
     status = models.CharField(choices=Status.choices,
                               default=Status.PENDING, max_length=15)
 
+    tracked_fields = ('status',)
+
     class Meta:
         abstract = True
         app_label = 'peerland'
@@ -50,19 +54,16 @@ class AbstractSubmission(AbstractCommonField):
         return self.order or str(self.amount)
 
     def save(self, *args, **kwargs):
-        if self.listing:
-            self.listing = self.order.propose.listing
-
-        if not self._state.adding and hasattr(self, '_loaded_values'):
+        if not self._state.adding:
             # check if status is being updated
-            if self._loaded_values['status'] != self.status and self.pk:
+            if self.has_changed('status') and self.pk:
                 self.update_submission_state()
         return super().save(*args, **kwargs)
 
     @transaction.atomic()
     def update_submission_state(self):
         self.states.model.objects \
-            .create(listing_id=self.pk, status=self.status)
+            .create(submission_id=self.pk, status=self.status)
 
 
 class AbstractTerm(AbstractCommonField):
@@ -107,7 +108,7 @@ class AbstractState(AbstractCommonField):
         return self.get_status_display()
 
 
-class AbstractAttachment(AbstractCommonField):
+class AbstractAttachment(TrackedFieldsMixin, AbstractCommonField):
     class Identifier(models.TextChoices):
         VIDEO_IDCARD = 'photo_idcard', _("ID Card")
         VIDEO_SELFIE = 'video_selfie', _("Video Selfie + ID Card")
@@ -117,7 +118,7 @@ class AbstractAttachment(AbstractCommonField):
     submission = models.ForeignKey('peerland.Submission', on_delete=models.CASCADE,
                                    related_name='attachments')
 
-    file = models.FileField(upload_to='submission/%Y/%m/%d')
+    file = models.FileField(upload_to='submission/%Y/%m/%d', storage=ContentAddressedStorage())
     filename = models.CharField(max_length=255, editable=False)
     filepath = models.CharField(max_length=255, editable=False)
     filesize = models.IntegerField(editable=False)
@@ -131,6 +132,9 @@ class AbstractAttachment(AbstractCommonField):
                                   choices=Identifier.choices,
                                   default=Identifier.VIDEO_IDCARD)
 
+    # replaced file released by `utils.files.replace_file_handler`
+    tracked_fields = ('file',)
+
     class Meta:
         abstract = True
         app_label = 'peerland'
@@ -141,8 +145,10 @@ class AbstractAttachment(AbstractCommonField):
         return self.label
 
     def save(self, *args, **kwargs):
+        fill_file_metadata(self)
         if not self.label:
-            base = os.path.basename(self.file.name)
+            # stored name is content digest
+            base = self.filename or os.path.basename(self.file.name)
             self.label = base
         super().save(*args, **kwargs)
 
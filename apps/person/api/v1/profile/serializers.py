@@ -9,12 +9,19 @@ from django.core.files.base import ContentFile
 
 from rest_framework import serializers
 from utils.generals import get_model
+from apps.person.utils.picture import (
+    PICTURE_FIELDS,
+    delete_derivatives,
+    derivative_urls,
+    queue_picture_processing
+)
 
 
 Profile = get_model('person', 'Profile')
 
 
 def handle_upload_profile_picture(instance, file, is_original=False):
+    """Write file only, saved with other fields and processed by worker"""
     if instance and file:
         name, ext = os.path.splitext(file.name)
         username = instance.user.username
@@ -22,10 +29,8 @@ def handle_upload_profile_picture(instance, file, is_original=False):
         if is_original:
             instance.picture_original.save(
                 '%s_original_%s' % (username, ext), file, save=False)
-            instance.save(update_fields=['picture_original'])
         else:
             instance.picture.save('%s%s' % (username, ext), file, save=False)
-            instance.save(update_fields=['picture'])
 
 
 def base64_to_file(picture_base64):
@@ -37,8 +42,9 @@ def base64_to_file(picture_base64):
 
 
 def is_base64(str):
+    # data URI, ie: data:image/png;base64,iVBOR...
     try:
-        base64.b64decode(str)
+        base64.b64decode(str.split(';base64,')[1], validate=True)
         return True
     except Exception as e:
         return False
@@ -49,6 +55,8 @@ class ProfileSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField()
     last_name = serializers.CharField(required=False)
     url = serializers.SerializerMethodField(read_only=True)
+    picture_has_changed = serializers.BooleanField(required=False, write_only=True)
+    picture_has_removed = serializers.BooleanField(required=False, write_only=True)
 
     class Meta:
         model = Profile
@@ -63,9 +71,13 @@ class ProfileSerializer(serializers.ModelSerializer):
     def to_representation(self, value):
         ret = super().to_representation(value)
         ret['gender_display'] = value.get_gender_display()
+        ret['picture_derivatives'] = derivative_urls(value, self.context.get('request'))
         return ret
 
     def to_internal_value(self, data):
+        # multipart QueryDict is immutable
+        data = data.dict() if hasattr(data, 'dict') else dict(data)
+
         # accept File and Base64
         picture = data.get('picture', None)
         picture_original = data.get('picture_original', None)
@@ -102,7 +114,8 @@ class ProfileSerializer(serializers.ModelSerializer):
         picture_original = validated_data.pop('picture_original', None)
         picture_has_changed = validated_data.pop('picture_has_changed', False)
         picture_has_removed = validated_data.pop('picture_has_removed', False)
-        has_picture = validated_data.pop('has_picture', False)
+        has_picture = picture is not None
+        picture_fields = list()
 
         # only execute if update has picture
         if has_picture or picture_has_removed:
@@ -127,7 +140,17 @@ class ProfileSerializer(serializers.ModelSerializer):
                 handle_upload_profile_picture(instance, file)
             else:
                 # delete picture
-                instance.picture.delete(save=True)
+                instance.picture.delete(save=False)
+            picture_fields.append('picture')
+
+            # derivatives of old picture
+            if instance.picture_derivatives:
+                storage = instance.picture.storage
+                derivatives = instance.picture_derivatives
+                transaction.on_commit(lambda: delete_derivatives(storage, derivatives))
+
+                instance.picture_derivatives = dict()
+                picture_fields.append('picture_derivatives')
 
             # original picture
             if picture_original and picture_has_changed:
@@ -135,10 +158,12 @@ class ProfileSerializer(serializers.ModelSerializer):
                 if file is None:
                     file = picture_original
                 handle_upload_profile_picture(instance, file, True)
+                picture_fields.append('picture_original')
 
             if not picture_original and not picture:
                 # delete picture
-                instance.picture_original.delete(save=True)
+                instance.picture_original.delete(save=False)
+                picture_fields.append('picture_original')
 
         # fields define in serializer
         field_from_serializer = []
@@ -174,6 +199,11 @@ class ProfileSerializer(serializers.ModelSerializer):
                     update_fields.append(key)
                     setattr(instance, key, value)
 
+        update_fields.extend(picture_fields)
         if update_fields:
             instance.save(update_fields=update_fields)
+
+        for field in set(picture_fields) & set(PICTURE_FIELDS):
+            if getattr(instance, field):
+                queue_picture_processing(instance, field)
         return instance
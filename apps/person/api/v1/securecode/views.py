@@ -10,6 +10,8 @@ from rest_framework.response import Response
 from rest_framework.exceptions import NotFound
 
 from utils.validators import csrf_protect_drf
+from utils.mixin.viewsets import ThrottleActionMixin
+from utils.throttling import IPRedisThrottle, IdentifierRedisThrottle
 from utils.generals import get_model
 from .serializers import (
     CreateSecureCodeSerializer,
@@ -20,7 +22,7 @@ from .serializers import (
 SecureCode = get_model('person', 'SecureCode')
 
 
-class SecureCodeApiView(viewsets.ViewSet):
+class SecureCodeApiView(ThrottleActionMixin, viewsets.ViewSet):
     """
     POST
     ---------------
@@ -56,6 +58,10 @@ class SecureCodeApiView(viewsets.ViewSet):
     lookup_field = 'passcode'
     lookup_value_regex = '[^/]+'
     permission_classes = (AllowAny,)
+    throttle_scope = 'securecode'
+    throttle_action = {
+        'create': [IPRedisThrottle, IdentifierRedisThrottle],
+    }
 
     def __init__(self, **kwargs):
         self._queryset = self._get_queryset()
@@ -9,7 +9,7 @@ from django.core.exceptions import (
     ValidationError as DjangoValidationError
 )
 from django.views.decorators.cache import never_cache
-from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.contrib.auth import login, logout, get_user_model
 from django.core.validators import validate_email
 
 # THIRD PARTY
@@ -38,11 +38,15 @@ from ..profile.serializers import ProfileSerializer
 
 # GET MODELS FROM GLOBAL UTILS
 from utils.generals import get_model
+from utils import events
 from utils.pagination import build_result_pagination
 from utils.validators import csrf_protect_drf
+from utils.mixin.viewsets import ThrottleActionMixin
+from utils.throttling import IPRedisThrottle, IdentifierRedisThrottle
 
 from apps.person.utils.permissions import IsCurrentUserOrReject
-from apps.person.utils.auth import validate_username
+from apps.person.utils.auth import validate_username, lookup_users
+from apps.person.utils.normalizer import normalize_email, normalize_msisdn
 from apps.person.utils.password import ChangePassword, PasswordRecovery
 
 UserModel = get_user_model()
@@ -53,7 +57,7 @@ SecureCode = get_model('person', 'SecureCode')
 _PAGINATOR = LimitOffsetPagination()
 
 
-class UserApiView(viewsets.ViewSet):
+class UserApiView(ThrottleActionMixin, viewsets.ViewSet):
     """
     POST
     ------------
@@ -88,6 +92,18 @@ class UserApiView(viewsets.ViewSet):
         'retrieve': [IsAuthenticated],
         'partial_update': [IsAuthenticated, IsCurrentUserOrReject],
     }
+    throttle_action = {
+        'check_email': [IPRedisThrottle],
+        'check_msisdn': [IPRedisThrottle],
+        'check_user': [IPRedisThrottle],
+        'check_username': [IPRedisThrottle],
+    }
+    throttle_scope_action = {
+        'check_email': 'existence_check',
+        'check_msisdn': 'existence_check',
+        'check_user': 'existence_check',
+        'check_username': 'existence_check',
+    }
 
     def get_permissions(self):
         """
@@ -174,7 +190,8 @@ class UserApiView(viewsets.ViewSet):
             error_content = None
 
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except ValidationError as e:
                 error_content = e
                 error_code = getattr(e, 'code', None)
@@ -260,7 +277,7 @@ class UserApiView(viewsets.ViewSet):
             raise NotAcceptable(detail=_(" ".join(e.messages)))
 
         try:
-            UserModel.objects.get(email=email, is_email_verified=True)
+            lookup_users(email, fields=('email',), verified=True).get()
             raise NotAcceptable(_("Email `{email}` sudah terdaftar."
                                   " Jika ini milik Anda hubungi kami.".format(email=email)))
         except MultipleObjectsReturned:
@@ -268,12 +285,11 @@ class UserApiView(viewsets.ViewSet):
                                   " dengan email tersebut silahkan hubungi kami.".format(email=email)))
         except ObjectDoesNotExist:
             # Check the email has been used in SecureCode
-            check = SecureCode.objects.filter(
-                email=email, is_used=False, is_expired=False)
+            check = SecureCode.objects.has_active(email=email)
             return Response(
                 {
                     'detail': _("Email tersedia!"),
-                    'is_used_before': check.exists(),  # if True indicate email has used before
+                    'is_used_before': check,  # if True indicate email has used before
                     'email': email
                 },
                 status=response_status.HTTP_200_OK
@@ -301,7 +317,7 @@ class UserApiView(viewsets.ViewSet):
             raise NotFound(_("Masukkan MSISDN"))
 
         try:
-            UserModel.objects.get(msisdn=msisdn, is_msisdn_verified=True)
+            lookup_users(msisdn, fields=('msisdn',), verified=True).get()
             raise NotAcceptable(_("MSISDN `{msisdn}` sudah digunakan."
                                   " Jika ini milik Anda hubungi kami.".format(msisdn=msisdn)))
         except MultipleObjectsReturned:
@@ -309,12 +325,11 @@ class UserApiView(viewsets.ViewSet):
                                   " dengan msisdn tersebut silahkan hubungi kami.".format(msisdn=msisdn)))
         except ObjectDoesNotExist:
             # Check whether the msisdn has been used
-            check = SecureCode.objects.filter(
-                msisdn=msisdn, is_used=False, is_expired=False)
+            check = SecureCode.objects.has_active(msisdn=msisdn)
             return Response(
                 {
                     'detail': _("MSISDN tersedia!"),
-                    'is_used_before': check.exists(),
+                    'is_used_before': check,
                     'msisdn': msisdn
                 },
                 status=response_status.HTTP_200_OK
@@ -343,15 +358,15 @@ class UserApiView(viewsets.ViewSet):
             raise NotFound(_("Masukkan email, nama pengguna atau MSISDN"))
 
         try:
-            user = UserModel.objects.get(Q(username=credential)
-                                         | Q(email=credential) & Q(is_email_verified=True)
-                                         | Q(msisdn=credential) & Q(is_msisdn_verified=True))
+            user = lookup_users(credential, verified=True).get()
+            is_email = user.normalized_email == normalize_email(credential)
+            is_msisdn = user.normalized_msisdn == normalize_msisdn(credential)
 
             return Response(
                 {
                     'detail': _("Akun ditemukan"),
-                    'email': user.email if user.email == credential else None,
-                    'msisdn': user.msisdn if user.msisdn == credential else None
+                    'email': user.email if is_email else None,
+                    'msisdn': user.msisdn if is_msisdn else None
                 },
                 status=response_status.HTTP_200_OK
             )
@@ -395,7 +410,7 @@ class UserApiView(viewsets.ViewSet):
         except ValidationError as e:
             raise NotAcceptable(detail=_(" ".join(e.messages)))
 
-        if UserModel.objects.filter(username=username).exists():
+        if lookup_users(username, fields=('username',)).exists():
             raise NotAcceptable(detail=_("Nama pengguna `{username}` "
                                          "sudah digunakan.".format(username=username)))
         return Response({'detail': _("Nama pengguna tersedia!")},
@@ -578,6 +593,8 @@ class TokenObtainPairSerializerExtend(TokenObtainPairSerializer):
 
 class TokenObtainPairViewExtend(TokenObtainPairView):
     serializer_class = TokenObtainPairSerializerExtend
+    throttle_classes = (IPRedisThrottle, IdentifierRedisThrottle,)
+    throttle_scope = 'token'
 
     @method_decorator(never_cache)
     @transaction.atomic
@@ -596,11 +613,6 @@ class TokenObtainPairViewExtend(TokenObtainPairView):
             'rest_framework.authentication.SessionAuthentication'
             in settings.REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES']
         ):
-            username = request.data.get('username')
-            password = request.data.get('password')
-
-            user = authenticate(request=request, username=username,
-                                password=password)
-            if user:
-                login(request, user)
+            # user already authenticated by serializer
+            login(request, serializer.user)
         return Response(serializer.validated_data, status=response_status.HTTP_200_OK)
@@ -6,6 +6,7 @@ from django.contrib.auth.password_validation import validate_password
 
 from rest_framework import serializers
 from utils.generals import get_model
+from apps.person.utils.auth import lookup_users
 
 UserModel = get_user_model()
 SecureCode = get_model('person', 'SecureCode')
@@ -24,7 +25,7 @@ class EmailDuplicateValidator(object):
     requires_context = True
 
     def __call__(self, value, serializer_field):
-        user = UserModel.objects.filter(email=value, is_email_verified=True)
+        user = lookup_users(value, fields=('email',), verified=True)
         if user.exists():
             raise serializers.ValidationError(
                 _("Email {email} sudah terdaftar.".format(email=value))
@@ -36,7 +37,7 @@ class MsisdnDuplicateValidator(object):
     requires_context = True
 
     def __call__(self, value, serializer_field):
-        user = UserModel.objects.filter(msisdn=value, is_msisdn_verified=True)
+        user = lookup_users(value, fields=('msisdn',), verified=True)
         if user.exists():
             raise serializers.ValidationError(
                 _("Nomor telepon {msisdn} sudah terdaftar".format(msisdn=value)))
@@ -1,5 +1,5 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 
 
 class PersonConfig(AppConfig):
@@ -11,21 +11,40 @@ class PersonConfig(AppConfig):
         from django.conf import settings
         from django.contrib.auth.models import Group
         from .signals import (
-            user_save_handler,
-            group_save_handler,
-            securecode_save_handler
+            user_snapshot_handler,
+            member_snapshot_handler,
+            group_snapshot_handler
         )
+        from utils.events import emit_model_saved
+        from utils.generals import get_model
 
         SecureCode = self.get_model('SecureCode')
+        ListingMember = get_model('procure', 'ListingMember')
 
         # User
-        post_save.connect(user_save_handler, sender=settings.AUTH_USER_MODEL,
+        post_save.connect(emit_model_saved, sender=settings.AUTH_USER_MODEL,
                           dispatch_uid='user_save_signal')
 
         # Secure code
-        post_save.connect(securecode_save_handler, sender=SecureCode,
+        post_save.connect(emit_model_saved, sender=SecureCode,
                           dispatch_uid='securecode_save_signal')
 
         # Group
-        post_save.connect(group_save_handler, sender=Group,
+        post_save.connect(emit_model_saved, sender=Group,
                           dispatch_uid='group_save_signal')
+
+        # User snapshot
+        post_save.connect(user_snapshot_handler, sender=settings.AUTH_USER_MODEL,
+                          dispatch_uid='user_snapshot_save_signal')
+
+        post_delete.connect(user_snapshot_handler, sender=settings.AUTH_USER_MODEL,
+                            dispatch_uid='user_snapshot_delete_signal')
+
+        post_save.connect(member_snapshot_handler, sender=ListingMember,
+                          dispatch_uid='member_snapshot_save_signal')
+
+        post_delete.connect(member_snapshot_handler, sender=ListingMember,
+                            dispatch_uid='member_snapshot_delete_signal')
+
+        post_save.connect(group_snapshot_handler, sender=Group,
+                          dispatch_uid='group_snapshot_save_signal')
@@ -0,0 +1,66 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.person.utils.auth import JWTAuthenticationExtend
+from apps.person.utils.snapshot import invalidate_user_snapshot
+
+UserModel = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Measure JWT user resolution per request, users created by this run rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--rounds', type=int, default=5,
+                            help="Request of each user on warm cache")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # unusable password, nothing hashed
+            users = [
+                UserModel.objects.create_user(
+                    'benchmark_%s' % uuid.uuid4().hex[:12], None,
+                    email='%s@benchmark.local' % uuid.uuid4().hex)
+                for _index in range(options['users'])
+            ]
+
+            try:
+                self.run(users, options['rounds'])
+            finally:
+                for user in users:
+                    invalidate_user_snapshot(user.uuid)
+                transaction.set_rollback(True)
+
+    def measure(self, label, authentication, requests):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for request in requests:
+                authentication.authenticate(request)
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write("%-32s %9.0f auth/s, %.2f queries/auth" % (
+            label, len(requests) / elapsed, len(queries) / len(requests)))
+
+    def run(self, users, rounds):
+        factory = APIRequestFactory()
+        requests = [
+            factory.get('/', HTTP_AUTHORIZATION='Bearer %s' % AccessToken.for_user(user))
+            for user in users
+        ]
+
+        self.measure("simplejwt, user row", JWTAuthentication(), requests * rounds)
+
+        for user in users:
+            invalidate_user_snapshot(user.uuid)
+        self.measure("snapshot, cold cache", JWTAuthenticationExtend(), requests)
+        self.measure("snapshot, warm cache", JWTAuthenticationExtend(), requests * rounds)
@@ -0,0 +1,93 @@
+import time
+import logging
+import uuid
+import base64
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+UserModel = get_user_model()
+PASSWORD = 'Benchmark-%s' % uuid.uuid4().hex
+
+
+class Command(BaseCommand):
+    help = "Measure login throughput of token endpoint and authenticated call, " \
+           "users created by this run rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--calls', type=int, default=10,
+                            help="API call of each user on login-heavy workload")
+
+    def handle(self, *args, **options):
+        # rejected call expected, don't log each one
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        # throttle would reject most of the run
+        rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={})
+
+        with override_settings(REST_FRAMEWORK=rest_framework), transaction.atomic():
+            users = [
+                UserModel.objects.create_user(
+                    'benchmark_%s' % uuid.uuid4().hex[:12], PASSWORD,
+                    email='%s@benchmark.local' % uuid.uuid4().hex)
+                for _index in range(options['users'])
+            ]
+
+            self.run(users, options['calls'])
+            transaction.set_rollback(True)
+
+    def report(self, label, count, elapsed, status=None):
+        self.stdout.write("%-36s %8.1f req/s%s" % (
+            label, count / elapsed, '' if status is None else ', status %s' % status))
+
+    def measure(self, label, users, request):
+        started = time.perf_counter()
+        statuses = set(request(user).status_code for user in users)
+        self.report(label, len(users), time.perf_counter() - started,
+                    ','.join(str(status) for status in sorted(statuses)))
+
+    def run(self, users, calls):
+        client = APIClient()
+        token_url = reverse('person_api:token_obtain_pair')
+        me_url = reverse('person_api:user-me')
+
+        def token(user, password=PASSWORD):
+            return client.post(token_url, {'username': user.username, 'password': password},
+                               format='json')
+
+        def bearer(user):
+            return client.get(me_url, HTTP_AUTHORIZATION='Bearer %s' % access[user.id])
+
+        def basic(user):
+            credentials = base64.b64encode(('%s:%s' % (user.username, PASSWORD)).encode())
+            return client.get(me_url, HTTP_AUTHORIZATION='Basic %s' % credentials.decode())
+
+        access = {user.id: token(user).data['token']['access'] for user in users}
+
+        self.measure("token, valid password", users, token)
+        self.measure("token, wrong password", users, lambda user: token(user, 'wrong'))
+        self.measure("GET users/me/, Bearer", users, bearer)
+        self.measure("GET users/me/, Basic", users, basic)
+
+        # login-heavy: credential checked on every call vs exchanged once
+        started = time.perf_counter()
+        for user in users:
+            for _call in range(calls):
+                token(user)
+        self.report("workload, credential every call", len(users) * calls,
+                    time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for user in users:
+            access[user.id] = token(user).data['token']['access']
+            for _call in range(calls - 1):
+                bearer(user)
+        self.report("workload, token once then Bearer", len(users) * calls,
+                    time.perf_counter() - started)
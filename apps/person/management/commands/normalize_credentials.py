@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count
+
+UserModel = get_user_model()
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Backfill normalized username, email and msisdn then deduplicate verified credential"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report duplicate, nothing changed")
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            self.backfill(options['batch_size'])
+
+        for field in ('email', 'msisdn'):
+            self.deduplicate(field, options['dry_run'])
+
+    def backfill(self, batch_size):
+        fields = list(UserModel.NORMALIZED_FIELDS.values())
+        last_id = 0
+        total = 0
+
+        while True:
+            users = list(
+                UserModel.objects
+                .filter(id__gt=last_id)
+                .only('id', *UserModel.NORMALIZED_FIELDS.keys(), *fields)
+                .order_by('id')[:batch_size]
+            )
+
+            if not users:
+                break
+
+            for user in users:
+                user.normalize_credentials()
+
+            UserModel.objects.bulk_update(users, fields)
+            last_id = users[-1].id
+            total += len(users)
+
+        self.stdout.write("Normalized %s users." % total)
+
+    def deduplicate(self, field, dry_run):
+        """
+        Same credential verified by many user, keep the earliest one
+        and mark the others unverified so they must verify again
+        """
+        normalized_field = UserModel.NORMALIZED_FIELDS[field]
+        verified_field = 'is_%s_verified' % field
+
+        duplicates = UserModel.objects \
+            .filter(**{verified_field: True}) \
+            .exclude(**{normalized_field: ''}) \
+            .values(normalized_field) \
+            .annotate(total=Count('id')) \
+            .filter(total__gt=1) \
+            .values_list(normalized_field, flat=True)
+
+        for value in duplicates.iterator():
+            user_ids = list(
+                UserModel.objects
+                .filter(**{normalized_field: value, verified_field: True})
+                .order_by('date_joined', 'id')
+                .values_list('id', flat=True)
+            )
+
+            self.stdout.write("Duplicate %s %s: keep user %s, unverify %s" % (
+                field, value, user_ids[0], user_ids[1:]))
+
+            if not dry_run:
+                with transaction.atomic():
+                    UserModel.objects \
+                        .filter(id__in=user_ids[1:]) \
+                        .update(**{verified_field: False})
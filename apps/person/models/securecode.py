@@ -8,6 +8,11 @@ from django.core.validators import RegexValidator, ValidationError
 from django.utils import timezone
 from utils.validators import non_python_keyword
 
+from apps.person import settings as person_settings
+from apps.person.utils.securecode import securecode_store, send_securecode
+
+IS_REDIS_STORE = person_settings.SECURECODE_STORE == 'redis'
+
 
 class SecureCodeQuerySet(models.query.QuerySet):
     def _base_query(self, email=None, msisdn=None, token=None,
@@ -20,8 +25,19 @@ class SecureCodeQuerySet(models.query.QuerySet):
                          Q(passcode=passcode))
         return qs
 
+    def _get_stored(self, **kwargs):
+        instance = securecode_store.get(self.model, **kwargs)
+        if instance is None:
+            raise self.model.DoesNotExist()
+        return instance
+
     def verified_unused(self, email=None, msisdn=None, token=None,
                         challenge=None, passcode=None):
+        if IS_REDIS_STORE:
+            return self._get_stored(email=email, msisdn=msisdn, token=token,
+                                    challenge=challenge, passcode=passcode,
+                                    is_verified=True)
+
         qs = self._base_query(
             email,
             msisdn,
@@ -34,6 +50,11 @@ class SecureCodeQuerySet(models.query.QuerySet):
 
     def unverified_unused(self, email=None, msisdn=None, token=None,
                           challenge=None, passcode=None):
+        if IS_REDIS_STORE:
+            return self._get_stored(email=email, msisdn=msisdn, token=token,
+                                    challenge=challenge, passcode=passcode,
+                                    is_verified=False)
+
         qs = self._base_query(
             email,
             msisdn,
@@ -47,10 +68,24 @@ class SecureCodeQuerySet(models.query.QuerySet):
     def generate(self, *args, **kwargs):
         """Generate if valid_until greather than now"""
         data = kwargs.get('data', {})
+        if IS_REDIS_STORE:
+            instance = securecode_store.generate(self.model, data)
+            transaction.on_commit(lambda: send_securecode(instance))
+            return instance, True
+
         obj, created = self.filter(valid_until__gt=timezone.now()) \
             .update_or_create(**data, defaults=data)
         return obj, created
 
+    def has_active(self, email=None, msisdn=None):
+        """Email or msisdn has unused secure code"""
+        if IS_REDIS_STORE:
+            challenges = self.model.ChallengeType.values
+            return securecode_store.has_active(challenges, email=email, msisdn=msisdn)
+
+        obtain = {'email': email} if email else {'msisdn': msisdn}
+        return self.filter(is_used=False, is_expired=False, **obtain).exists()
+
 
 class AbstractSecureCode(models.Model):
     class ChallengeType(models.TextChoices):
@@ -102,11 +137,19 @@ class AbstractSecureCode(models.Model):
 
     objects = SecureCodeQuerySet.as_manager()
 
+    # True if instance kept on redis store
+    is_stored = False
+
     class Meta:
         abstract = True
         app_label = 'person'
         verbose_name = _("Secure Code")
         verbose_name_plural = _("Secure Codes")
+        indexes = [
+            models.Index(fields=['challenge', 'email']),
+            models.Index(fields=['challenge', 'msisdn']),
+            models.Index(fields=['valid_until']),
+        ]
 
     def __str__(self):
         return self.passcode
@@ -125,8 +168,10 @@ class AbstractSecureCode(models.Model):
                 {'is_expired': _("Has expired on %s" % (self.update_at))})
 
         if timezone.now() >= self.valid_until:
-            self.is_expired = True
-            self.save(update_fields=['is_expired'])
+            # stored one expired by redis itself
+            if not self.is_stored:
+                self.is_expired = True
+                self.save(update_fields=['is_expired'])
             raise ValidationError(
                 {'valid_until': _("SecureCode code expired on %s" % (self.valid_until))})
 
@@ -138,17 +183,26 @@ class AbstractSecureCode(models.Model):
             raise ValidationError({'passcode': _("SecureCode Code invalid")})
 
         # all passed and mark as verified!
-        self.is_verified = True
-        self.save(update_fields=['is_verified'])
+        self._mark('is_verified')
 
     def mark_used(self):
-        self.is_used = True
-        self.save(update_fields=['is_used'])
+        self._mark('is_used')
+
+    def _mark(self, field):
+        setattr(self, field, True)
+
+        if self.is_stored:
+            # atomic on redis, concurrent request can't pass twice
+            if not securecode_store.mark(self, field):
+                raise ValidationError({field: _("SecureCode Code invalid")})
+        else:
+            self.save(update_fields=[field])
 
     def generate_passcode(self):
         # Set max validity date
         # Default 2 hours since created
-        self.valid_until = timezone.now() + timezone.timedelta(hours=2)
+        self.valid_until = timezone.now() + timezone.timedelta(
+            seconds=person_settings.SECURECODE_VALIDITY)
         self.valid_until_timestamp = self.valid_until.replace(
             microsecond=0).timestamp()
 
@@ -5,16 +5,17 @@ from django.contrib.auth import get_user_model
 
 from simple_history import register
 from utils.generals import get_model
+from utils.history import BufferedHistoricalRecords
 
 UserModel = get_user_model()
 Profile = get_model('person', 'Profile')
 SecureCode = get_model('person', 'SecureCode')
 
-register(UserModel, app=__package__,
+register(UserModel, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(Profile, app=__package__,
+register(Profile, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(SecureCode, app=__package__,
+register(SecureCode, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
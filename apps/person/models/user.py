@@ -11,6 +11,11 @@ from django.utils.text import slugify
 
 from utils.validators import non_python_keyword, identifier_validator
 from apps.person import settings as person_settings
+from apps.person.utils.normalizer import (
+    normalize_username,
+    normalize_email,
+    normalize_msisdn
+)
 
 VERIFICATION_FIELDS = person_settings.VERIFICATION_FIELDS
 
@@ -49,14 +54,47 @@ class User(AbstractUser):
     is_email_verified = models.BooleanField(default=False, null=True)
     is_msisdn_verified = models.BooleanField(default=False, null=True)
 
+    # normalized shadow for indexed lookup, never edit directly
+    normalized_username = models.CharField(max_length=150, blank=True,
+                                           editable=False, db_index=True)
+    normalized_email = models.CharField(max_length=254, blank=True,
+                                        editable=False, db_index=True)
+    normalized_msisdn = models.CharField(max_length=16, blank=True,
+                                         editable=False, db_index=True)
+
     objects = UserManagerExtend()
 
+    # source field: normalized field
+    NORMALIZED_FIELDS = {
+        'username': 'normalized_username',
+        'email': 'normalized_email',
+        'msisdn': 'normalized_msisdn',
+    }
+
     class Meta(AbstractUser.Meta):
         app_label = 'person'
 
     def clean(self, *args, **kwargs) -> None:
         return super().clean()
 
+    def normalize_credentials(self):
+        self.normalized_username = normalize_username(self.username) or ''
+        self.normalized_email = normalize_email(self.email) or ''
+        self.normalized_msisdn = normalize_msisdn(self.msisdn) or ''
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.normalize_credentials()
+        else:
+            normalized = [v for k, v in self.NORMALIZED_FIELDS.items()
+                          if k in update_fields]
+
+            if normalized:
+                self.normalize_credentials()
+                kwargs['update_fields'] = list(update_fields) + normalized
+        return super().save(*args, **kwargs)
+
     @property
     def name(self):
         full_name = '{}{}'.format(self.first_name, ' ' + self.last_name)
@@ -83,10 +121,25 @@ class User(AbstractUser):
             ret.update({slug: getattr(group, slug, False)})
         return ret
 
+    @property
+    def default_listing_id(self):
+        # already set when user resolved from cached snapshot
+        if not hasattr(self, '_default_listing_id'):
+            self._default_listing_id = self.members \
+                .filter(is_default=True) \
+                .values_list('listing_id', flat=True) \
+                .first()
+        return self._default_listing_id
+
     @property
     def default_listing(self):
+        listing_id = self.default_listing_id
+        if listing_id is None:
+            return None
+
+        listing_model = self.members.model._meta.get_field('listing').related_model
         try:
-            return self.members.get(is_default=True).listing
+            return listing_model.objects.select_related('location').get(id=listing_id)
         except ObjectDoesNotExist:
             return None
 
@@ -124,6 +177,8 @@ class AbstractProfile(models.Model):
                                 null=True, blank=True)
     picture_original = models.ImageField(upload_to=_UPLOAD_TO, max_length=500,
                                          null=True, blank=True)
+    # {size: {format: name}} of `picture`, made by worker
+    picture_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     address = models.TextField(blank=True, null=True)
     latitude = models.FloatField(default=Decimal(0.0), db_index=True)
     longitude = models.FloatField(default=Decimal(0.0), db_index=True)
@@ -4,3 +4,26 @@ EMAIL_FIELD = 'email'
 MSISDN_FIELD = 'msisdn'
 REQUIRED_VERIFICATION = True
 VERIFICATION_FIELDS = ['email', 'msisdn']
+
+# cached user snapshot for stateless authentication, in seconds
+USER_SNAPSHOT_TIMEOUT = 60 * 60
+
+# default region to parse local msisdn, ie: 0812xxx
+MSISDN_REGION = 'ID'
+
+# secure code store, `database` or `redis`
+# on redis each (challenge, email|msisdn) is a key expired by redis itself
+SECURECODE_STORE = 'database'
+SECURECODE_VALIDITY = 60 * 60 * 2
+
+# when store is redis, copy secure code to database asynchronously
+SECURECODE_AUDIT_LOG = True
+
+# expired secure code on database removed after this days
+SECURECODE_RETENTION_DAYS = 7
+
+# profile picture processed by worker, EXIF removed and
+# bigger side limited, square derivative for each size and format
+PROFILE_PICTURE_MAX_DIMENSION = 1024
+PROFILE_PICTURE_SIZES = (64, 128, 256)
+PROFILE_PICTURE_FORMATS = ('webp', 'jpeg')
@@ -1,66 +1,72 @@
-from django.db import transaction, IntegrityError
+from django.db import transaction
 from django.db.models import Q
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from utils import events
 from utils.generals import get_model
 
-from .tasks import send_securecode_email, send_securecode_msisdn
+from .utils.securecode import send_securecode
+from .utils.snapshot import invalidate_user_snapshot, invalidate_user_snapshots
 
 Profile = get_model('person', 'Profile')
+UserModel = get_user_model()
 
 
-@transaction.atomic
-def user_save_handler(sender, instance, created, **kwargs):
-    if created:
-        profile = getattr(instance, 'profile', None)
-        if profile is None:
-            try:
-                Profile.objects.create(user=instance)
-            except IntegrityError:
-                pass
+@events.subscribe('person.user.created')
+def user_created_handler(users):
+    # new user has no Profile yet, existing one skipped by unique user
+    Profile.objects.bulk_create([
+        Profile(user_id=instance.id) for instance in users
+    ], ignore_conflicts=True)
 
-    if not created:
-        # create Profile if not exist
-        if not hasattr(instance, 'profile'):
-            Profile.objects.create(user=instance)
 
+@events.subscribe('auth.group.saved')
+def group_saved_handler(groups):
+    defaults = [instance for instance in groups
+                if getattr(instance, 'is_default', False)]
 
-@transaction.atomic
-def group_save_handler(sender, instance, created, **kwargs):
-    is_default = getattr(instance, 'is_default')
-    if is_default:
-        groups = Group.objects.exclude(id=instance.id)
-        if groups.exists():
-            groups.update(is_default=False)
+    if defaults:
+        # last saved win
+        Group.objects.exclude(id=defaults[-1].id) \
+            .filter(is_default=True) \
+            .update(is_default=False)
 
 
-@transaction.atomic
-def securecode_save_handler(sender, instance, created, **kwargs):
+@events.subscribe('person.securecode.saved')
+def securecode_saved_handler(securecodes):
     # create tasks
     # run only on resend and created
-    if instance.is_used == False and instance.is_verified == False:
-        data = {'passcode': getattr(instance, 'passcode', None)}
-
-        # Send via email
-        if instance.email:
-            data.update({'email': getattr(instance, 'email', None)})
-            # send_securecode_email.delay(data)  # with celery
-            send_securecode_email(data)  # without celery
-
-        # Send via SMS
-        if instance.msisdn:
-            data.update({'msisdn': getattr(instance, 'msisdn', None)})
-            send_securecode_msisdn.delay(data)  # with celery
-            # send_securecode_msisdn(data)  # without celery
-
-        # mark oldest SecureCode as expired
-        obtain = instance.msisdn or instance.email
-        cls = instance.__class__
-        oldest = cls.objects \
-            .filter(
-                Q(challenge=instance.challenge),
-                Q(email=obtain) | Q(msisdn=obtain),
-                Q(is_used=False), Q(is_expired=False)
-            ).exclude(passcode=instance.passcode)
-
-        if oldest.exists():
-            oldest.update(is_expired=True)
+    for instance in securecodes:
+        if instance.is_used == False and instance.is_verified == False:
+            send_securecode(instance)
+
+            # mark oldest SecureCode as expired
+            obtain = instance.msisdn or instance.email
+            cls = instance.__class__
+            cls.objects \
+                .filter(
+                    Q(challenge=instance.challenge),
+                    Q(email=obtain) | Q(msisdn=obtain),
+                    Q(is_used=False), Q(is_expired=False)
+                ).exclude(passcode=instance.passcode) \
+                .update(is_expired=True)
+
+
+def user_snapshot_handler(sender, instance, **kwargs):
+    # drop cached snapshot after data committed
+    user_uuid = instance.uuid
+    transaction.on_commit(lambda: invalidate_user_snapshot(user_uuid))
+
+
+def member_snapshot_handler(sender, instance, **kwargs):
+    # default listing part of user snapshot, only uuid needed for cache key
+    user_uuid = UserModel.objects.filter(id=instance.user_id) \
+        .values_list('uuid', flat=True).first()
+
+    # user deleted too, its own handler drop the snapshot
+    if user_uuid is not None:
+        transaction.on_commit(lambda: invalidate_user_snapshot(user_uuid))
+
+
+def group_snapshot_handler(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_user_snapshots)
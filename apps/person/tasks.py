@@ -2,9 +2,13 @@ import logging
 import smtplib
 
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.core.mail import BadHeaderError, EmailMultiAlternatives
 
+from utils.generals import get_model
+from apps.person import settings as person_settings
+
 # Celery config
 from celery import shared_task
 
@@ -73,3 +77,67 @@ def send_securecode_msisdn(data):
     else:
         logging.warning(
             _("Tried to send email to non-existing SecureCode Code"))
+
+
+@shared_task
+def log_securecode(record):
+    """Write secure code kept on redis to database as audit log"""
+    from apps.person.utils.securecode import securecode_store
+
+    SecureCode = get_model('person', 'SecureCode')
+    instance = securecode_store.to_instance(SecureCode, record)
+
+    # task may run out of order, never roll back state
+    rows = SecureCode.objects.filter(uuid=instance.uuid)
+    if not instance.is_verified:
+        rows = rows.exclude(is_verified=True)
+
+    if not instance.is_used:
+        rows = rows.exclude(is_used=True)
+
+    updated = rows.update(is_verified=instance.is_verified,
+                          is_used=instance.is_used,
+                          update_at=instance.update_at)
+
+    if not updated:
+        # bulk_create not send post_save, passcode not sent twice
+        SecureCode.objects.bulk_create([instance], ignore_conflicts=True)
+
+
+@shared_task
+def purge_expired_securecode(batch_size=1000):
+    """Remove secure code expired more than retention days"""
+    SecureCode = get_model('person', 'SecureCode')
+    limit = timezone.now() - timezone.timedelta(
+        days=person_settings.SECURECODE_RETENTION_DAYS)
+    total = 0
+
+    while True:
+        ids = list(
+            SecureCode.objects
+            .filter(valid_until__lt=limit)
+            .values_list('id', flat=True)[:batch_size]
+        )
+
+        if not ids:
+            break
+
+        SecureCode.objects.filter(id__in=ids).delete()
+        total += len(ids)
+
+    logging.info(_("Purged %s expired secure code" % total))
+    return total
+
+
+@shared_task
+def process_profile_picture(profile_id, field, source):
+    """Strip EXIF and make derivatives of uploaded profile picture"""
+    from apps.person.utils.picture import process_picture
+
+    Profile = get_model('person', 'Profile')
+    profile = Profile.objects.filter(id=profile_id).first()
+
+    # removed or replaced before processed
+    if profile is None or getattr(profile, field).name != source:
+        return False
+    return process_picture(profile, field, source)
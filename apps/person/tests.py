@@ -0,0 +1,333 @@
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import redis
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from utils import events
+from utils.cache import get_redis_connection
+from utils.generals import get_model
+from utils.throttling import THROTTLE_KEY, IPRedisThrottle
+from apps.person.utils.securecode import securecode_store
+from apps.person.utils.snapshot import (
+    build_user_snapshot, get_cached_user, get_user_snapshot, invalidate_user_snapshot)
+
+UserModel = get_user_model()
+
+
+def redis_available():
+    try:
+        return get_redis_connection().ping()
+    except redis.RedisError:
+        return False
+
+
+class RedisTestCase(TestCase):
+    """Run against REDIS_URL, skipped when it not reachable"""
+
+    def setUp(self):
+        if not redis_available():
+            self.skipTest("Redis not available")
+
+
+class SecureCodeStoreTest(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.SecureCode = get_model('person', 'SecureCode')
+        self.email = '%s@example.com' % uuid.uuid4().hex
+        self.challenge = self.SecureCode.ChallengeType.EMAIL_VALIDATION
+
+        key = securecode_store.key(self.challenge, self.email)
+        self.addCleanup(get_redis_connection().delete, key)
+
+    def generate(self):
+        return securecode_store.generate(self.SecureCode, {
+            'email': self.email,
+            'challenge': self.challenge,
+        })
+
+    def test_generate_expire_at_valid_until(self):
+        instance = self.generate()
+        key = securecode_store.key(self.challenge, self.email)
+
+        self.assertGreater(get_redis_connection().ttl(key), 0)
+        self.assertEqual(get_redis_connection().hget(key, 'passcode'), instance.passcode)
+
+    def test_verified_only_once(self):
+        instance = self.generate()
+
+        self.assertTrue(securecode_store.mark(instance, 'is_verified'))
+        # concurrent request with same code lose
+        self.assertFalse(securecode_store.mark(instance, 'is_verified'))
+
+    def test_parallel_verify_pass_once(self):
+        instance = self.generate()
+
+        # audit queued on commit, outside of test transaction in thread
+        with mock.patch.object(securecode_store, 'audit'), \
+                ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _index: securecode_store.mark(instance, 'is_verified'), range(16)))
+        self.assertEqual(results.count(True), 1)
+
+    def test_used_require_verified(self):
+        instance = self.generate()
+        self.assertFalse(securecode_store.mark(instance, 'is_used'))
+
+        self.assertTrue(securecode_store.mark(instance, 'is_verified'))
+        self.assertTrue(securecode_store.mark(instance, 'is_used'))
+        self.assertFalse(securecode_store.mark(instance, 'is_used'))
+
+    def test_replaced_code_not_marked(self):
+        old = self.generate()
+        new = self.generate()
+
+        self.assertFalse(securecode_store.mark(old, 'is_verified'))
+        self.assertTrue(securecode_store.mark(new, 'is_verified'))
+
+    def test_get_match_state(self):
+        instance = self.generate()
+        lookup = {'challenge': self.challenge, 'email': self.email,
+                  'token': instance.token, 'passcode': instance.passcode}
+
+        self.assertIsNotNone(securecode_store.get(self.SecureCode, **lookup))
+        securecode_store.mark(instance, 'is_verified')
+
+        self.assertIsNone(securecode_store.get(self.SecureCode, **lookup))
+        self.assertIsNotNone(securecode_store.get(self.SecureCode, is_verified=True, **lookup))
+
+
+class ThrottleView:
+    throttle_scope = 'test'
+
+
+class LimitedThrottle(IPRedisThrottle):
+    def get_rate(self, scope):
+        return '3/minute'
+
+
+class SlidingWindowThrottleTest(RedisTestCase):
+    # start of a minute window
+    now = 600000 * 60
+
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.ip = '10.%s.%s.%s' % tuple(uuid.uuid4().bytes[:3])
+
+        keys = [THROTTLE_KEY.format('test', 'ip', self.ip, window)
+                for window in range(self.now // 60 - 2, self.now // 60 + 2)]
+        self.addCleanup(get_redis_connection().delete, *keys)
+
+    def allow(self, ip=None, at=None):
+        request = self.factory.get('/', REMOTE_ADDR=ip or self.ip)
+        throttle = LimitedThrottle()
+        with mock.patch('time.time', return_value=self.now if at is None else at):
+            allowed = throttle.allow_request(request, ThrottleView())
+        return allowed, throttle
+
+    def test_reject_over_rate(self):
+        self.assertEqual([self.allow()[0] for _index in range(4)], [True, True, True, False])
+
+    def test_parallel_request_not_over_rate(self):
+        request = self.factory.get('/', REMOTE_ADDR=self.ip)
+
+        with mock.patch('time.time', return_value=self.now), \
+                ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda _index: LimitedThrottle().allow_request(request, ThrottleView()),
+                range(16)))
+        self.assertEqual(results.count(True), 3)
+
+    def test_ident_counted_separately(self):
+        for _index in range(3):
+            self.allow()
+        self.assertFalse(self.allow()[0])
+        self.assertTrue(self.allow(ip='192.0.2.%s' % uuid.uuid4().bytes[0])[0])
+
+    def test_previous_window_count_at_start_of_next(self):
+        for _index in range(3):
+            self.allow(at=self.now - 1)
+        self.assertFalse(self.allow(at=self.now + 1)[0])
+
+    def test_previous_window_weighted_by_elapsed(self):
+        for _index in range(3):
+            self.allow(at=self.now - 1)
+
+        # half way only half of previous count, 1.5 + 1 then 1.5 + 2
+        self.assertTrue(self.allow(at=self.now + 30)[0])
+        self.assertFalse(self.allow(at=self.now + 30)[0])
+
+    def test_wait_until_window_end(self):
+        for _index in range(3):
+            self.allow(at=self.now + 20)
+
+        allowed, throttle = self.allow(at=self.now + 20)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 40)
+
+    def test_allow_when_redis_down(self):
+        with mock.patch('utils.throttling.get_redis_connection',
+                        side_effect=redis.ConnectionError):
+            self.assertEqual([self.allow()[0] for _index in range(5)], [True] * 5)
+
+
+class UserSnapshotTest(TestCase):
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user(
+            'snapshot_%s' % uuid.uuid4().hex[:12], 'secret',
+            email='%s@example.com' % uuid.uuid4().hex)
+        invalidate_user_snapshot(self.user.uuid)
+        self.addCleanup(invalidate_user_snapshot, self.user.uuid)
+
+    def create_member(self, **kwargs):
+        Listing = get_model('procure', 'Listing')
+        ListingMember = get_model('procure', 'ListingMember')
+
+        listing = Listing.objects.create(label='Toko', keyword='semen')
+        return ListingMember.objects.create(user=self.user, listing=listing, **kwargs)
+
+    def test_round_trip(self):
+        member = self.create_member(is_default=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            pass
+
+        with self.assertNumQueries(1):
+            user = get_user_snapshot(self.user.uuid)
+
+        with self.assertNumQueries(0):
+            cached = get_user_snapshot(self.user.uuid)
+            self.assertEqual(cached.pk, self.user.pk)
+            self.assertEqual(cached.username, self.user.username)
+            self.assertTrue(cached.is_active)
+            self.assertEqual(cached.default_listing_id, member.listing_id)
+        self.assertEqual(user.pk, cached.pk)
+
+    def test_database_fallback(self):
+        self.assertIsNone(get_cached_user(self.user.uuid))
+        self.assertEqual(get_user_snapshot(self.user.uuid).pk, self.user.pk)
+        self.assertIsNone(get_user_snapshot(uuid.uuid4()))
+
+    def test_user_save_invalidate(self):
+        get_user_snapshot(self.user.uuid)
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertIsNone(get_cached_user(self.user.uuid))
+        self.assertFalse(get_user_snapshot(self.user.uuid).is_active)
+
+    def test_member_save_invalidate(self):
+        self.assertIsNone(get_user_snapshot(self.user.uuid).default_listing_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            member = self.create_member(is_default=True)
+
+        self.assertIsNone(get_cached_user(self.user.uuid))
+        self.assertEqual(get_user_snapshot(self.user.uuid).default_listing_id,
+                         member.listing_id)
+
+    def test_group_save_invalidate_all(self):
+        get_user_snapshot(self.user.uuid)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.create(name='snapshot-%s' % uuid.uuid4().hex[:8])
+
+        self.assertIsNone(get_cached_user(self.user.uuid))
+
+    def test_fill_racing_invalidate_not_served(self):
+        # request read the row, then change committed before it fill cache
+        with mock.patch('apps.person.utils.snapshot.build_user_snapshot',
+                        side_effect=lambda user_uuid: (
+                            build_user_snapshot(user_uuid),
+                            invalidate_user_snapshot(user_uuid))[0]):
+            self.assertTrue(get_user_snapshot(self.user.uuid).is_active)
+
+        self.assertIsNone(get_cached_user(self.user.uuid))
+
+
+class DomainEventTest(TestCase):
+    event = 'test.group.touched'
+
+    def setUp(self):
+        self.groups = [Group.objects.create(name='event-%s' % index) for index in range(3)]
+        self.calls = []
+        self.subscribe()
+
+    def subscribe(self, select_related=()):
+        events.subscribe(self.event, select_related=select_related)(self.calls.append)
+        self.addCleanup(events._handlers.pop, self.event, None)
+
+    def received(self):
+        return [[instance.pk for instance in call] for call in self.calls]
+
+    def test_dispatch_immediately_outside_block(self):
+        with self.assertNumQueries(0):
+            events.emit(self.event, self.groups[0])
+        self.assertIs(self.calls[0][0], self.groups[0])
+
+    def test_reload_when_related_asked(self):
+        events._handlers.pop(self.event)
+        self.subscribe(select_related=('content_type',))
+        permission = get_model('auth', 'Permission').objects.first()
+
+        with self.assertNumQueries(1):
+            events.emit(self.event, permission)
+        with self.assertNumQueries(0):
+            self.calls[0][0].content_type
+
+    def test_bulk_emit_single_call(self):
+        events.emit(self.event, self.groups)
+        events.emit(self.event, Group.objects.filter(name__startswith='event-'))
+        self.assertEqual(self.received(), [[group.pk for group in self.groups]] * 2)
+
+    def test_deduplicated_by_pk(self):
+        with events.atomic():
+            events.emit(self.event, self.groups[0])
+            events.emit(self.event, self.groups[:2])
+            self.assertEqual(self.calls, [])
+        self.assertEqual(self.received(), [[self.groups[0].pk, self.groups[1].pk]])
+
+    def test_nested_block_hand_events_outward(self):
+        with events.atomic():
+            with events.atomic():
+                events.emit(self.event, self.groups[0])
+            self.assertEqual(self.calls, [])
+            events.emit(self.event, self.groups[1])
+        self.assertEqual(self.received(), [[self.groups[0].pk, self.groups[1].pk]])
+
+    def test_raising_block_drop_its_events(self):
+        with events.atomic():
+            events.emit(self.event, self.groups[0])
+            with self.assertRaises(RuntimeError):
+                with events.atomic():
+                    events.emit(self.event, self.groups[1])
+                    raise RuntimeError
+        self.assertEqual(self.received(), [[self.groups[0].pk]])
+
+    def test_rolled_back_row_not_dispatched(self):
+        with events.atomic():
+            with self.assertRaises(RuntimeError):
+                with events.atomic():
+                    group = Group.objects.create(name='rolled-back')
+                    raise RuntimeError
+            # emitted after the savepoint rolled back
+            events.emit(self.event, [group, self.groups[0]])
+        self.assertEqual(self.received(), [[self.groups[0].pk]])
+
+    def test_user_save_not_query_profile(self):
+        user = UserModel.objects.create_user('event', 'secret', email='event@example.com')
+        self.assertTrue(get_model('person', 'Profile').objects.filter(user=user).exists())
+
+        user.first_name = 'Event'
+        with self.assertNumQueries(1):
+            user.save(update_fields=['first_name'])
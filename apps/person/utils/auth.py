@@ -6,14 +6,49 @@ from django.db.models import Q
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.contrib.auth.forms import _unicode_ci_compare
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.exceptions import ObjectDoesNotExist
 
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .snapshot import get_user_snapshot
+from .normalizer import normalize_username, normalize_email, normalize_msisdn
+
 validate_username = UnicodeUsernameValidator()
 UserModel = get_user_model()
 
 
+def lookup_users(credential, fields=('username', 'email', 'msisdn'), verified=False):
+    """
+    Single entry to find user by credential on normalized indexed columns
+    :fields accepted username, email and msisdn
+    :verified only match email or msisdn has verified
+    """
+    obtain = Q()
+    normalizers = {
+        'username': normalize_username,
+        'email': normalize_email,
+        'msisdn': normalize_msisdn,
+    }
+
+    for field in fields:
+        value = normalizers[field](credential)
+        if not value:
+            continue
+
+        query = Q(**{UserModel.NORMALIZED_FIELDS[field]: value})
+        if verified and field != 'username':
+            query &= Q(**{'is_%s_verified' % field: True})
+        obtain |= query
+
+    if not obtain:
+        return UserModel.objects.none()
+    return UserModel.objects.filter(obtain)
+
+
 class CurrentUserDefault:
     """Return current logged-in user"""
 
@@ -35,32 +70,51 @@ class LoginBackend(ModelBackend):
         if username is None:
             username = kwargs.get(UserModel.USERNAME_FIELD)
 
-        obtain = Q(username__iexact=username) \
-            | Q(email__iexact=username) \
-            | Q(msisdn__iexact=username)
-
         try:
-            # user = UserModel._default_manager.get_by_natural_key(username)
-            # You can customise what the given username is checked against, here I compare to both username and email fields of the User model
-            user = UserModel.objects.filter(obtain)
+            user = lookup_users(username).get()
         except UserModel.DoesNotExist:
-            # Run the default password tokener once to reduce the timing
+            # Run the default password hasher once to reduce the timing
             # difference between an existing and a nonexistent user (#20760).
             UserModel().set_password(password)
+        except UserModel.MultipleObjectsReturned:
+            message = _(
+                "{} has used. "
+                "If this is you, use Forgot Password verify account".format(username))
+            raise ValueError(message)
         else:
-            try:
-                user = user.get(obtain)
-            except UserModel.MultipleObjectsReturned:
-                message = _(
-                    "{} has used. "
-                    "If this is you, use Forgot Password verify account".format(username))
-                raise ValueError(message)
-            except UserModel.DoesNotExist:
-                return None
-
-            if user and user.check_password(password) and self.user_can_authenticate(user):
+            # only hash once, don't fallback to ModelBackend
+            if user.check_password(password) and self.user_can_authenticate(user):
                 return user
-        return super().authenticate(request, username, password, **kwargs)
+        return None
+
+
+class JWTAuthenticationExtend(JWTAuthentication):
+    """
+    Trust signed user_uuid claim and resolve user from cached snapshot,
+    database only hit when snapshot not cached. Basic credentials rejected
+    instead of treated as anonymous, only token endpoint accept password
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is not None and header.split()[:1] == [b'Basic']:
+            raise AuthenticationFailed(_("Basic credentials not accepted, obtain token first"),
+                                       code='basic_not_accepted')
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_uuid = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_user_snapshot(user_uuid)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code='user_inactive')
+        return user
 
 
 class GuestRequiredMixin:
@@ -78,16 +132,7 @@ def get_users_by_email(email):
     that prevent inactive users and users with unusable passwords from
     resetting their password.
     """
-    email_field_name = UserModel.get_email_field_name()
-    users = UserModel._default_manager.filter(**{
-        '%s__iexact' % email_field_name: email,
-        'is_active': True,
-    })
-    return (
-        u for u in users
-        if u.has_usable_password() and
-        _unicode_ci_compare(email, getattr(u, email_field_name))
-    )
+    return get_users_by(field='email', value=email)
 
 
 def get_users_by_username(username):
@@ -96,31 +141,15 @@ def get_users_by_username(username):
     that prevent inactive users and users with unusable passwords from
     resetting their password.
     """
-    username_field_name = 'username'
-    users = UserModel._default_manager.filter(**{
-        '%s__iexact' % username_field_name: username,
-        'is_active': True,
-    })
-    return (
-        u for u in users
-        if u.has_usable_password() and
-        _unicode_ci_compare(username, getattr(u, username_field_name))
-    )
+    return get_users_by(field='username', value=username)
 
 
 def get_users_by(field='email', value=None):
     """
     :field accepted email, msisdn and username, default email
     """
-    users = UserModel._default_manager.filter(**{
-        '%s__iexact' % field: value,
-        'is_active': True,
-    })
-    return (
-        u for u in users
-        if u.has_usable_password() and
-        _unicode_ci_compare(value, getattr(u, field))
-    )
+    users = lookup_users(value, fields=(field,)).filter(is_active=True)
+    return (u for u in users if u.has_usable_password())
 
 
 def clear_securecode_session(request, interact):
@@ -134,15 +163,6 @@ def clear_securecode_session(request, interact):
 
 
 def get_users_by_email_or_msisdn(email_or_msisdn):
-    users = UserModel._default_manager \
-        .filter(Q(msisdn__iexact=email_or_msisdn) | Q(email__iexact=email_or_msisdn),
-                Q(is_active=True))
-
-    return (
-        u for u in users
-        if u.has_usable_password() and
-        (
-            _unicode_ci_compare(email_or_msisdn, getattr(u, 'msisdn'))
-            or _unicode_ci_compare(email_or_msisdn, getattr(u, 'email'))
-        )
-    )
+    users = lookup_users(email_or_msisdn, fields=('email', 'msisdn')) \
+        .filter(is_active=True)
+    return (u for u in users if u.has_usable_password())
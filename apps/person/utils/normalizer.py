@@ -0,0 +1,32 @@
+import phonenumbers
+
+from apps.person import settings as person_settings
+
+MSISDN_REGION = person_settings.MSISDN_REGION
+
+
+def normalize_username(value):
+    if not value:
+        return None
+    return value.strip().lower()
+
+
+def normalize_email(value):
+    if not value or '@' not in value:
+        return None
+    return value.strip().lower()
+
+
+def normalize_msisdn(value):
+    """Return E.164 format, ie: 08123456789 to +628123456789"""
+    if not value:
+        return None
+
+    try:
+        phone = phonenumbers.parse(value.strip(), MSISDN_REGION)
+    except phonenumbers.NumberParseException:
+        return None
+
+    if not phonenumbers.is_possible_number(phone):
+        return None
+    return phonenumbers.format_number(phone, phonenumbers.PhoneNumberFormat.E164)
@@ -0,0 +1,96 @@
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from utils.generals import get_model
+from utils.images import encode, open_image, resize, source_format
+from apps.person import settings as person_settings
+
+PICTURE_FIELDS = ('picture', 'picture_original')
+
+
+def derivative_name(profile, source, size, format):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return '{}/derivatives/{}/{}_{}.{}'.format(profile._UPLOAD_TO, profile.uuid,
+                                               stem, size, format)
+
+
+def delete_derivatives(storage, derivatives):
+    for formats in derivatives.values():
+        for name in formats.values():
+            storage.delete(name)
+
+
+def queue_picture_processing(profile, field):
+    """Process uploaded picture after commit"""
+    from apps.person.tasks import process_profile_picture
+
+    profile_id = profile.id
+    source = getattr(profile, field).name
+
+    if settings.DEBUG:
+        transaction.on_commit(lambda: process_profile_picture(profile_id, field, source))  # without celery
+    else:
+        transaction.on_commit(lambda: process_profile_picture.delay(profile_id, field, source))  # with celery
+
+
+def process_picture(profile, field, source):
+    """
+    Re-encode picture without EXIF and limited size, `picture` also get
+    square derivatives. Saved only if picture not replaced meanwhile
+    """
+    Profile = get_model('person', 'Profile')
+    file = getattr(profile, field)
+    storage = file.storage
+
+    with storage.open(source) as f:
+        image = open_image(f)
+
+    format = source_format(image)
+    values = dict()
+
+    # metadata always dropped, so always written again
+    cleaned = resize(image, person_settings.PROFILE_PICTURE_MAX_DIMENSION)
+    name, _ext = os.path.splitext(source)
+    values[field] = storage.save('%s.%s' % (name, format),
+                                 ContentFile(encode(cleaned, format)))
+
+    if field == 'picture':
+        derivatives = dict()
+        for size in person_settings.PROFILE_PICTURE_SIZES:
+            thumbnail = resize(image, size, crop=True)
+            derivatives[str(size)] = {
+                derivative_format: storage.save(
+                    derivative_name(profile, values[field], size, derivative_format),
+                    ContentFile(encode(thumbnail, derivative_format))
+                )
+                for derivative_format in person_settings.PROFILE_PICTURE_FORMATS
+            }
+        values['picture_derivatives'] = derivatives
+
+    updated = Profile.objects \
+        .filter(id=profile.id, **{field: source}) \
+        .update(**values)
+
+    if updated:
+        storage.delete(source)
+        delete_derivatives(storage, profile.picture_derivatives if field == 'picture' else {})
+    else:
+        # replaced by newer upload, its own task will process it
+        storage.delete(values[field])
+        delete_derivatives(storage, values.get('picture_derivatives', {}))
+    return bool(updated)
+
+
+def derivative_urls(profile, request=None):
+    storage = profile._meta.get_field('picture').storage
+    urls = dict()
+
+    for size, formats in (profile.picture_derivatives or {}).items():
+        urls[size] = dict()
+        for format, name in formats.items():
+            url = storage.url(name)
+            urls[size][format] = request.build_absolute_uri(url) if request else url
+    return urls
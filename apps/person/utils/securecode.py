@@ -0,0 +1,178 @@
+import uuid
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from utils.cache import get_redis_connection
+from apps.person import settings as person_settings
+
+SECURECODE_KEY = 'person:securecode:{}:{}'
+
+# compare-and-set state flag, so concurrent request can't pass twice
+# KEYS[1] securecode key
+# ARGV token, passcode, field must '0', field must '1' (optional), update_at
+MARK_SCRIPT = """
+local code = redis.call('HMGET', KEYS[1], 'token', 'passcode', ARGV[3])
+if code[1] ~= ARGV[1] or code[2] ~= ARGV[2] or code[3] ~= '0' then
+    return 0
+end
+if ARGV[4] ~= '' and redis.call('HGET', KEYS[1], ARGV[4]) ~= '1' then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[3], '1', 'update_at', ARGV[5])
+return 1
+"""
+
+
+def send_securecode(instance):
+    """Send passcode to email or msisdn"""
+    from apps.person.tasks import send_securecode_email, send_securecode_msisdn
+
+    data = {'passcode': getattr(instance, 'passcode', None)}
+
+    # Send via email
+    if instance.email:
+        data.update({'email': getattr(instance, 'email', None)})
+        # only written to mail outbox, delivered by worker
+        send_securecode_email(data)
+
+    # Send via SMS
+    if instance.msisdn:
+        data.update({'msisdn': getattr(instance, 'msisdn', None)})
+        send_securecode_msisdn.delay(data)  # with celery
+        # send_securecode_msisdn(data)  # without celery
+
+
+class SecureCodeStore:
+    """
+    Keep secure code in redis, one key per (challenge, email|msisdn)
+    expired by redis TTL. Newer code replace older one so nothing to expire.
+    """
+    def __init__(self):
+        self._mark_script = None
+
+    @property
+    def connection(self):
+        return get_redis_connection()
+
+    def key(self, challenge, obtain):
+        return SECURECODE_KEY.format(challenge, obtain)
+
+    def to_record(self, instance):
+        return {
+            'uuid': str(instance.uuid),
+            'email': instance.email or '',
+            'msisdn': instance.msisdn or '',
+            'challenge': instance.challenge,
+            'token': instance.token,
+            'passcode': instance.passcode,
+            'valid_until_timestamp': int(instance.valid_until_timestamp),
+            'is_verified': int(bool(instance.is_verified)),
+            'is_used': int(bool(instance.is_used)),
+            'user_agent': instance.user_agent or '',
+            'create_at': instance.create_at.timestamp(),
+            'update_at': instance.update_at.timestamp(),
+        }
+
+    def to_instance(self, model, record):
+        def to_datetime(value):
+            ret = datetime.datetime.fromtimestamp(float(value), tz=datetime.timezone.utc)
+            return ret if settings.USE_TZ else timezone.make_naive(ret)
+
+        instance = model(
+            uuid=uuid.UUID(record['uuid']),
+            email=record['email'] or None,
+            msisdn=record['msisdn'] or None,
+            challenge=record['challenge'],
+            token=record['token'],
+            passcode=record['passcode'],
+            valid_until=to_datetime(record['valid_until_timestamp']),
+            valid_until_timestamp=int(record['valid_until_timestamp']),
+            is_verified=str(record['is_verified']) == '1',
+            is_used=str(record['is_used']) == '1',
+            is_expired=False,
+            user_agent=record['user_agent'] or None,
+        )
+
+        instance.create_at = to_datetime(record['create_at'])
+        instance.update_at = to_datetime(record['update_at'])
+        instance.is_stored = True
+        return instance
+
+    def generate(self, model, data):
+        """Replace existing code atomically, key expired at valid_until"""
+        now = timezone.now()
+        instance = model(**data)
+        instance.generate_passcode()
+        instance.create_at = now
+        instance.update_at = now
+        instance.is_stored = True
+
+        obtain = instance.email or instance.msisdn
+        key = self.key(instance.challenge, obtain)
+        record = self.to_record(instance)
+
+        pipe = self.connection.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping=record)
+        pipe.expireat(key, int(instance.valid_until_timestamp))
+        pipe.execute()
+
+        self.audit(instance)
+        return instance
+
+    def get(self, model, challenge=None, email=None, msisdn=None, token=None,
+            passcode=None, is_verified=False, is_used=False):
+        record = self.connection.hgetall(self.key(challenge, email or msisdn))
+        if not record:
+            return None
+
+        if (
+            record['token'] != token
+            or record['passcode'] != passcode
+            or record['is_verified'] != str(int(is_verified))
+            or record['is_used'] != str(int(is_used))
+        ):
+            return None
+        return self.to_instance(model, record)
+
+    def mark(self, instance, field):
+        """Set is_verified or is_used, return False if other request done it first"""
+        if self._mark_script is None:
+            self._mark_script = self.connection.register_script(MARK_SCRIPT)
+
+        # used code must verified first
+        required = 'is_verified' if field == 'is_used' else ''
+        instance.update_at = timezone.now()
+
+        key = self.key(instance.challenge, instance.email or instance.msisdn)
+        marked = self._mark_script(
+            keys=[key],
+            args=[instance.token, instance.passcode, field, required,
+                  instance.update_at.timestamp()]
+        )
+
+        if marked:
+            self.audit(instance)
+        return bool(marked)
+
+    def has_active(self, challenges, email=None, msisdn=None):
+        obtain = email or msisdn
+        pipe = self.connection.pipeline(transaction=False)
+        for challenge in challenges:
+            pipe.hget(self.key(challenge, obtain), 'is_used')
+        return any(value == '0' for value in pipe.execute())
+
+    def audit(self, instance):
+        if not person_settings.SECURECODE_AUDIT_LOG:
+            return
+
+        from apps.person.tasks import log_securecode
+
+        record = self.to_record(instance)
+        transaction.on_commit(lambda: log_securecode.delay(record))
+
+
+securecode_store = SecureCodeStore()
@@ -0,0 +1,133 @@
+import time
+
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db.models.expressions import OuterRef, Subquery
+
+from utils.generals import get_model
+from apps.person import settings as person_settings
+
+UserModel = get_user_model()
+
+# ordered as model fields, required by Model.from_db
+SNAPSHOT_FIELDS = tuple(
+    field.attname for field in UserModel._meta.concrete_fields
+    if field.attname in (
+        'id', 'uuid', 'username', 'first_name', 'last_name', 'email', 'msisdn',
+        'is_active', 'is_staff', 'is_superuser', 'is_email_verified',
+        'is_msisdn_verified',
+    )
+)
+SNAPSHOT_KEY = 'person:user_snapshot:{}'
+SNAPSHOT_GENERATION_KEY = 'person:user_snapshot:generation:{}'
+SNAPSHOT_VERSION_KEY = 'person:user_snapshot:version'
+SNAPSHOT_TIMEOUT = person_settings.USER_SNAPSHOT_TIMEOUT
+
+
+def _snapshot_key(user_uuid):
+    return SNAPSHOT_KEY.format(user_uuid)
+
+
+def _generation_key(user_uuid):
+    return SNAPSHOT_GENERATION_KEY.format(user_uuid)
+
+
+def _initial_generation():
+    # time based, so lost generation or version never reuse old value
+    return time.time_ns() // 1000
+
+
+def _snapshot_version():
+    version = cache.get(SNAPSHOT_VERSION_KEY)
+    if version is None:
+        cache.add(SNAPSHOT_VERSION_KEY, _initial_generation(), None)
+        version = cache.get(SNAPSHOT_VERSION_KEY)
+    return version
+
+
+def _user_generation(user_uuid):
+    key = _generation_key(user_uuid)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), SNAPSHOT_TIMEOUT)
+        generation = cache.get(key)
+    return generation
+
+
+def build_user_snapshot(user_uuid):
+    """
+    Collect snapshot values in single query,
+    return tuple ordered by SNAPSHOT_FIELDS + default_listing_id
+    """
+    ListingMember = get_model('procure', 'ListingMember')
+    default_listing = ListingMember.objects \
+        .filter(user_id=OuterRef('id'), is_default=True) \
+        .values('listing_id')[:1]
+
+    values = UserModel.objects \
+        .filter(uuid=user_uuid) \
+        .annotate(snapshot_listing_id=Subquery(default_listing)) \
+        .values_list(*SNAPSHOT_FIELDS, 'snapshot_listing_id') \
+        .first()
+
+    return values
+
+
+def user_from_snapshot(values):
+    """
+    Build User instance without hitting database.
+    Field not in snapshot (ie: password) deferred and loaded on access
+    """
+    user = UserModel.from_db('default', SNAPSHOT_FIELDS, values[:-1])
+    user._default_listing_id = values[-1]
+    return user
+
+
+def get_cached_user(user_uuid):
+    """Return user from cache only, None if not cached or outdated"""
+    key = _snapshot_key(user_uuid)
+    generation_key = _generation_key(user_uuid)
+    cached = cache.get_many([key, generation_key, SNAPSHOT_VERSION_KEY])
+    snapshot = cached.get(key)
+
+    if snapshot is None or snapshot[:2] != (cached.get(SNAPSHOT_VERSION_KEY),
+                                            cached.get(generation_key)):
+        return None
+    return user_from_snapshot(snapshot[2])
+
+
+def get_user_snapshot(user_uuid):
+    """
+    Return user from cache, fallback to database.
+    Generation read before database, so snapshot built from row
+    invalidated meanwhile stored but never served
+    """
+    user = get_cached_user(user_uuid)
+    if user is not None:
+        return user
+
+    version = _snapshot_version()
+    generation = _user_generation(user_uuid)
+    values = build_user_snapshot(user_uuid)
+    if values is None:
+        return None
+
+    cache.set(_snapshot_key(user_uuid), (version, generation, values), SNAPSHOT_TIMEOUT)
+    return user_from_snapshot(values)
+
+
+def invalidate_user_snapshot(user_uuid):
+    """Bump user generation, snapshot filled by running request dropped on read"""
+    try:
+        cache.incr(_generation_key(user_uuid))
+    except ValueError:
+        cache.set(_generation_key(user_uuid), _initial_generation(), SNAPSHOT_TIMEOUT)
+    cache.delete(_snapshot_key(user_uuid))
+
+
+def invalidate_user_snapshots():
+    """Invalidate all snapshot at once, ie: when group changed"""
+    try:
+        cache.incr(SNAPSHOT_VERSION_KEY)
+    except ValueError:
+        cache.set(SNAPSHOT_VERSION_KEY, _initial_generation(), None)
@@ -96,6 +96,10 @@ class ListingExtend(admin.ModelAdmin):
     inlines = [ListingOpeningInline, ListingMemberInline,
                ListingLocationInline, ]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.refresh_opening_bitmap()
+
 
 class ListingMemberExtend(admin.ModelAdmin):
     model = ListingMember
@@ -0,0 +1,84 @@
+import os
+
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status as response_status, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.decorators import action
+
+from apps.procure import settings as procure_settings
+from apps.procure.utils.thumbnail import (
+    ThumbnailSpecError,
+    get_attachment,
+    get_thumbnail,
+    is_image,
+    mimetype,
+    parse_spec
+)
+
+
+class AttachmentApiView(viewsets.ViewSet):
+    """
+    GET thumbnail/
+    --------
+        ?size=256           [required] or 256x128, each side in THUMBNAIL_SIZES
+        &type=webp          [optional] webp, jpeg or png
+        &crop=1             [optional] exactly size, otherwise fit inside
+
+    `kind` one of listing, product, inquiry and negotiation,
+    inquiry and negotiation only for inquiry owner or proposing listing member
+    """
+
+    lookup_field = 'uuid'
+    permission_classes = (IsAuthenticated,)
+
+    def _instance(self, kind, uuid):
+        try:
+            instance = get_attachment(kind, uuid, self.request.user.id)
+        except DjangoValidationError as e:
+            raise ValidationError(detail=str(e))
+
+        if instance is None:
+            raise NotFound(detail=_("Not found"))
+        return instance
+
+    @ action(methods=['get'], detail=True, url_path='thumbnail', url_name='thumbnail')
+    def thumbnail(self, request, kind=None, uuid=None, format=None):
+        try:
+            spec = parse_spec(request.query_params.get('size'),
+                              request.query_params.get('type'),
+                              request.query_params.get('crop'))
+        except ThumbnailSpecError as e:
+            raise ValidationError(detail=str(e))
+
+        instance = self._instance(kind, uuid)
+        if not instance.file or not is_image(instance):
+            raise NotFound(detail=_("Thumbnail not available"))
+
+        try:
+            path = get_thumbnail(instance, spec)
+        except FutureTimeoutError:
+            return Response({'detail': _("Thumbnail still generated, try again")},
+                            status=response_status.HTTP_503_SERVICE_UNAVAILABLE)
+        except (OSError, ValueError):
+            # missing or not decodable source
+            raise NotFound(detail=_("Thumbnail not available"))
+
+        # file name is content hash and spec
+        etag = '"%s"' % os.path.basename(path)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=mimetype(spec[2]))
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True,
+                            max_age=procure_settings.THUMBNAIL_MAX_AGE)
+        return response
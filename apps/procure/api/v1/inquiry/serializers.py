@@ -85,6 +85,18 @@ class InquiryListProposeSerializer(serializers.ModelSerializer):
         depth = 1
 
 
+class InquiryLeaderboardSerializer(serializers.ModelSerializer):
+    rank = serializers.IntegerField(read_only=True)
+    newest_offer_cost = serializers.IntegerField(read_only=True)
+    newest_offer_date = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        model = Propose
+        fields = ('uuid', 'create_at', 'listing', 'rank',
+                  'newest_offer_cost', 'newest_offer_date',)
+        depth = 1
+
+
 class InquiryItemSerializer(serializers.ModelSerializer):
     uuid = serializers.UUIDField(required=False)
     is_delete = serializers.BooleanField(write_only=True, required=False)
@@ -143,9 +155,9 @@ class BaseInquirySerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         user = request.user
         user_id = user.id
-        default_listing = user.default_listing
+        default_listing_id = user.default_listing_id
 
-        if not default_listing:
+        if not default_listing_id:
             return None
 
         order = Order.objects.filter(offer_id=OuterRef('id'))
@@ -154,7 +166,7 @@ class BaseInquirySerializer(serializers.ModelSerializer):
             .select_related('propose') \
             .annotate(is_ordered=Exists(order)) \
             .filter(propose__inquiry_id=instance.id,
-                    propose__listing_id=default_listing.id,
+                    propose__listing_id=default_listing_id,
                     is_newest=True) \
             .order_by('-create_at')
 
@@ -8,6 +8,7 @@ from django.db.models import (
 )
 from django.db.models.functions import ACos, Cos, Sin, Radians
 from django.db.models.expressions import OuterRef
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import status as response_status, viewsets
@@ -18,6 +19,7 @@ from rest_framework.exceptions import NotAcceptable, NotFound, ValidationError
 from rest_framework.pagination import LimitOffsetPagination
 
 from utils.generals import get_model
+from utils import events
 from utils.pagination import build_result_pagination
 from .serializers import (
     CreateInquirySerializer,
@@ -25,10 +27,12 @@ from .serializers import (
     ListInquirySerializer,
     RetrieveInquirySerializer,
     InquiryListProposeSerializer,
+    InquiryLeaderboardSerializer,
     RetrieveInquirySkipSerializer
 )
 from ..offer.serializers import ListOfferSerializer
 from apps.procure import settings as procure_settings
+from apps.procure.utils.leaderboard import Leaderboard, hydrate
 
 Inquiry = get_model('procure', 'Inquiry')
 Offer = get_model('procure', 'Offer')
@@ -177,7 +181,8 @@ class InquiryApiView(viewsets.ViewSet):
                                              context=self._context)
         if serializer.is_valid(raise_exception=True):
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except ValidationError as e:
                 return Response(
                     {'detail': _(" ".join(e.messages))},
@@ -196,7 +201,8 @@ class InquiryApiView(viewsets.ViewSet):
                                              data=request.data, context=self._context)
         if serializer.is_valid(raise_exception=True):
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except ValidationError as e:
                 return Response({'detail': _(" ".join(e.messages))}, status=response_status.HTTP_406_NOT_ACCEPTABLE)
 
@@ -232,6 +238,10 @@ class InquiryApiView(viewsets.ViewSet):
                 .filter(order__isnull=False if segment == 'ordered' else True) \
                 .exclude(Q(user_id=request.user.id) | Q(skips__user_id=request.user.id))
 
+            # ordered kept as history, others only still open
+            if segment != 'ordered':
+                instances = instances.filter(is_open=True, close_at__gt=timezone.now())
+
         else:
             instances = self._instances(keyword=keyword) \
                 .filter(user_id=request.user.id)
@@ -346,6 +356,38 @@ class InquiryApiView(viewsets.ViewSet):
         results = build_result_pagination(self, _PAGINATOR, serializer)
         return Response(results, status=response_status.HTTP_200_OK)
 
+    """
+    Ranked proposes from leaderboard
+    """
+
+    @action(methods=['GET'], detail=True, url_name='leaderboard', url_path='leaderboard',
+            permission_classes=(IsAuthenticated,))
+    def leaderboard(self, request, uuid=None, format=None):
+        """
+        Same order as proposes, inquiry creator get all,
+        propose creator only their own with its rank
+        """
+        try:
+            inquiry = Inquiry.objects.get(uuid=uuid)
+        except ObjectDoesNotExist:
+            raise NotFound(detail=_("Not found"))
+        except DjangoValidationError as e:
+            raise ValidationError(detail=str(e))
+
+        board = Leaderboard(inquiry)
+        if inquiry.user_id != request.user.id:
+            propose_ids = Propose.objects \
+                .filter(inquiry_id=inquiry.id, offers__user_id=request.user.id) \
+                .values_list('id', flat=True) \
+                .distinct()
+            board = board.filter(propose_ids)
+
+        paginator = _PAGINATOR.paginate_queryset(board, request)
+        serializer = InquiryLeaderboardSerializer(hydrate(paginator), many=True,
+                                                  context=self._context)
+        results = build_result_pagination(self, _PAGINATOR, serializer)
+        return Response(results, status=response_status.HTTP_200_OK)
+
     """
     Get offers
     """
@@ -359,7 +401,7 @@ class InquiryApiView(viewsets.ViewSet):
         - or offer creator
         """
         user = request.user
-        default_listing = user.default_listing
+        default_listing_id = user.default_listing_id
 
         offers = Offer.objects \
             .prefetch_related('items', 'items__inquiry_item',
@@ -368,7 +410,7 @@ class InquiryApiView(viewsets.ViewSet):
             .annotate(total_item_cost=Sum('items__cost')) \
             .filter(
                 Q(propose__inquiry__uuid=uuid),
-                Q(propose__listing_id=default_listing.id),
+                Q(propose__listing_id=default_listing_id),
                 Q(user_id=user.id) | Q(propose__inquiry__user_id=user.id)
             ) \
             .order_by('-create_at')
@@ -391,7 +433,8 @@ class InquiryApiView(viewsets.ViewSet):
                                                  many=False)
         if serializer.is_valid(raise_exception=True):
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except DjangoValidationError as e:
                 raise ValidationError(detail=str(e))
 
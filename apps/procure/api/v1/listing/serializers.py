@@ -122,6 +122,8 @@ class ListingOpeningListSerializer(serializers.ListSerializer):
             instance.model.objects \
                 .filter(uuid__in=uuids, listing__members__user_id=request.user.id) \
                 .delete()
+
+        listing.refresh_opening_bitmap()
         return ret
 
 
@@ -210,6 +212,18 @@ LISTING...
 """
 
 
+class MemberRoleField(serializers.BooleanField):
+    """Read one role from `member_roles` annotation"""
+
+    def __init__(self, role, **kwargs):
+        self.role = role
+        kwargs.update({'source': 'member_roles', 'read_only': True})
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return bool(value & self.role)
+
+
 class BaseListingSerializer(serializers.ModelSerializer):
     links = serializers.SerializerMethodField()
     location = RetrieveListingLocationSerializer(many=False, read_only=True)
@@ -218,6 +232,7 @@ class BaseListingSerializer(serializers.ModelSerializer):
     openings = RetrieveListingOpeningSerializer(many=True, read_only=True)
     members = RetrieveListingMemberSerializer(many=True, read_only=True)
     distance = serializers.FloatField(required=False, read_only=True)
+    score = serializers.FloatField(required=False, read_only=True)
     notification_count = serializers.IntegerField(read_only=True)
 
     def get_links(self, instance):
@@ -273,15 +288,15 @@ class ListListingSerializer(BaseListingSerializer):
     class Meta:
         model = Listing
         fields = ('uuid', 'links', 'label', 'keyword', 'description', 'create_at',
-                  'location', 'status', 'status_display', 'distance',
+                  'location', 'status', 'status_display', 'distance', 'score',
                   'notification_count',)
         depth = 1
 
 
 class RetrieveListingSerializer(BaseListingSerializer):
-    is_admin = serializers.BooleanField(read_only=True)
-    is_creator = serializers.BooleanField(read_only=True)
-    is_default = serializers.BooleanField(read_only=True)
+    is_admin = MemberRoleField(ListingMember.Role.ADMIN)
+    is_creator = MemberRoleField(ListingMember.Role.CREATOR)
+    is_default = MemberRoleField(ListingMember.Role.DEFAULT)
 
     class Meta:
         model = Listing
@@ -4,7 +4,7 @@ from django.core.exceptions import ObjectDoesNotExist, ValidationError as Django
 from django.db import transaction
 from django.db.models.functions import Coalesce
 from django.db.models.aggregates import Count, Sum
-from django.db.models.expressions import Exists, OuterRef, Subquery
+from django.db.models.expressions import OuterRef, Subquery
 from django.utils.translation import gettext_lazy as _
 from django.db.models.functions import ACos, Cos, Sin, Radians
 from django.db.models import Q, F, Value, FloatField
@@ -17,7 +17,10 @@ from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.decorators import action
 
 from utils.generals import get_model
+from utils import events
 from utils.pagination import build_result_pagination
+from utils.mixin.viewsets import ThrottleActionMixin
+from utils.throttling import UserRedisThrottle
 from .serializers import (
     CreateListingMemberSerializer,
     CreateListingOpeningSerializer,
@@ -31,6 +34,10 @@ from .serializers import (
 )
 from ..product.serializers import ListListingProductSerializer
 from apps.procure import settings as procure_settings
+from apps.procure.utils.membership import get_listing_ids
+from apps.procure.utils.openings import filter_open_at, parse_open_at
+from apps.procure.utils.ranking import RankedResult, rank_from_database, rank_limit
+from apps.procure.utils.snapshot import get_snapshot
 
 Listing = get_model('procure', 'Listing')
 ListingMember = get_model('procure', 'ListingMember')
@@ -43,7 +50,7 @@ _PAGINATOR = LimitOffsetPagination()
 DISTANCE_RADIUS = procure_settings.DISTANCE_RADIUS
 
 
-class ListingApiView(viewsets.ViewSet):
+class ListingApiView(ThrottleActionMixin, viewsets.ViewSet):
     """
     POST Params;
     --------
@@ -59,6 +66,12 @@ class ListingApiView(viewsets.ViewSet):
 
     lookup_field = 'uuid'
     permission_classes = (IsAuthenticated,)
+    throttle_action = {
+        'list': [UserRedisThrottle],
+    }
+    throttle_scope_action = {
+        'list': 'listing_search',
+    }
 
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
@@ -74,18 +87,11 @@ class ListingApiView(viewsets.ViewSet):
         return super().dispatch(request, *args, **kwargs)
 
     def _instances(self):
-        roles = ['is_admin', 'is_creator', 'is_default',
-                 'is_allow_propose', 'is_allow_offer']
-
-        # Member roles
-        members = ListingMember.objects \
-            .filter(listing_id=OuterRef('id'), user_id=self.request.user.id)
-
-        members_roles = {}
-        for role in roles:
-            members_roles.update(
-                {role: Exists(members.filter(**{role: True}))}
-            )
+        # Member roles packed in single integer
+        member_roles = ListingMember.objects \
+            .filter(listing_id=OuterRef('id'), user_id=self.request.user.id) \
+            .with_roles() \
+            .values('roles')[:1]
 
         # Notification
         notification = Notification.objects \
@@ -103,20 +109,42 @@ class ListingApiView(viewsets.ViewSet):
             .annotate(
                 notification_count=Coalesce(
                     Subquery(notification_count), 0),
-                **members_roles
+                member_roles=Coalesce(Subquery(member_roles), 0)
             ) \
             .order_by('-create_at')
 
     def _instances_public(self):
         return self._queryset.order_by('-create_at')
 
+    def _nearby_instances(self, page):
+        """Page of (id, distance[, score]) to listing, keep order"""
+        instances = self._instances_public().in_bulk([item[0] for item in page])
+        ret = list()
+
+        for listing_id, distance, *score in page:
+            instance = instances.get(listing_id)
+            if instance is not None:
+                instance.distance = distance
+                if score:
+                    instance.score = score[0]
+                ret.append(instance)
+        return ret
+
+    def _nearby_response(self, items, request):
+        paginator = _PAGINATOR.paginate_queryset(items, request)
+        serializer = ListListingSerializer(self._nearby_instances(paginator),
+                                           context=self._context, many=True)
+        results = build_result_pagination(self, _PAGINATOR, serializer)
+        return Response(results, status=response_status.HTTP_200_OK)
+
     def _instance(self, is_update=False):
         try:
             if is_update:
                 # Only member admin can update
+                listing_ids = get_listing_ids(self.request.user.id,
+                                              ListingMember.Role.ADMIN)
                 return self._instances().select_for_update() \
-                    .get(uuid=self._uuid, members__user_id=self.request.user.id,
-                         members__is_admin=True)
+                    .get(uuid=self._uuid, id__in=listing_ids)
             else:
                 return self._instances().get(uuid=self._uuid)
         except ObjectDoesNotExist:
@@ -129,7 +157,19 @@ class ListingApiView(viewsets.ViewSet):
         latitude = request.query_params.get('latitude', None)
         longitude = request.query_params.get('longitude', None)
         keyword = request.query_params.get('keyword', None)
-        radius = request.query_params.get('radius', DISTANCE_RADIUS)
+        is_ranked = request.query_params.get('ordering', None) == 'rank'
+
+        # kilometers, same on snapshot and database
+        try:
+            radius = float(request.query_params.get('radius', DISTANCE_RADIUS))
+        except ValueError:
+            raise ValidationError({'radius': _("Must be a number")})
+
+        # unparsed value would silently drop the filter
+        try:
+            open_at = parse_open_at(request.query_params.get('open_at', None))
+        except ValueError:
+            raise ValidationError({'open_at': _("Must be now or a datetime")})
 
         if visibility == 'public':
             keywords = re.split(r"[^A-Za-z']+", keyword) if keyword else []
@@ -139,6 +179,34 @@ class ListingApiView(viewsets.ViewSet):
                 keyword_query |= Q(label__icontains=keyword) \
                     | Q(keyword__icontains=keyword)
 
+                # ranked also search product label
+                if is_ranked:
+                    keyword_query |= Q(id__in=ListingProduct.objects
+                                       .filter(label__icontains=keyword)
+                                       .values('listing_id'))
+
+            # top-k ordered only until requested page
+            rank_k = rank_limit(_PAGINATOR.get_offset(request),
+                                _PAGINATOR.get_limit(request))
+
+            snapshot = get_snapshot() if latitude and longitude else None
+            if snapshot is not None:
+                # served from shared snapshot, database only read current page
+                if is_ranked:
+                    listing_ids, scores, distances, total = snapshot.ranked(
+                        latitude, longitude, radius, rank_k, keywords=keywords,
+                        open_at=open_at
+                    )
+                    items = RankedResult(
+                        list(zip(listing_ids.tolist(), distances.tolist(), scores.tolist())),
+                        total
+                    )
+                else:
+                    listing_ids, distances = snapshot.nearby(latitude, longitude, radius,
+                                                             keywords=keywords, open_at=open_at)
+                    items = list(zip(listing_ids.tolist(), distances.tolist()))
+                return self._nearby_response(items, request)
+
             instances = self._instances_public()
             if keyword:
                 instances = instances.filter(keyword_query)
@@ -157,10 +225,27 @@ class ListingApiView(viewsets.ViewSet):
                 )
 
                 instances = instances.annotate(distance=calculate_distance) \
-                    .filter(distance__lte=int(float(radius))) \
+                    .filter(distance__lte=radius) \
                     .order_by('distance')
+
+            if open_at is not None:
+                instances = filter_open_at(instances, open_at)
+
+            if is_ranked:
+                if not (latitude and longitude):
+                    instances = instances.annotate(distance=Value(0.0, output_field=FloatField()))
+
+                listing_ids, scores, distances, total = rank_from_database(
+                    instances, rank_k, keywords=keywords
+                )
+                items = RankedResult(
+                    list(zip(listing_ids.tolist(), distances.tolist(), scores.tolist())),
+                    total
+                )
+                return self._nearby_response(items, request)
         else:
-            instances = self._instances().filter(members__user_id=self.request.user.id)
+            listing_ids = get_listing_ids(self.request.user.id)
+            instances = self._instances().filter(id__in=listing_ids)
 
         paginator = _PAGINATOR.paginate_queryset(instances, request)
         serializer = ListListingSerializer(paginator, context=self._context,
@@ -180,7 +265,8 @@ class ListingApiView(viewsets.ViewSet):
                                              context=self._context)
         if serializer.is_valid(raise_exception=True):
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except ValidationError as e:
                 return Response(
                     {'detail': _(" ".join(e.messages))},
@@ -214,9 +300,9 @@ class ListingApiView(viewsets.ViewSet):
     @ transaction.atomic()
     def delete(self, request, uuid=None):
         # Only admin can delete
-        instances = self._instances() \
-            .filter(uuid=self._uuid, members__user_id=self.request.user.id,
-                    members__is_admin=True)
+        listing_ids = get_listing_ids(self.request.user.id,
+                                      ListingMember.Role.ADMIN)
+        instances = Listing.objects.filter(uuid=self._uuid, id__in=listing_ids)
 
         if instances.exists():
             instances.delete()
@@ -323,7 +409,8 @@ class ListingApiView(viewsets.ViewSet):
                                                    context=self._context)
         if serializer.is_valid(raise_exception=True):
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except ValidationError as e:
                 return Response({'detail': _(" ".join(e.messages))}, status=response_status.HTTP_406_NOT_ACCEPTABLE)
 
@@ -349,7 +436,8 @@ class ListingApiView(viewsets.ViewSet):
             member = ListingMember.objects \
                 .get(user_id=user_id, listing__uuid=uuid, is_default=False)
             member.is_default = True
-            member.save(update_fields=['is_default'])
+            with events.atomic():
+                member.save(update_fields=['is_default'])
         except ObjectDoesNotExist:
             pass
 
@@ -11,6 +11,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from utils.generals import get_model
+from utils import events
 from .serializers import CreateOrderSerializer, RetrieveOrderSerializer
 
 Order = get_model('procure', 'Order')
@@ -75,7 +76,8 @@ class OrderApiView(viewsets.ViewSet):
             error_message = None
 
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except DjangoValidationError as e:
                 error_message = _(" ".join(e.messages))
             except IntegrityError as e:
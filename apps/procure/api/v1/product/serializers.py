@@ -2,8 +2,10 @@ from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
 
 from utils.generals import get_model
+from apps.procure.utils.membership import has_role
 
 Listing = get_model('procure', 'Listing')
+ListingMember = get_model('procure', 'ListingMember')
 ListingProduct = get_model('procure', 'ListingProduct')
 
 
@@ -25,10 +27,7 @@ class CreateListingProductSerializer(BaseListingProductSerializer):
         listing = data.get('listing')
 
         # only admin can submit product
-        listing_members = listing.members \
-            .filter(user_id=request.user.id, is_admin=True)
-
-        if not listing_members.exists():
+        if not has_role(request.user.id, listing.id, ListingMember.Role.ADMIN):
             raise serializers.ValidationError(
                 detail=_("Bukan bagian dari bisnis ini")
             )
@@ -8,8 +8,10 @@ from rest_framework.response import Response
 from rest_framework.exceptions import NotFound, ValidationError
 
 from utils.generals import get_model
+from apps.procure.utils.membership import get_listing_ids
 from .serializers import CreateListingProductSerializer, RetrieveListingProductSerializer
 
+ListingMember = get_model('procure', 'ListingMember')
 ListingProduct = get_model('procure', 'ListingProduct')
 
 
@@ -32,11 +34,9 @@ class ProductApiView(viewsets.ViewSet):
         return super().dispatch(request, *args, **kwargs)
 
     def _instances(self):
-        return self._queryset \
-            .filter(
-                listing__members__user_id=self.request.user.id,
-                listing__members__is_admin=True
-            )
+        listing_ids = get_listing_ids(self.request.user.id,
+                                      ListingMember.Role.ADMIN)
+        return self._queryset.filter(listing_id__in=listing_ids)
 
     def _instance(self, is_update=False):
         try:
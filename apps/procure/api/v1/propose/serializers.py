@@ -8,6 +8,7 @@ from django.urls import reverse
 
 from rest_framework import serializers
 from utils.generals import get_model
+from apps.procure.utils.membership import has_role
 
 from ..offer.serializers import RetrieveOfferSerializer
 
@@ -17,6 +18,7 @@ Propose = get_model('procure', 'Propose')
 Offer = get_model('procure', 'Offer')
 OfferItem = get_model('procure', 'OfferItem')
 Listing = get_model('procure', 'Listing')
+ListingMember = get_model('procure', 'ListingMember')
 Order = get_model('procure', 'Order')
 
 
@@ -134,10 +136,8 @@ class CreateProposeSerializer(BaseProposeSerializer):
             })
 
         # restric members only
-        members = listing_instance.members \
-            .filter(user_id=self._request.user.id, is_allow_propose=True)
-
-        if not members.exists():
+        if not has_role(self._request.user.id, listing_instance.id,
+                        ListingMember.Role.ALLOW_PROPOSE):
             raise serializers.ValidationError({
                 'detail': _("Tindakan ditolak. Anda tidak terdaftar dalam bisnis ini.")
             })
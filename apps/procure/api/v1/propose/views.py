@@ -14,7 +14,9 @@ from rest_framework.decorators import action
 
 from utils.mixin.viewsets import ViewSetDestroyObjMixin
 from utils.generals import get_model
+from utils import events
 from utils.pagination import build_result_pagination
+from apps.procure.utils.negotiation import CursorError, get_history, get_propose
 from .serializers import (
     CreateProposeSerializer,
     ListProposeSerializer,
@@ -130,7 +132,8 @@ class ProposeApiView(ViewSetDestroyObjMixin, viewsets.ViewSet):
             _error = None
 
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except IntegrityError as e:
                 _error = str(e)
             except DjangoValidationError as e:
@@ -153,7 +156,8 @@ class ProposeApiView(ViewSetDestroyObjMixin, viewsets.ViewSet):
                                              data=request.data, context=self._context)
         if serializer.is_valid(raise_exception=True):
             try:
-                serializer.save()
+                with events.atomic():
+                    serializer.save()
             except ValidationError as e:
                 return Response({'detail': _(" ".join(e.messages))}, status=response_status.HTTP_406_NOT_ACCEPTABLE)
 
@@ -218,3 +222,28 @@ class ProposeApiView(ViewSetDestroyObjMixin, viewsets.ViewSet):
                                          context=self._context)
         results = build_result_pagination(self, _PAGINATOR, serializer)
         return Response(results, status=response_status.HTTP_200_OK)
+
+    """
+    Negotiation history, newest first
+    ?before=<next cursor>&limit=30
+    """
+
+    @action(methods=['GET'], detail=True, url_name='negotiations', url_path='negotiations',
+            permission_classes=(IsAuthenticated,))
+    def negotiations(self, request, uuid=None, format=None):
+        # seller side not in _instances, participant checked here
+        try:
+            propose = get_propose(uuid, request.user.id)
+        except DjangoValidationError as e:
+            raise ValidationError(detail=str(e))
+
+        if propose is None:
+            raise NotFound(detail=_("Not found"))
+
+        try:
+            limit = int(request.query_params.get('limit') or 0) or None
+            results, next = get_history(propose.id, request.query_params.get('before'), limit)
+        except (CursorError, ValueError) as e:
+            raise ValidationError(detail=str(e))
+
+        return Response({'next': next, 'results': results}, status=response_status.HTTP_200_OK)
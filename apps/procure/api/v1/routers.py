@@ -8,6 +8,10 @@ from .offer.views import OfferApiView
 from .listing.views import ListingApiView
 from .order.views import OrderApiView
 from .product.views import ProductApiView
+from .attachment.views import AttachmentApiView
+from .upload.views import UploadApiView
+
+from apps.procure.utils.thumbnail import ATTACHMENT_MODELS
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter(trailing_slash=True)
@@ -17,6 +21,9 @@ router.register('offers', OfferApiView, basename='offer')
 router.register('listings', ListingApiView, basename='listing')
 router.register('orders', OrderApiView, basename='order')
 router.register('products', ProductApiView, basename='product')
+router.register(r'attachments/(?P<kind>%s)' % '|'.join(ATTACHMENT_MODELS),
+                AttachmentApiView, basename='attachment')
+router.register('uploads', UploadApiView, basename='upload')
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
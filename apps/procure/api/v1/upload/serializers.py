@@ -0,0 +1,73 @@
+import os
+import datetime
+
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import serializers
+
+from utils.files import ALLOWED_EXTENSIONS
+from utils.generals import get_model
+from apps.procure import settings as procure_settings
+from apps.procure.utils.upload import get_target
+
+UploadSession = get_model('procure', 'UploadSession')
+
+
+class BaseUploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+
+
+class CreateUploadSessionSerializer(BaseUploadSessionSerializer):
+    target_uuid = serializers.UUIDField(write_only=True)
+
+    class Meta(BaseUploadSessionSerializer.Meta):
+        fields = ('target', 'target_uuid', 'filename', 'size', 'caption',)
+
+    def validate_filename(self, value):
+        _name, ext = os.path.splitext(value)
+        if ext.lower() not in ALLOWED_EXTENSIONS:
+            raise serializers.ValidationError(
+                detail=_("Tipe file tidak diizinkan")
+            )
+        return os.path.basename(value)
+
+    def validate_size(self, value):
+        if value <= 0 or value > procure_settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                detail=_("Ukuran file maksimal %s byte") % procure_settings.UPLOAD_MAX_SIZE
+            )
+        return value
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        data = super().validate(attrs)
+
+        target = get_target(data['target'], data.pop('target_uuid'), request.user.id)
+        if target is None:
+            raise serializers.ValidationError(
+                detail=_("Target tidak ditemukan")
+            )
+
+        data['target_id'] = target.id
+        return data
+
+    def create(self, validated_data):
+        request = self.context.get('request')
+        expire_at = timezone.now() \
+            + datetime.timedelta(seconds=procure_settings.UPLOAD_SESSION_EXPIRE)
+
+        return UploadSession.objects.create(user_id=request.user.id, expire_at=expire_at,
+                                            **validated_data)
+
+
+class RetrieveUploadSessionSerializer(BaseUploadSessionSerializer):
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta(BaseUploadSessionSerializer.Meta):
+        fields = ('uuid', 'target', 'filename', 'size', 'offset', 'status',
+                  'expire_at', 'attachment_uuid', 'chunk_size',)
+
+    def get_chunk_size(self, instance):
+        return procure_settings.UPLOAD_CHUNK_SIZE
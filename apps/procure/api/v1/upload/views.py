@@ -0,0 +1,150 @@
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status as response_status, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.decorators import action
+
+from utils.generals import get_model
+from apps.procure.utils.upload import (
+    ChunkError,
+    finalize,
+    parse_content_range,
+    part_path,
+    remove_part,
+    write_chunk
+)
+from .serializers import CreateUploadSessionSerializer, RetrieveUploadSessionSerializer
+
+UploadSession = get_model('procure', 'UploadSession')
+
+
+class UploadApiView(viewsets.ViewSet):
+    """
+    Resumable upload of inquiry item and negotiation attachment
+
+    POST Params;
+    --------
+        {
+            "target": "inquiry_item|negotiation",   [required]
+            "target_uuid": "uuid",                  [required]
+            "filename": "string",                   [required]
+            "size": integer,                        [required] bytes
+            "caption": "string"                     [optional]
+        }
+
+    PUT chunk/
+    --------
+        raw bytes body
+        Content-Range: bytes <start>-<end>/<size>, start must equal `offset`
+        409 with current `offset` if not, resume from there
+
+    POST finalize/
+    --------
+        after `offset` equal `size`, return attachment uuid
+    """
+
+    lookup_field = 'uuid'
+    permission_classes = (IsAuthenticated,)
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._context = {}
+        self._uuid = None
+
+    def dispatch(self, request, *args, **kwargs):
+        self._uuid = kwargs.get('uuid')
+        self._context.update({'request': request})
+        return super().dispatch(request, *args, **kwargs)
+
+    def _instances(self):
+        return UploadSession.objects \
+            .filter(user_id=self.request.user.id, expire_at__gt=timezone.now())
+
+    def _instance(self, is_update=False):
+        try:
+            if is_update:
+                return self._instances().select_for_update() \
+                    .get(uuid=self._uuid)
+            else:
+                return self._instances() \
+                    .get(uuid=self._uuid)
+        except ObjectDoesNotExist:
+            raise NotFound(detail=_("Not found"))
+        except DjangoValidationError as e:
+            raise ValidationError(detail=str(e))
+
+    def _response(self, instance, status=response_status.HTTP_200_OK):
+        serializer = RetrieveUploadSessionSerializer(instance, context=self._context)
+        return Response(serializer.data, status=status)
+
+    def create(self, request, format=None):
+        serializer = CreateUploadSessionSerializer(data=request.data, context=self._context)
+        if serializer.is_valid(raise_exception=True):
+            serializer.save()
+            return self._response(serializer.instance, status=response_status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=response_status.HTTP_400_BAD_REQUEST)
+
+    def retrieve(self, request, uuid=None, format=None):
+        return self._response(self._instance())
+
+    def destroy(self, request, uuid=None, format=None):
+        instance = self._instance()
+        if instance.status == UploadSession.Status.PENDING:
+            remove_part(part_path(instance))
+
+        instance.delete()
+        return Response({'detail': _("Delete success")}, status=response_status.HTTP_200_OK)
+
+    @ action(methods=['put'], detail=True, url_path='chunk', url_name='chunk')
+    def chunk(self, request, uuid=None, format=None):
+        # body read as stream, never parsed to request.data
+        instance = self._instance()
+        if instance.status != UploadSession.Status.PENDING:
+            raise ValidationError(detail=_("Upload already finalized"))
+
+        try:
+            start, length = parse_content_range(request.headers.get('Content-Range'), instance)
+        except ChunkError as e:
+            raise ValidationError(detail=str(e))
+
+        if start != instance.offset:
+            return Response({'detail': _("Offset not match"), 'offset': instance.offset},
+                            status=response_status.HTTP_409_CONFLICT)
+
+        offset = write_chunk(instance, request.stream, start, length) \
+            if request.stream else None
+
+        if offset is None:
+            instance.refresh_from_db(fields=['offset'])
+            return Response({'detail': _("Offset not match"), 'offset': instance.offset},
+                            status=response_status.HTTP_409_CONFLICT)
+
+        instance.offset = offset
+        return self._response(instance)
+
+    @ action(methods=['post'], detail=True, url_path='finalize', url_name='finalize')
+    @transaction.atomic
+    def finalize(self, request, uuid=None, format=None):
+        instance = self._instance(is_update=True)
+
+        # retried finalize return same attachment
+        if instance.status == UploadSession.Status.PENDING:
+            if instance.offset != instance.size:
+                return Response({'detail': _("Upload not complete"), 'offset': instance.offset},
+                                status=response_status.HTTP_409_CONFLICT)
+            try:
+                finalize(instance)
+            except ChunkError as e:
+                # start over, bytes before offset lost
+                remove_part(part_path(instance))
+                instance.offset = 0
+                instance.save(update_fields=['offset', 'update_at'])
+                return Response({'detail': str(e), 'offset': instance.offset},
+                                status=response_status.HTTP_409_CONFLICT)
+
+        return self._response(instance, status=response_status.HTTP_201_CREATED)
@@ -1,5 +1,5 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 
 
 class ServoConfig(AppConfig):
@@ -15,34 +15,46 @@ class ServoConfig(AppConfig):
         ListingMember = self.get_model('ListingMember')
         Offer = self.get_model('Offer')
         Order = self.get_model('Order')
+        attachments = [self.get_model(name) for name in (
+            'InquiryItemAttachment', 'ListingAttachment',
+            'ListingProductAttachment', 'NegotiationAttachment')]
 
-        from .signals import (
-            inquiry_save_handler,
-            inquiry_location_save_handler,
-            listing_member_save_handler,
-            listing_save_handler,
-            offer_save_handler,
-            inquiry_skip_save_handler,
-            order_save_handler
-        )
-
-        post_save.connect(inquiry_save_handler, sender=Inquiry,
+        from utils.events import emit_model_saved
+        from utils.files import release_file_handler, replace_file_handler
+
+        # register domain event handlers
+        from . import signals
+
+        post_save.connect(emit_model_saved, sender=Inquiry,
                           dispatch_uid='inquiry_save_signal')
 
-        post_save.connect(inquiry_location_save_handler, sender=InquiryLocation,
+        post_save.connect(emit_model_saved, sender=InquiryLocation,
                           dispatch_uid='inquiry_location_save_signal')
 
-        post_save.connect(inquiry_skip_save_handler, sender=InquirySkip,
+        post_save.connect(emit_model_saved, sender=InquirySkip,
                           dispatch_uid='inquiry_skip_signal')
 
-        post_save.connect(listing_save_handler, sender=Listing,
+        post_save.connect(emit_model_saved, sender=Listing,
                           dispatch_uid='listing_signal')
 
-        post_save.connect(listing_member_save_handler, sender=ListingMember,
+        post_save.connect(emit_model_saved, sender=ListingMember,
                           dispatch_uid='listing_member_signal')
 
-        post_save.connect(offer_save_handler, sender=Offer,
+        post_save.connect(signals.member_roles_handler, sender=ListingMember,
+                          dispatch_uid='listing_member_roles_save_signal')
+
+        post_delete.connect(signals.member_roles_handler, sender=ListingMember,
+                            dispatch_uid='listing_member_roles_delete_signal')
+
+        post_save.connect(emit_model_saved, sender=Offer,
                           dispatch_uid='offer_signal')
 
-        post_save.connect(order_save_handler, sender=Order,
+        post_save.connect(emit_model_saved, sender=Order,
                           dispatch_uid='order_signal')
+
+        for model in attachments:
+            post_delete.connect(release_file_handler, sender=model,
+                                dispatch_uid='%s_file_delete_signal' % model._meta.model_name)
+
+            post_save.connect(replace_file_handler, sender=model,
+                              dispatch_uid='%s_file_replace_signal' % model._meta.model_name)
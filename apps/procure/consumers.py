@@ -0,0 +1,153 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from apps.notifier.consumers import PresenceConsumerMixin
+from apps.procure import settings as procure_settings
+from apps.procure.utils import leaderboard
+from apps.procure.utils.negotiation import (
+    CursorError,
+    get_history,
+    get_propose,
+    get_writer,
+    group_name
+)
+
+
+class NegotiationConsumer(PresenceConsumerMixin, AsyncJsonWebsocketConsumer):
+    """
+    Negotiation thread of a propose, ws/procure/proposes/<uuid>/negotiations/
+
+    Send;
+    --------
+        {"type": "message", "content": "string", "ref": "any"}
+        {"type": "history", "before": "cursor", "limit": integer}
+
+    Receive;
+    --------
+        {"type": "message", "message": {...}, "ref": "any"}   ref only to sender
+        {"type": "history", "results": [...], "next": "cursor"}
+        {"type": "error", "detail": "string", "ref": "any"}
+        {"type": "notification", "event": {...}}
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        uuid = self.scope['url_route']['kwargs']['uuid']
+        self.propose = await database_sync_to_async(get_propose)(uuid, user.id)
+        if self.propose is None:
+            await self.close()
+            return
+
+        self.group_name = group_name(self.propose.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.presence_join()
+
+    async def disconnect(self, code):
+        await self.presence_leave()
+        if getattr(self, 'group_name', None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        kind = content.get('type')
+        if kind == 'message':
+            await self.send_message(content)
+        elif kind == 'history':
+            await self.send_history(content)
+        else:
+            await self.send_json({'type': 'error', 'detail': "Unknown type"})
+
+    async def send_message(self, content):
+        ref = content.get('ref')
+        text = content.get('content')
+
+        if not isinstance(text, str) or not text.strip() \
+                or len(text) > procure_settings.NEGOTIATION_MAX_LENGTH:
+            await self.send_json({'type': 'error', 'ref': ref, 'detail': "Content not valid"})
+            return
+
+        user = self.scope['user']
+        try:
+            message = await get_writer().write({
+                'propose_id': self.propose.id,
+                'user_id': user.id,
+                'user_uuid': user.uuid,
+                'content': text,
+            })
+        except Exception:
+            await self.send_json({'type': 'error', 'ref': ref, 'detail': "Message not saved"})
+            return
+
+        await self.channel_layer.group_send(self.group_name, {
+            'type': 'negotiation.message',
+            'message': message,
+            'sender': self.channel_name,
+            'ref': ref,
+        })
+
+    async def send_history(self, content):
+        try:
+            limit = int(content.get('limit') or 0) or None
+            results, next = await database_sync_to_async(get_history)(
+                self.propose.id, content.get('before'), limit)
+        except (CursorError, ValueError, TypeError):
+            await self.send_json({'type': 'error', 'detail': "Cursor not valid"})
+            return
+
+        await self.send_json({'type': 'history', 'results': results, 'next': next})
+
+    async def negotiation_message(self, event):
+        data = {'type': 'message', 'message': event['message']}
+        if event.get('sender') == self.channel_name:
+            data['ref'] = event.get('ref')
+        await self.send_json(data)
+
+
+class InquiryLeaderboardConsumer(PresenceConsumerMixin, AsyncJsonWebsocketConsumer):
+    """
+    Offer rank of an inquiry, ws/procure/inquiries/<uuid>/leaderboard/
+    only for inquiry creator
+
+    Receive;
+    --------
+        {"type": "snapshot", "results": [...]}       top entries after connected
+        {"type": "rank", "entries": [...]}           entry changed, with previous_rank,
+                                                     entries between both rank shifted
+        {"type": "notification", "event": {...}}
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        uuid = self.scope['url_route']['kwargs']['uuid']
+        self.inquiry = await database_sync_to_async(leaderboard.get_inquiry)(uuid, user.id)
+        if self.inquiry is None:
+            await self.close()
+            return
+
+        # join first, change after snapshot read not missed
+        self.group_name = leaderboard.group_name(self.inquiry.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.presence_join()
+
+        results = await database_sync_to_async(leaderboard.get_snapshot)(self.inquiry)
+        await self.send_json({'type': 'snapshot', 'results': results})
+
+    async def disconnect(self, code):
+        await self.presence_leave()
+        if getattr(self, 'group_name', None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        await self.send_json({'type': 'error', 'detail': "Unknown type"})
+
+    async def leaderboard_rank(self, event):
+        await self.send_json({'type': 'rank', 'entries': event['entries']})
@@ -0,0 +1,108 @@
+import time
+import uuid
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from utils.generals import get_model
+
+UserModel = get_user_model()
+
+# somewhere in Jakarta
+LATITUDE = -6.2
+LONGITUDE = 106.8
+
+
+class Command(BaseCommand):
+    help = "Measure queries and savepoints of inquiry and offer create request, " \
+           "data created by this run rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20,
+                            help="Measured request of each kind, after one warm up")
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={})
+
+        # outbox relay inline on DEBUG, never reached since nothing committed
+        with override_settings(REST_FRAMEWORK=rest_framework), transaction.atomic():
+            self.run(options['requests'])
+            transaction.set_rollback(True)
+
+    def create_seller(self):
+        Listing = get_model('procure', 'Listing')
+        ListingLocation = get_model('procure', 'ListingLocation')
+        ListingMember = get_model('procure', 'ListingMember')
+
+        seller = UserModel.objects.create_user(
+            'benchmark_%s' % uuid.uuid4().hex[:12], None,
+            email='%s@benchmark.local' % uuid.uuid4().hex)
+
+        listing = Listing.objects.create(label='Benchmark', keyword='semen pasir',
+                                         status=Listing.Status.APPROVED)
+        ListingLocation.objects.filter(listing=listing) \
+            .update(latitude=LATITUDE, longitude=LONGITUDE)
+        ListingMember.objects.create(user=seller, listing=listing, is_admin=True,
+                                     is_creator=True, is_default=True,
+                                     is_allow_propose=True, is_allow_offer=True)
+        return seller, listing
+
+    def measure(self, label, request, count):
+        # first request warm cache and lazy import
+        response = request()
+        if response.status_code != 201:
+            self.stderr.write("%s failed: %s %s" % (label, response.status_code, response.data))
+            return
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _index in range(count):
+                request()
+            elapsed = time.perf_counter() - started
+
+        savepoints = [query for query in queries.captured_queries
+                      if query['sql'].startswith('SAVEPOINT')]
+        self.stdout.write("%-16s %6.1f queries, %4.1f savepoints, %6.1f ms per request" % (
+            label, len(queries) / count, len(savepoints) / count, elapsed * 1000 / count))
+
+    def run(self, count):
+        buyer = UserModel.objects.create_user(
+            'benchmark_%s' % uuid.uuid4().hex[:12], None,
+            email='%s@benchmark.local' % uuid.uuid4().hex)
+        seller, listing = self.create_seller()
+
+        buyer_client = APIClient()
+        buyer_client.force_authenticate(buyer)
+        seller_client = APIClient()
+        seller_client.force_authenticate(seller)
+
+        def create_inquiry():
+            return buyer_client.post(reverse('procure_api:inquiry-list'), {
+                'keyword': 'semen pasir',
+                'items': [{'label': 'Semen'}, {'label': 'Pasir'}],
+                'location': {'latitude': LATITUDE, 'longitude': LONGITUDE},
+            }, format='json')
+
+        self.measure("inquiry create", create_inquiry, count)
+
+        inquiry = create_inquiry().data
+        items = [item['uuid'] for item in inquiry['items']]
+
+        def create_offer():
+            # same propose, each request add newer offer
+            return seller_client.post(reverse('procure_api:propose-list'), {
+                'listing': str(listing.uuid),
+                'inquiry': inquiry['uuid'],
+                'offer': {'cost': 10000},
+                'offer_items': [{'inquiry_item': item, 'cost': 5000} for item in items],
+            }, format='json')
+
+        self.measure("offer create", create_offer, count)
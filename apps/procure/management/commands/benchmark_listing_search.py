@@ -0,0 +1,170 @@
+import math
+import time
+import uuid
+import random
+import shutil
+import logging
+import tempfile
+
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from utils.generals import get_model
+from apps.procure import settings as procure_settings
+from apps.procure.utils.snapshot import ListingSnapshot, build_snapshot
+
+UserModel = get_user_model()
+
+# somewhere in Jakarta
+LATITUDE = -6.2
+LONGITUDE = 106.8
+KILOMETER_DEGREE = 111.32
+
+WORDS = ('beras', 'kopi', 'semen', 'pasir', 'besi', 'cat', 'gula', 'minyak', 'telur',
+         'ayam', 'sayur', 'buah', 'roti', 'susu', 'kayu', 'genteng', 'keramik', 'pipa')
+
+
+class Command(BaseCommand):
+    help = "Measure public listing search served from snapshot and from database, " \
+           "listings created by this run rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=20000)
+        parser.add_argument('--spread', type=float, default=30,
+                            help="Kilometers around center listings placed")
+        parser.add_argument('--radius', type=float, default=15)
+        parser.add_argument('--keyword', default='beras')
+        parser.add_argument('--products', type=float, default=0,
+                            help="Share of listings having a product, 0 to 1")
+        parser.add_argument('--ranked', action='store_true',
+                            help="Also measure relevance ranked search, ordering=rank")
+        parser.add_argument('--candidates', type=int,
+                            help="Override SEARCH_RANK_CANDIDATES of database fallback")
+        parser.add_argument('--searches', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        logging.getLogger('apps.procure.utils.snapshot').setLevel(logging.ERROR)
+        rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={})
+        path = tempfile.mkdtemp(prefix='listing-snapshot-')
+
+        try:
+            with override_settings(REST_FRAMEWORK=rest_framework), transaction.atomic():
+                self.create_listings(options)
+
+                started = time.perf_counter()
+                manifest = build_snapshot(path)
+                self.stdout.write("snapshot of %s listings built in %.2fs" % (
+                    manifest['count'], time.perf_counter() - started))
+
+                self.run(ListingSnapshot(path, manifest), options)
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def create_listings(self, options):
+        Listing = get_model('procure', 'Listing')
+        ListingLocation = get_model('procure', 'ListingLocation')
+        ListingProduct = get_model('procure', 'ListingProduct')
+        rand = random.Random(options['seed'])
+        marker = 'Benchmark %s' % uuid.uuid4().hex[:8]
+
+        # bulk, no domain event for benchmark rows
+        Listing.objects.bulk_create([
+            Listing(label='%s %s %s' % (marker, rand.choice(WORDS), index),
+                    keyword=' '.join(rand.sample(WORDS, 3)),
+                    status=Listing.Status.APPROVED)
+            for index in range(options['listings'])
+        ], batch_size=1000)
+
+        # bulk_create not return id on every database
+        listing_ids = Listing.objects.filter(label__startswith=marker) \
+            .order_by('id').values_list('id', flat=True)
+
+        spread = options['spread'] / KILOMETER_DEGREE
+        ListingLocation.objects.bulk_create([
+            ListingLocation(
+                listing_id=listing_id,
+                latitude=LATITUDE + rand.uniform(-spread, spread),
+                longitude=LONGITUDE + rand.uniform(-spread, spread)
+                / math.cos(math.radians(LATITUDE)),
+            )
+            for listing_id in listing_ids.iterator()
+        ], batch_size=1000)
+
+        ListingProduct.objects.bulk_create([
+            ListingProduct(listing_id=listing_id, label='%s %s' % (
+                rand.choice(WORDS).title(), rand.choice(WORDS)))
+            for listing_id in listing_ids.iterator()
+            if rand.random() < options['products']
+        ], batch_size=1000)
+
+    def search(self, client, snapshot, params, count):
+        """Return (first response, ms per search, queries per search)"""
+        url = reverse('procure_api:listing-list')
+        with mock.patch('apps.procure.api.v1.listing.views.get_snapshot',
+                        return_value=snapshot):
+            response = client.get(url, params)
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _index in range(count):
+                    client.get(url, params)
+                elapsed = time.perf_counter() - started
+        return response, elapsed * 1000 / count, len(queries) / count
+
+    def compare(self, label, client, snapshot, params, count):
+        database, database_ms, database_queries = self.search(client, None, params, count)
+        served, served_ms, served_queries = self.search(client, snapshot, params, count)
+
+        # ACos in database and haversine differ below a millimeter
+        def page(response):
+            return [(item['uuid'], round(item['distance'], 4),
+                     round(item.get('score') or 0, 4))
+                    for item in response.data['results']]
+
+        self.stdout.write("%s, %s matches" % (label, database.data['total']))
+        self.stdout.write("  database  %7.1f ms, %.0f queries" % (database_ms, database_queries))
+        self.stdout.write("  snapshot  %7.1f ms, %.0f queries, same page %s" % (
+            served_ms, served_queries, page(database) == page(served)))
+
+    def run(self, snapshot, options):
+        user = UserModel.objects.create_user(
+            'benchmark_%s' % uuid.uuid4().hex[:12], None,
+            email='%s@benchmark.local' % uuid.uuid4().hex)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        params = {'visibility': 'public', 'latitude': LATITUDE, 'longitude': LONGITUDE,
+                  'radius': options['radius'], 'keyword': options['keyword'], 'limit': 20}
+        self.compare("distance order", client, snapshot, params, options['searches'])
+
+        started = time.perf_counter()
+        for _index in range(options['searches']):
+            snapshot.nearby(LATITUDE, LONGITUDE, options['radius'],
+                            keywords=[options['keyword']])
+        self.stdout.write("  nearby() alone %.1f ms" % (
+            (time.perf_counter() - started) * 1000 / options['searches']))
+
+        if options['ranked']:
+            # database fallback score only SEARCH_RANK_CANDIDATES nearest,
+            # same page as snapshot only when it covers every match
+            candidates = procure_settings.SEARCH_RANK_CANDIDATES
+            if options['candidates']:
+                procure_settings.SEARCH_RANK_CANDIDATES = options['candidates']
+
+            try:
+                params['ordering'] = 'rank'
+                self.compare("ranked", client, snapshot, params, options['searches'])
+                self.compare("ranked, page 6", client, snapshot, dict(params, offset=100),
+                             options['searches'])
+            finally:
+                procure_settings.SEARCH_RANK_CANDIDATES = candidates
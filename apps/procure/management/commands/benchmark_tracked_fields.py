@@ -0,0 +1,64 @@
+import gc
+import uuid
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from utils.generals import get_model
+
+DESCRIPTION = 'Toko bangunan lengkap, semen, pasir, besi, cat dan alat pertukangan. ' * 8
+
+
+class Command(BaseCommand):
+    help = "Measure memory retained by loaded listings and their tracked fields, " \
+           "listings created by this run rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        Listing = get_model('procure', 'Listing')
+
+        # only rows of this run loaded
+        keyword = 'semen pasir benchmark-%s' % uuid.uuid4().hex
+
+        with transaction.atomic():
+            # bulk, no domain event for benchmark rows
+            Listing.objects.bulk_create([
+                Listing(label='Benchmark %s' % index, keyword=keyword,
+                        description=DESCRIPTION, status=Listing.Status.APPROVED)
+                for index in range(options['listings'])
+            ], batch_size=1000)
+
+            self.run(Listing, Listing.objects.filter(keyword=keyword))
+            transaction.set_rollback(True)
+
+    def traced(self, build):
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        value = build()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        return value, retained
+
+    def run(self, Listing, queryset):
+        listings, retained = self.traced(lambda: list(queryset))
+        count = len(listings)
+        self.stdout.write("%s listings loaded, %.1f MB retained, %.0f bytes each" % (
+            count, retained / 1024 / 1024, retained / count))
+
+        tracked = sum(listing._tracked_values.__sizeof__() for listing in listings)
+        self.stdout.write("tracked %s tuple: %.0f bytes each" % (
+            ', '.join(Listing.tracked_fields), tracked / count))
+
+        # what a copy of the whole loaded row would keep, values shared
+        attnames = [field.attname for field in Listing._meta.concrete_fields]
+        _rows, retained = self.traced(lambda: [
+            {attname: listing.__dict__[attname] for attname in attnames}
+            for listing in listings
+        ])
+        self.stdout.write("whole row dict: %.0f bytes each, %.1f MB for all" % (
+            retained / count, retained / 1024 / 1024))
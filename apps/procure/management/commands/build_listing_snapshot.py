@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.procure.utils.snapshot import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Build listing geo/keyword snapshot into LISTING_SNAPSHOT_DIR of this host"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Snapshot directory, default LISTING_SNAPSHOT_DIR")
+
+    def handle(self, *args, **options):
+        manifest = build_snapshot(options['path'])
+        self.stdout.write("Snapshot %s built with %s listing." % (manifest['version'],
+                                                                manifest['count']))
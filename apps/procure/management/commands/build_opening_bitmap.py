@@ -0,0 +1,54 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from utils.generals import get_model
+from apps.procure.utils.openings import build_bitmap
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Build Listing.opening_bitmap from ListingOpening, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Rebuild every listing, not only without bitmap")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        Listing = get_model('procure', 'Listing')
+        ListingOpening = get_model('procure', 'ListingOpening')
+
+        listings = Listing.objects.order_by('id')
+        if not options['all']:
+            listings = listings.filter(opening_bitmap__isnull=True)
+
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+
+        while True:
+            listing_ids = list(
+                listings.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size]
+            )
+            if not listing_ids:
+                break
+
+            openings = defaultdict(list)
+            for opening in ListingOpening.objects.filter(listing_id__in=listing_ids):
+                openings[opening.listing_id].append(opening)
+
+            instances = [
+                Listing(id=listing_id, opening_bitmap=build_bitmap(openings[listing_id]))
+                for listing_id in listing_ids
+            ]
+
+            with transaction.atomic():
+                Listing.objects.bulk_update(instances, ['opening_bitmap'])
+
+            updated += len(instances)
+            last_id = listing_ids[-1]
+
+        self.stdout.write("%s listing updated." % updated)
@@ -0,0 +1,126 @@
+import time
+import uuid
+import asyncio
+import statistics
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.generals import get_model
+from setup.websocket.urls import websocket_urlpatterns
+
+
+class UserScope:
+    """Skip token, connection run as given user"""
+
+    def __init__(self, inner, user):
+        self.inner = inner
+        self.user = user
+
+    async def __call__(self, scope, receive, send):
+        return await self.inner(dict(scope, user=self.user), receive, send)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Command(BaseCommand):
+    help = "Measure negotiation websocket throughput and latency of this worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument('propose', help="Propose uuid, buyer and proposer take turns")
+        parser.add_argument('--clients', type=int, default=10)
+        parser.add_argument('--messages', type=int, default=100,
+                            help="Message sent by each client")
+        parser.add_argument('--keep', action='store_true',
+                            help="Keep negotiation written by this run")
+
+    def handle(self, *args, **options):
+        Propose = get_model('procure', 'Propose')
+        Negotiation = get_model('procure', 'Negotiation')
+
+        propose = Propose.objects.select_related('user', 'inquiry__user') \
+            .filter(uuid=options['propose']).first()
+        if propose is None:
+            raise CommandError("Propose not found")
+
+        users = [propose.inquiry.user, propose.user]
+        result = async_to_sync(self.run)(propose, users, options['clients'], options['messages'])
+        latencies, elapsed, deliveries, uuids = result
+
+        # only message echoed to this run, real participant may write meanwhile
+        written = Negotiation.objects.filter(propose=propose, uuid__in=uuids)
+        count = written.count()
+        if not options['keep']:
+            written.delete()
+
+        sent = len(latencies)
+        self.stdout.write("clients %s, messages %s, written %s, %.2fs"
+                          % (options['clients'], sent, count, elapsed))
+        self.stdout.write("throughput %.0f msg/s, fan out %.0f delivery/s"
+                          % (sent / elapsed, deliveries / elapsed))
+        self.stdout.write("latency ms p50 %.1f, p95 %.1f, p99 %.1f, max %.1f, mean %.1f" % (
+            percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99),
+            max(latencies), statistics.mean(latencies)))
+
+    async def run(self, propose, users, clients, messages):
+        path = '/ws/procure/proposes/%s/negotiations/' % propose.uuid
+        communicators = list()
+
+        for index in range(clients):
+            application = UserScope(URLRouter(websocket_urlpatterns), users[index % len(users)])
+            communicator = WebsocketCommunicator(application, path)
+            connected, _code = await communicator.connect()
+            if not connected:
+                raise CommandError("User %s not participant" % users[index % len(users)])
+            communicators.append(communicator)
+
+        deliveries = [0]
+        uuids = list()
+        run_id = uuid.uuid4().hex
+
+        async def client(index, communicator):
+            latencies = list()
+            waiting = dict()
+
+            async def receiver():
+                while True:
+                    data = await communicator.receive_json_from(timeout=30)
+                    deliveries[0] += 1
+                    event = waiting.pop(data.get('ref'), None)
+                    if event is not None:
+                        if data.get('type') == 'message':
+                            uuids.append(data['message']['uuid'])
+                        event.set()
+
+            task = asyncio.ensure_future(receiver())
+            for number in range(messages):
+                ref = '%s-%s-%s' % (run_id, index, number)
+                waiting[ref] = event = asyncio.Event()
+
+                sent_at = time.perf_counter()
+                await communicator.send_json_to({'type': 'message', 'content': 'Nego %s' % ref,
+                                                 'ref': ref})
+                await event.wait()
+                latencies.append((time.perf_counter() - sent_at) * 1000)
+
+            # other client still sending to this one
+            return task, latencies
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[client(index, communicator) for index, communicator
+                                         in enumerate(communicators)])
+        elapsed = time.perf_counter() - started
+
+        for task, _latencies in results:
+            task.cancel()
+
+        for communicator in communicators:
+            await communicator.disconnect()
+
+        latencies = [latency for _task, client_latencies in results for latency in client_latencies]
+        return latencies, elapsed, deliveries[0], uuids
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from simple_history.models import registered_models
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = "Delete simple_history record older than retention days, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.HISTORY_RETENTION_DAYS)
+        parser.add_argument('--model', action='append', default=[],
+                            help="Only this model, ie: procure.Offer")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only count record to delete")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timezone.timedelta(days=options['days'])
+        models = {model._meta.label_lower: model for model in registered_models.values()}
+        labels = [label.lower() for label in options['model']] or sorted(models)
+
+        unknown = set(labels) - set(models)
+        if unknown:
+            raise CommandError("No history for %s" % ', '.join(sorted(unknown)))
+
+        for label in labels:
+            model = models[label]
+            manager = getattr(model, model._meta.simple_history_manager_attribute)
+            old_records = manager.model.objects.filter(history_date__lt=cutoff)
+
+            if options['dry_run']:
+                deleted = old_records.count()
+            else:
+                deleted = self.prune(old_records, options['batch_size'])
+
+            if deleted:
+                self.stdout.write("%s: %s record." % (label, deleted))
+
+    def prune(self, old_records, batch_size):
+        deleted = 0
+        while True:
+            history_ids = list(old_records.values_list('pk', flat=True)[:batch_size])
+            if not history_ids:
+                break
+
+            # no signal or relation on historical model, single DELETE
+            count, _deleted = old_records.model.objects \
+                .filter(pk__in=history_ids) \
+                .delete()
+            deleted += count
+        return deleted
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from utils.generals import get_model
+from apps.procure.utils.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild offer leaderboard of open inquiries from database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('inquiry', nargs='*', help="Inquiry uuid, default all open")
+
+    def handle(self, *args, **options):
+        Inquiry = get_model('procure', 'Inquiry')
+
+        inquiries = Inquiry.objects.filter(is_open=True).only('id', 'close_at')
+        if options['inquiry']:
+            inquiries = inquiries.filter(uuid__in=options['inquiry'])
+
+        count = 0
+        for inquiry in inquiries.iterator():
+            rebuild(inquiry)
+            count += 1
+
+        self.stdout.write("%s leaderboard rebuilt" % count)
@@ -0,0 +1,74 @@
+import os
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.images import render_derivatives
+from apps.procure import settings as procure_settings
+from apps.procure.utils.thumbnail import (
+    ATTACHMENT_MODELS,
+    ThumbnailSpecError,
+    get_attachment_model,
+    parse_spec,
+    set_digest
+)
+
+
+def _render(job):
+    # run in pool worker, no database access
+    index, source, directory, specs = job
+    try:
+        digest, _paths = render_derivatives(source, directory, specs)
+    except Exception as e:
+        return index, None, str(e)
+    return index, digest, None
+
+
+class Command(BaseCommand):
+    help = "Generate attachment thumbnails into THUMBNAIL_CACHE_DIR with multiprocessing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=list(ATTACHMENT_MODELS),
+                            help="Attachment kind, default all")
+        parser.add_argument('--size', action='append',
+                            help="Like 256 or 256x128, default THUMBNAIL_PREGENERATE")
+        parser.add_argument('--type', action='append', dest='types',
+                            help="Format of each size, default first THUMBNAIL_FORMATS")
+        parser.add_argument('--crop', action='store_true')
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        specs = list(procure_settings.THUMBNAIL_PREGENERATE)
+        if options['size']:
+            try:
+                specs = [parse_spec(size, format, options['crop'])
+                         for size in options['size']
+                         for format in options['types'] or [None]]
+            except ThumbnailSpecError as e:
+                raise CommandError(str(e))
+
+        files = list()
+        for kind in options['kind'] or ATTACHMENT_MODELS:
+            attachments = get_attachment_model(kind).objects \
+                .filter(filemime__startswith='image/') \
+                .exclude(file='') \
+                .only('id', 'file') \
+                .iterator()
+
+            files.extend(attachment.file for attachment in attachments)
+
+        jobs = [(index, file.path, settings.THUMBNAIL_CACHE_DIR, specs)
+                for index, file in enumerate(files)]
+        generated = failed = 0
+
+        with multiprocessing.Pool(processes=options['workers']) as pool:
+            for index, digest, error in pool.imap_unordered(_render, jobs, chunksize=4):
+                if digest:
+                    set_digest(files[index], digest)
+                    generated += 1
+                else:
+                    failed += 1
+                    self.stderr.write("%s: %s" % (files[index].name, error))
+
+        self.stdout.write("%s attachment processed, %s failed." % (generated, failed))
@@ -0,0 +1,24 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from .abstract import AbstractCommonField
+
+
+class AbstractBlob(AbstractCommonField):
+    """Uploaded content stored once by `utils.files.ContentAddressedStorage`"""
+    digest = models.CharField(max_length=64, unique=True, editable=False)
+    name = models.CharField(max_length=255, editable=False)
+    size = models.BigIntegerField(editable=False)
+    mimetype = models.CharField(max_length=255, editable=False)
+
+    # file field referencing this blob
+    refcount = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+        app_label = 'procure'
+        verbose_name = _("Blob")
+        verbose_name_plural = _("Blobs")
+
+    def __str__(self) -> str:
+        return self.name
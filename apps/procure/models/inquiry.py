@@ -7,11 +7,18 @@ from django.conf import settings
 from django.utils import timezone
 from taggit.managers import TaggableManager
 
+from utils import events
+from utils.files import ContentAddressedStorage, fill_file_metadata
+from utils.mixin.generals import DEFERRED, TrackedFieldsMixin
+from apps.procure import settings as procure_settings
+from apps.procure.utils.tags import normalize_tags
 from .abstract import AbstractCommonField
 from .tag import TagItem
 
+INQUIRY_OPEN_DAYS = procure_settings.INQUIRY_OPEN_DAYS
 
-class AbstractInquiry(AbstractCommonField):
+
+class AbstractInquiry(TrackedFieldsMixin, AbstractCommonField):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='inquiries',
                              on_delete=models.CASCADE)
     description = models.TextField(null=True, blank=True)
@@ -21,22 +28,39 @@ class AbstractInquiry(AbstractCommonField):
     close_at = models.DateTimeField(blank=True, null=True)
     is_open = models.BooleanField(default=True)
 
+    tracked_fields = ('keyword',)
+
     class Meta:
         abstract = True
         app_label = 'procure'
         get_latest_by = ['create_at']
         verbose_name = _("Inquiry")
         verbose_name_plural = _("Inquiries")
+        indexes = [
+            models.Index(fields=['is_open', 'close_at', 'create_at']),
+        ]
 
     def __str__(self) -> str:
         return self.keyword
 
+    def is_keyword_changed(self):
+        if not self.has_changed('keyword'):
+            return False
+
+        loaded = self.loaded_value('keyword')
+        return loaded is DEFERRED or normalize_tags(loaded) != normalize_tags(self.keyword)
+
     def save(self, *args, **kwargs):
         if not self.pk:
             open_at = self.open_at or timezone.now()
-            self.close_at = open_at.date() + timezone.timedelta(days=7)
+            self.close_at = open_at.date() + timezone.timedelta(days=INQUIRY_OPEN_DAYS)
+
+        is_keyword_changed = self.is_keyword_changed()
         super().save(*args, **kwargs)
 
+        if is_keyword_changed:
+            events.emit('procure.inquiry.keyword_changed', self)
+
 
 class AbstractInquiryItem(AbstractCommonField):
     inquiry = models.ForeignKey('procure.Inquiry', related_name='items',
@@ -61,11 +85,11 @@ class AbstractInquiryItem(AbstractCommonField):
         return self.label
 
 
-class AbstractInquiryItemAttachment(AbstractCommonField):
+class AbstractInquiryItemAttachment(TrackedFieldsMixin, AbstractCommonField):
     inquiry_item = models.ForeignKey('procure.InquiryItem', on_delete=models.CASCADE,
                                      related_name='attachments')
 
-    file = models.FileField(upload_to='inquiry/%Y/%m/%d')
+    file = models.FileField(upload_to='inquiry/%Y/%m/%d', storage=ContentAddressedStorage())
     filename = models.CharField(max_length=255, editable=False)
     filepath = models.CharField(max_length=255, editable=False)
     filesize = models.IntegerField(editable=False)
@@ -74,6 +98,9 @@ class AbstractInquiryItemAttachment(AbstractCommonField):
     label = models.CharField(max_length=255, null=True, blank=True)
     caption = models.TextField(null=True, blank=True)
 
+    # replaced file released by `utils.files.replace_file_handler`
+    tracked_fields = ('file',)
+
     class Meta:
         abstract = True
         app_label = 'procure'
@@ -84,8 +111,10 @@ class AbstractInquiryItemAttachment(AbstractCommonField):
         return self.label
 
     def save(self, *args, **kwargs):
+        fill_file_metadata(self)
         if not self.label:
-            base = os.path.basename(self.file.name)
+            # stored name is content digest
+            base = self.filename or os.path.basename(self.file.name)
             self.label = base
         super().save(*args, **kwargs)
 
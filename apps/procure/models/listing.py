@@ -2,14 +2,18 @@ import os
 from decimal import Decimal
 
 from django.db import models, transaction
+from django.db.models import Case, ExpressionWrapper, Value, When
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
+from utils.mixin.generals import TrackedFieldsMixin
+from apps.procure.utils.openings import build_bitmap
+from utils.files import ContentAddressedStorage, fill_file_metadata
 from utils.validators import non_python_keyword, identifier_validator
 from .abstract import AbstractCommonField
 
 
-class AbstractListing(AbstractCommonField):
+class AbstractListing(TrackedFieldsMixin, AbstractCommonField):
     class Status(models.TextChoices):
         PENDING = 'pending', _("Pending")
         APPROVED = 'approved', _("Approved")
@@ -22,6 +26,11 @@ class AbstractListing(AbstractCommonField):
     status = models.CharField(choices=Status.choices,
                               default=Status.PENDING, max_length=15)
 
+    # weekly quarter-hour opening slots, see apps.procure.utils.openings
+    opening_bitmap = models.BinaryField(null=True, blank=True, editable=False)
+
+    tracked_fields = ('status',)
+
     class Meta:
         abstract = True
         app_label = 'procure'
@@ -31,23 +40,20 @@ class AbstractListing(AbstractCommonField):
     def __str__(self) -> str:
         return self.label
 
-    @classmethod
-    def from_db(cls, db, field_names, values):
-        instance = super().from_db(db, field_names, values)
-
-        # save original values, when model is loaded from database,
-        # in a separate attribute on the model
-        instance._loaded_values = dict(zip(field_names, values))
-
-        return instance
-
     def save(self, *args, **kwargs):
         if not self._state.adding:
             # check if status is being updated
-            if self._loaded_values['status'] != self.status and self.pk:
+            if self.has_changed('status') and self.pk:
                 self.update_listing_state()
         return super().save(*args, **kwargs)
 
+    def refresh_opening_bitmap(self):
+        # not from prefetched openings, may stale
+        openings = self.openings.model.objects.filter(listing_id=self.pk)
+        self.opening_bitmap = build_bitmap(openings)
+        self.__class__.objects.filter(pk=self.pk) \
+            .update(opening_bitmap=self.opening_bitmap)
+
     @transaction.atomic()
     def update_listing_state(self):
         self.states.model.objects \
@@ -82,11 +88,41 @@ class ListingMemberManager(models.QuerySet):
 
     def mark_undefault(self, exclude_uuid=None):
         instances = self._get_defaults().exclude(uuid=exclude_uuid)
-        if instances.exists():
+        user_ids = set(instances.values_list('user_id', flat=True))
+
+        if user_ids:
             instances.update(is_default=False)
 
+            # queryset update bypass signals
+            from apps.procure.utils.membership import invalidate_memberships
+            invalidate_memberships(*user_ids)
+
+    def with_roles(self):
+        """Annotate `roles`, all role flags packed in one integer"""
+        roles = Value(0)
+        for role, field in self.model.ROLE_FIELDS.items():
+            roles = roles + Case(When(**{field: True}, then=Value(role)),
+                                 default=Value(0))
+
+        return self.annotate(roles=ExpressionWrapper(roles, output_field=models.IntegerField()))
+
 
 class AbstractListingMember(AbstractCommonField):
+    class Role(models.IntegerChoices):
+        ADMIN = 1, _("Admin")
+        CREATOR = 2, _("Creator")
+        DEFAULT = 4, _("Default")
+        ALLOW_PROPOSE = 8, _("Allow Propose")
+        ALLOW_OFFER = 16, _("Allow Offer")
+
+    ROLE_FIELDS = {
+        Role.ADMIN: 'is_admin',
+        Role.CREATOR: 'is_creator',
+        Role.DEFAULT: 'is_default',
+        Role.ALLOW_PROPOSE: 'is_allow_propose',
+        Role.ALLOW_OFFER: 'is_allow_offer',
+    }
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
                              related_name='members')
     listing = models.ForeignKey('procure.Listing', on_delete=models.CASCADE,
@@ -160,13 +196,13 @@ class AbstractListingGallery(AbstractCommonField):
         return self.label
 
 
-class AbstractListingAttachment(AbstractCommonField):
+class AbstractListingAttachment(TrackedFieldsMixin, AbstractCommonField):
     listing = models.ForeignKey('procure.Listing', on_delete=models.CASCADE,
                                 related_name='attachments')
     gallery = models.ForeignKey('procure.ListingGallery', on_delete=models.CASCADE,
                                 related_name='attachments')
 
-    file = models.FileField(upload_to='gallery/%Y/%m/%d')
+    file = models.FileField(upload_to='gallery/%Y/%m/%d', storage=ContentAddressedStorage())
     filename = models.CharField(max_length=255, editable=False)
     filepath = models.CharField(max_length=255, editable=False)
     filesize = models.IntegerField(editable=False)
@@ -177,6 +213,9 @@ class AbstractListingAttachment(AbstractCommonField):
     identifier = models.CharField(max_length=25, null=True, blank=True,
                                   validators=[non_python_keyword, identifier_validator])
 
+    # replaced file released by `utils.files.replace_file_handler`
+    tracked_fields = ('file',)
+
     class Meta:
         abstract = True
         app_label = 'procure'
@@ -187,8 +226,10 @@ class AbstractListingAttachment(AbstractCommonField):
         return self.label
 
     def save(self, *args, **kwargs):
+        fill_file_metadata(self)
         if not self.label:
-            base = os.path.basename(self.file.name)
+            # stored name is content digest
+            base = self.filename or os.path.basename(self.file.name)
             self.label = base
         super().save(*args, **kwargs)
 
@@ -210,11 +251,11 @@ class AbstractListingProduct(AbstractCommonField):
         return self.label
 
 
-class AbstractListingProductAttachment(AbstractCommonField):
+class AbstractListingProductAttachment(TrackedFieldsMixin, AbstractCommonField):
     listing = models.ForeignKey('procure.ListingProduct', on_delete=models.CASCADE,
                                 related_name='attachments')
 
-    file = models.FileField(upload_to='product/%Y/%m/%d')
+    file = models.FileField(upload_to='product/%Y/%m/%d', storage=ContentAddressedStorage())
     filename = models.CharField(max_length=255, editable=False)
     filepath = models.CharField(max_length=255, editable=False)
     filesize = models.IntegerField(editable=False)
@@ -223,6 +264,9 @@ class AbstractListingProductAttachment(AbstractCommonField):
     label = models.CharField(max_length=255, null=True, blank=True)
     caption = models.TextField(null=True, blank=True)
 
+    # replaced file released by `utils.files.replace_file_handler`
+    tracked_fields = ('file',)
+
     class Meta:
         abstract = True
         app_label = 'procure'
@@ -233,8 +277,10 @@ class AbstractListingProductAttachment(AbstractCommonField):
         return self.label
 
     def save(self, *args, **kwargs):
+        fill_file_metadata(self)
         if not self.label:
-            base = os.path.basename(self.file.name)
+            # stored name is content digest
+            base = self.filename or os.path.basename(self.file.name)
             self.label = base
         super().save(*args, **kwargs)
 
@@ -2,6 +2,8 @@ from .inquiry import *
 from .listing import *
 from .propose import *
 from .order import *
+from .blob import *
+from .upload import *
 
 from utils.generals import is_model_registered
 
@@ -204,3 +206,21 @@ if not is_model_registered('procure', 'OrderItem'):
             pass
 
     __all__.append('OrderItem')
+
+
+# 23
+if not is_model_registered('procure', 'Blob'):
+    class Blob(AbstractBlob):
+        class Meta(AbstractBlob.Meta):
+            pass
+
+    __all__.append('Blob')
+
+
+# 24
+if not is_model_registered('procure', 'UploadSession'):
+    class UploadSession(AbstractUploadSession):
+        class Meta(AbstractUploadSession.Meta):
+            pass
+
+    __all__.append('UploadSession')
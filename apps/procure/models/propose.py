@@ -8,7 +8,9 @@ from django.db.models.aggregates import Sum
 from django.utils.translation import gettext_lazy as _
 from django.contrib.humanize.templatetags.humanize import intcomma
 
+from utils.files import ContentAddressedStorage, fill_file_metadata
 from utils.generals import random_string
+from utils.mixin.generals import TrackedFieldsMixin
 from .abstract import AbstractCommonField
 
 
@@ -85,15 +87,15 @@ class AbstractOffer(AbstractCommonField):
     def save(self, *args, **kwargs):
         """ Old records is_newest to False """
         old_instances = self.__class__.objects \
-            .filter(Q(is_newest=True), Q(propose_id=self.propose.id))
+            .filter(Q(is_newest=True), Q(propose_id=self.propose_id))
 
         if self.pk:
             old_instances = old_instances \
                 .filter(create_at__lt=self.create_at) \
                 .exclude(id=self.pk)
 
-        if old_instances.exists():
-            old_instances.update(is_newest=False)
+        # no match simply update nothing
+        old_instances.update(is_newest=False)
 
         if not self.pk:
             self.secret = random_string(6)
@@ -164,6 +166,11 @@ class AbstractNegotiation(AbstractCommonField):
         ordering = ['-create_at']
         verbose_name = _("Negotiation")
         verbose_name_plural = _("Negotiations")
+        # history keyset, see apps.procure.utils.negotiation
+        indexes = [
+            models.Index(fields=['propose', 'create_at', 'id'],
+                         name='negotiation_propose_keyset'),
+        ]
 
     def __str__(self) -> str:
         return self.get_content_type_display()
@@ -185,11 +192,11 @@ class AbstractNegotiationText(AbstractCommonField):
         return self.content
 
 
-class AbstractNegotiationAttachment(AbstractCommonField):
+class AbstractNegotiationAttachment(TrackedFieldsMixin, AbstractCommonField):
     negotiation = models.ForeignKey('procure.Negotiation', on_delete=models.CASCADE,
                                     related_name='attachments')
 
-    file = models.FileField(upload_to='negotiation/%Y/%m/%d')
+    file = models.FileField(upload_to='negotiation/%Y/%m/%d', storage=ContentAddressedStorage())
     filename = models.CharField(max_length=255, editable=False)
     filepath = models.CharField(max_length=255, editable=False)
     filesize = models.IntegerField(editable=False)
@@ -198,6 +205,9 @@ class AbstractNegotiationAttachment(AbstractCommonField):
     label = models.CharField(max_length=255, null=True, blank=True)
     caption = models.TextField(null=True, blank=True)
 
+    # replaced file released by `utils.files.replace_file_handler`
+    tracked_fields = ('file',)
+
     class Meta:
         abstract = True
         app_label = 'procure'
@@ -208,7 +218,9 @@ class AbstractNegotiationAttachment(AbstractCommonField):
         return self.label
 
     def save(self, *args, **kwargs):
+        fill_file_metadata(self)
         if not self.label:
-            base = os.path.basename(self.file.name)
+            # stored name is content digest
+            base = self.filename or os.path.basename(self.file.name)
             self.label = base
         super().save(*args, **kwargs)
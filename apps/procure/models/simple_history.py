@@ -3,6 +3,7 @@ import uuid
 from django.db import models
 from simple_history import register
 from utils.generals import get_model
+from utils.history import BufferedHistoricalRecords
 
 Inquiry = get_model('procure', 'Inquiry')
 InquiryItem = get_model('procure', 'InquiryItem')
@@ -30,67 +31,73 @@ OrderItem = get_model('procure', 'OrderItem')
 
 
 # NEED
-register(Inquiry, app=__package__,
+register(Inquiry, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(InquiryItem, app=__package__,
+register(InquiryItem, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(InquiryLocation, app=__package__,
+register(InquiryLocation, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(InquirySkip, app=__package__,
+register(InquirySkip, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
 
 # TAG
-register(Tag, app=__package__,
+register(Tag, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(TagItem, app=__package__,
+register(TagItem, app=__package__, records_class=BufferedHistoricalRecords,
+         diff_only=True,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
 
 # LISTING
-register(Listing, app=__package__,
+register(Listing, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(ListingMember, app=__package__,
+register(ListingMember, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(ListingOpening, app=__package__,
+register(ListingOpening, app=__package__, records_class=BufferedHistoricalRecords,
+         fields=('listing', 'day', 'open_time', 'close_time', 'is_open',),
+         diff_only=True,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(ListingGallery, app=__package__,
+register(ListingGallery, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(ListingAttachment, app=__package__,
+register(ListingAttachment, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(ListingLocation, app=__package__,
+register(ListingLocation, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(ListingProduct, app=__package__,
+register(ListingProduct, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(ListingProductAttachment, app=__package__,
+register(ListingProductAttachment, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
 
 # OFFER
-register(Propose, app=__package__,
+register(Propose, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(Offer, app=__package__,
+register(Offer, app=__package__, records_class=BufferedHistoricalRecords,
+         fields=('propose', 'user', 'cost', 'discount', 'description',
+                 'can_attend', 'can_attend_radius', 'is_newest',),
+         diff_only=True,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(OfferItem, app=__package__,
+register(OfferItem, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
 
 # ORDER
-register(Order, app=__package__,
+register(Order, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
 
-register(OrderItem, app=__package__,
+register(OrderItem, app=__package__, records_class=BufferedHistoricalRecords,
          history_id_field=models.UUIDField(default=uuid.uuid4))
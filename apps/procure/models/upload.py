@@ -0,0 +1,43 @@
+from django.db import models
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+from .abstract import AbstractCommonField
+
+
+class AbstractUploadSession(AbstractCommonField):
+    """
+    Resumable upload, chunk appended at `offset` to temporary file
+    then attached to target when finalized
+    """
+    class Target(models.TextChoices):
+        INQUIRY_ITEM = 'inquiry_item', _("Inquiry Item")
+        NEGOTIATION = 'negotiation', _("Negotiation")
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _("Pending")
+        COMPLETE = 'complete', _("Complete")
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='upload_sessions')
+    target = models.CharField(choices=Target.choices, max_length=15)
+    target_id = models.BigIntegerField()
+
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    caption = models.TextField(null=True, blank=True)
+
+    status = models.CharField(choices=Status.choices, default=Status.PENDING,
+                              max_length=15)
+    expire_at = models.DateTimeField(db_index=True)
+    attachment_uuid = models.UUIDField(null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+        app_label = 'procure'
+        verbose_name = _("Upload Session")
+        verbose_name_plural = _("Upload Sessions")
+
+    def __str__(self) -> str:
+        return self.filename
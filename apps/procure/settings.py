@@ -1,3 +1,90 @@
 ''' Django procure settings file '''
+import os
+import tempfile
 
 DISTANCE_RADIUS = 15
+
+# inquiry open for days since open_at
+INQUIRY_OPEN_DAYS = 7
+
+# closed by `close_expired_inquiries` each run
+INQUIRY_CLOSE_BATCH_SIZE = 500
+
+# cached {listing_id: roles} map of each user, in seconds
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+# listing geo/keyword snapshot, must be host local directory, each
+# web host run `manage.py build_listing_snapshot` on start and by cron
+LISTING_SNAPSHOT_DIR = os.path.join(tempfile.gettempdir(), 'miniloka', 'listing-snapshot')
+
+# older snapshot ignored, search fallback to database
+LISTING_SNAPSHOT_MAX_AGE = 60 * 15
+
+# seconds between manifest check on each process
+LISTING_SNAPSHOT_CHECK_INTERVAL = 10
+
+# version directories kept on disk
+LISTING_SNAPSHOT_KEEP = 2
+
+# inquiry only matched to listing open at inquiry open_at (or create_at)
+INQUIRY_MATCH_OPEN_LISTING = False
+
+# ranked listing search, `ordering=rank`
+SEARCH_RANK_WEIGHTS = {'relevance': 0.6, 'distance': 0.3, 'recency': 0.1}
+SEARCH_FIELD_WEIGHTS = {'label': 3, 'keyword': 2, 'product': 1}
+
+# kilometers, distance score drop to 1/e at this distance
+SEARCH_DISTANCE_SCALE = 5
+
+# days, recency score halved each half life
+SEARCH_RECENCY_HALF_LIFE = 30
+
+# deepest ranked position served, offset + limit bounded to this
+SEARCH_RANK_MAX_RESULTS = 500
+
+# database fallback only score this many nearest candidate
+SEARCH_RANK_CANDIDATES = 2000
+
+# attachment thumbnail, each side must be one of size
+THUMBNAIL_SIZES = (64, 128, 256, 512, 1024)
+THUMBNAIL_FORMATS = ('webp', 'jpeg', 'png')
+
+# seconds, derivative older than this removed by `purge_thumbnails`
+# and generated again on next request, see THUMBNAIL_CACHE_DIR
+THUMBNAIL_CACHE_EXPIRE = 60 * 60 * 24 * 30
+
+# decode process each web process, seconds request wait for it
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_TIMEOUT = 30
+
+# browser cache of thumbnail response, in seconds
+THUMBNAIL_MAX_AGE = 60 * 60 * 24 * 7
+
+# generated by `regenerate_thumbnails` without option
+THUMBNAIL_PREGENERATE = ((256, 256, 'webp', True),)
+
+# bytes, suggested chunk to client and largest accepted each request
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024
+
+# bytes, whole file
+UPLOAD_MAX_SIZE = 25 * 1024 * 1024
+
+# seconds, unfinished session removed by `purge_upload_sessions`
+UPLOAD_SESSION_EXPIRE = 60 * 60 * 24
+
+# negotiation websocket, message written with bulk_create every
+# interval (seconds) or when batch full
+NEGOTIATION_BATCH_SIZE = 100
+NEGOTIATION_FLUSH_INTERVAL = 0.01
+NEGOTIATION_MAX_LENGTH = 2000
+
+# history page size, default and max
+NEGOTIATION_HISTORY_LIMIT = 30
+NEGOTIATION_HISTORY_MAX_LIMIT = 100
+
+# offer leaderboard of inquiry, seconds kept after inquiry close_at
+LEADERBOARD_TTL = 60 * 60 * 24
+
+# entries sent when websocket connected
+LEADERBOARD_SNAPSHOT_LIMIT = 20
@@ -1,20 +1,26 @@
 import re
 
-from django.conf import settings
 from django.db import transaction
 from django.db.models.functions import ACos, Cos, Sin, Radians
 from django.db.models import Q, F, Value, FloatField
-from django.db.models.expressions import OuterRef, Subquery
-from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 
+from utils import events
 from utils.generals import get_model
+from apps.notifier.delivery import deliver
+from apps.notifier.outbox import publish
 from apps.procure import settings as procure_settings
+from apps.procure.utils import leaderboard
+from apps.procure.utils.membership import get_listing_ids, invalidate_memberships
+from apps.procure.utils.openings import filter_open_at, slot_at
+from apps.procure.utils.snapshot import get_snapshot
+from apps.procure.utils.tags import sync_tags
 from .tasks import (
     send_fcm_notification,
     send_inquiry_notification,
     send_offer_notification,
-    send_order_notification
+    send_order_notification,
+    update_leaderboard
 )
 
 Listing = get_model('procure', 'Listing')
@@ -26,40 +32,53 @@ UserMeta = get_model('person', 'UserMeta')
 Notification = get_model('notifier', 'Notification')
 
 DISTANCE_RADIUS = procure_settings.DISTANCE_RADIUS
-UserModel = get_user_model()
 
 
 def extract_hash_tags(s):
     return set(part[1:] for part in s.split() if part.startswith('#'))
 
 
-@transaction.atomic
-def inquiry_save_handler(sender, instance, created, **kwargs):
-    # hashtags = list(extract_hash_tags(instance.keyword))
-    # tags = ','.join(f'{w}'.format(w) for w in hashtags)
-    keyword = getattr(instance, 'keyword', None)
-    if keyword:
-        tags = keyword.split(' ')
-        instance.tags.set(*tags)
+@events.subscribe('procure.inquiry.keyword_changed')
+def inquiry_keyword_changed_handler(inquiries):
+    sync_tags(inquiries)
 
 
-@transaction.atomic
-def inquiry_location_save_handler(sender, instance, created, **kwargs):
+@events.subscribe('procure.inquirylocation.created', select_related=('inquiry__user',))
+def inquiry_location_created_handler(locations):
+    for instance in locations:
+        notify_inquiry_location(instance)
+
+
+def notify_inquiry_location(instance):
     inquiry = instance.inquiry
     keyword = inquiry.keyword
 
     # filter listing by distance from inquiry
-    if created:
-        latitude = instance.latitude
-        longitude = instance.longitude
-
-        if latitude and longitude:
-            keywords = re.split(r"[^A-Za-z']+", keyword) if keyword else []
-            keyword_query = Q()
-
-            for keyword in keywords:
-                keyword_query |= Q(keyword__icontains=keyword)
-
+    latitude = instance.latitude
+    longitude = instance.longitude
+
+    if latitude and longitude:
+        keywords = re.split(r"[^A-Za-z']+", keyword) if keyword else []
+        keyword_query = Q()
+
+        for keyword in keywords:
+            keyword_query |= Q(keyword__icontains=keyword)
+
+        # only listing open when inquiry opened
+        open_at = None
+        if procure_settings.INQUIRY_MATCH_OPEN_LISTING:
+            open_at = slot_at(inquiry.open_at or inquiry.create_at)
+
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            # approved listing except listing from creator
+            listing_ids, _distances = snapshot.nearby(
+                latitude, longitude, DISTANCE_RADIUS, keywords=keywords,
+                fields=('keyword',), status=Listing.Status.APPROVED,
+                exclude_ids=get_listing_ids(inquiry.user_id), open_at=open_at
+            )
+            listing_ids = listing_ids.tolist()
+        else:
             # Calculate distance
             calculate_distance = Value(6371) * ACos(
                 Cos(Radians(latitude, output_field=FloatField()))
@@ -77,123 +96,143 @@ def inquiry_location_save_handler(sender, instance, created, **kwargs):
                 .annotate(distance=calculate_distance) \
                 .filter(keyword_query, status=Listing.Status.APPROVED,
                         distance__lte=DISTANCE_RADIUS) \
-                .exclude(members__user_id=inquiry.user.id) \
+                .exclude(members__user_id=inquiry.user_id) \
+
+            if open_at is not None:
+                listing_intances = filter_open_at(listing_intances, open_at)
 
             listing_ids = listing_intances.values_list('id', flat=True)
 
-            # get user fcm tokens
-            user_meta_fcm_token = UserMeta.objects \
-                .prefetch_related('user') \
-                .select_related('user') \
-                .filter(user_id=OuterRef('user__id'), meta_key='fcm_token')
-
-            # listing members
-            listing_members = ListingMember.objects \
-                .prefetch_related('listing', 'user') \
-                .select_related('listing', 'user') \
-                .filter(
-                    listing_id__in=listing_ids,
-                    is_allow_offer=True,
-                    is_allow_propose=True
-                )
-
-            # fcm token from listing members
-            member_fcm_tokens = listing_members \
-                .annotate(
-                    fcm_token=Subquery(
-                        user_meta_fcm_token.values('meta_value')[:1]
-                    )
-                ) \
-                .filter(fcm_token__isnull=False) \
-                .values_list('fcm_token', flat=True) \
-                .distinct()
-
-            # send notifications
-            if listing_members.exists():
-                recipients_id = listing_members \
-                    .values_list('user_id', flat=True)
-
-                recipients_user = UserModel.objects \
-                    .filter(id__in=recipients_id) \
-                    .values_list('id', flat=True)
-
-                notifier_context = {
-                    'actor': inquiry.user.id,
-                    'recipient': list(recipients_user),
-                    'action_object': inquiry.id,
-                    'target': list(listing_ids),
-                    'verb': _("mengirim permintaan"),
-                    'data': {
-                        'obtain': 'inquiry'
-                    }
+        # listing members
+        listing_members = ListingMember.objects \
+            .filter(
+                listing_id__in=listing_ids,
+                is_allow_offer=True,
+                is_allow_propose=True
+            )
+
+        # send notifications
+        recipients_user = list(listing_members.values_list('user_id', flat=True).distinct())
+        if recipients_user:
+            notifier_context = {
+                'actor': inquiry.user_id,
+                'recipient': recipients_user,
+                'action_object': inquiry.id,
+                'target': list(listing_ids),
+                'verb': _("mengirim permintaan"),
+                'data': {
+                    'obtain': 'inquiry'
                 }
+            }
 
-                if settings.DEBUG:
-                    transaction.on_commit(
-                        lambda: send_inquiry_notification(**notifier_context))  # without celery
-                else:
-                    transaction.on_commit(
-                        lambda: send_inquiry_notification.delay(**notifier_context))  # with celery
+            publish(send_inquiry_notification, **notifier_context)
 
-            fcm_context = {
-                'fcm_tokens': list(member_fcm_tokens),
+            # app opened get it over websocket, push only to the rest
+            event = {
+                'obtain': 'inquiry',
+                'verb': str(_("mengirim permintaan")),
+                'inquiry': str(inquiry.uuid),
                 'inquiry_user': inquiry.user.name,
                 'inquiry_keyword': keyword,
             }
 
-            if member_fcm_tokens.exists():
-                if settings.DEBUG:
-                    transaction.on_commit(
-                        lambda: send_fcm_notification(**fcm_context))  # without celery
-                else:
-                    transaction.on_commit(
-                        lambda: send_fcm_notification.delay(**fcm_context))  # with celery
-
-
-@transaction.atomic()
-def listing_member_save_handler(sender, instance, created, **kwargs):
-    if instance.is_default == True:
-        # Each member can active on one listing
-        # member can select default listing
-        cls = instance.__class__
-        cls.objects \
-            .filter(user_id=instance.user.id) \
-            .mark_undefault(exclude_uuid=instance.uuid)
+            deliver(recipients_user, event,
+                    push=lambda user_ids: push_inquiry(inquiry, keyword, user_ids))
 
 
-@transaction.atomic()
-def listing_save_handler(sender, instance, created, **kwargs):
-    if created:
-        # LOCATION
-        if not hasattr(instance, 'location'):
-            _location, _created = ListingLocation.objects \
-                .get_or_create(listing=instance)
+def push_inquiry(inquiry, keyword, user_ids):
+    # get user fcm tokens
+    fcm_tokens = list(
+        UserMeta.objects
+        .filter(user_id__in=user_ids, meta_key='fcm_token')
+        .values_list('meta_value', flat=True)
+        .distinct()
+    )
 
-        # STATE
-        _states, _created = ListingState.objects \
-            .get_or_create(listing=instance, status=instance.status)
+    if fcm_tokens:
+        fcm_context = {
+            'fcm_tokens': fcm_tokens,
+            'inquiry_user': inquiry.user.name,
+            'inquiry_keyword': keyword,
+        }
+
+        publish(send_fcm_notification, **fcm_context)
+
+
+@events.subscribe('procure.listingmember.saved')
+def listing_member_saved_handler(members):
+    # Each member can active on one listing
+    # member can select default listing, last saved win
+    defaults = {instance.user_id: instance for instance in members
+                if instance.is_default == True}
+
+    for instance in defaults.values():
+        ListingMember.objects \
+            .filter(user_id=instance.user_id) \
+            .mark_undefault(exclude_uuid=instance.uuid)
 
-        # OPENINGS
-        if not instance.openings.exists():
-            openings = list()
-            days = dict(ListingOpening.Day.choices)
+
+def member_roles_handler(sender, instance, **kwargs):
+    invalidate_memberships(instance.user_id)
+
+
+@events.subscribe('procure.listing.created')
+def listing_created_handler(listings):
+    listing_ids = [instance.id for instance in listings]
+
+    # LOCATION
+    located = set(
+        ListingLocation.objects
+        .filter(listing_id__in=listing_ids)
+        .values_list('listing_id', flat=True)
+    )
+
+    ListingLocation.objects.bulk_create([
+        ListingLocation(listing=instance) for instance in listings
+        if instance.id not in located
+    ])
+
+    # STATE
+    states = set(
+        ListingState.objects
+        .filter(listing_id__in=listing_ids)
+        .values_list('listing_id', 'status')
+    )
+
+    ListingState.objects.bulk_create([
+        ListingState(listing=instance, status=instance.status) for instance in listings
+        if (instance.id, instance.status) not in states
+    ])
+
+    # OPENINGS
+    opened = set(
+        ListingOpening.objects
+        .filter(listing_id__in=listing_ids)
+        .values_list('listing_id', flat=True)
+    )
+
+    openings = list()
+    days = dict(ListingOpening.Day.choices)
+    for instance in listings:
+        if instance.id not in opened:
             for day, name in days.items():
                 o = ListingOpening(day=day, listing=instance)
                 openings.append(o)
 
-            if len(openings) > 0:
-                ListingOpening.objects \
-                    .bulk_create(openings, ignore_conflicts=False)
+    if len(openings) > 0:
+        ListingOpening.objects \
+            .bulk_create(openings, ignore_conflicts=False)
 
 
-@transaction.atomic()
-def offer_save_handler(sender, instance, created, **kwargs):
-    if created:
+@events.subscribe('procure.offer.created', select_related=('propose__inquiry',))
+def offer_created_handler(offers):
+    for instance in offers:
+        inquiry = instance.propose.inquiry
         notifier_context = {
-            'actor': instance.user.id,
-            'recipient': instance.propose.inquiry.user.id,
+            'actor': instance.user_id,
+            'recipient': inquiry.user_id,
             'action_object': instance.id,
-            'target': instance.propose.inquiry.id,
+            'target': inquiry.id,
             'verb': _("memberi penawaran"),
             'data': {
                 'obtain': 'offer'
@@ -202,39 +241,45 @@ def offer_save_handler(sender, instance, created, **kwargs):
 
         Notification.objects \
             .mark_as_read(
-                recipient=instance.propose.inquiry.user,
-                actor_object_id=instance.user.id,
-                target_object_id=instance.propose.inquiry.id
+                recipient=inquiry.user_id,
+                actor_object_id=instance.user_id,
+                target_object_id=inquiry.id
             )
 
-        if settings.DEBUG:
-            transaction.on_commit(
-                lambda: send_offer_notification(**notifier_context))  # without celery
-        else:
-            transaction.on_commit(
-                lambda: send_offer_notification.delay(**notifier_context))  # with celery
+        publish(send_offer_notification, **notifier_context)
+
+    # relayed after commit, item cost written by then
+    publish(update_leaderboard, offer_ids=[instance.id for instance in offers])
 
 
-@transaction.atomic()
-def inquiry_skip_save_handler(sender, instance, created, **kwargs):
-    if created:
-        default_listing = instance.user.default_listing
+@events.subscribe('procure.inquiry.closed')
+def inquiry_closed_handler(inquiries):
+    inquiry_ids = [instance.id for instance in inquiries]
+    transaction.on_commit(lambda: leaderboard.remove(inquiry_ids))
+
+
+@events.subscribe('procure.inquiryskip.created', select_related=('user', 'inquiry',))
+def inquiry_skip_created_handler(skips):
+    for instance in skips:
+        default_listing_id = instance.user.default_listing_id
+        if default_listing_id is None:
+            continue
 
         Notification.objects \
             .mark_as_read(
-                recipient=instance.user,
-                actor_object_id=instance.inquiry.user.id,
-                target_object_id=default_listing.id,
+                recipient=instance.user_id,
+                actor_object_id=instance.inquiry.user_id,
+                target_object_id=default_listing_id,
                 action_object_id=instance.inquiry.id
             )
 
 
-@transaction.atomic()
-def order_save_handler(sender, instance, created, **kwargs):
-    if created:
+@events.subscribe('procure.order.created', select_related=('offer',))
+def order_created_handler(orders):
+    for instance in orders:
         notifier_context = {
-            'actor': instance.user.id,
-            'recipient': instance.offer.user.id,
+            'actor': instance.user_id,
+            'recipient': instance.offer.user_id,
             'action_object': instance.id,
             'target': instance.offer.id,
             'verb': _("menerima penawaran"),
@@ -243,9 +288,4 @@ def order_save_handler(sender, instance, created, **kwargs):
             }
         }
 
-        if settings.DEBUG:
-            transaction.on_commit(
-                lambda: send_order_notification(**notifier_context))  # without celery
-        else:
-            transaction.on_commit(
-                lambda: send_order_notification.delay(**notifier_context))  # with celery
+        publish(send_order_notification, **notifier_context)
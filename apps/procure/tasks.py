@@ -3,12 +3,16 @@ import json
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.utils import timezone
 
 # Celery config
 from celery import shared_task
 
+from apps.notifier.outbox import OutboxTask
 from apps.notifier.signals import notify
+from utils import events
 from utils.generals import get_model
+from apps.procure import settings as procure_settings
 
 UserModel = get_user_model()
 Listing = get_model('procure', 'Listing')
@@ -17,7 +21,7 @@ Offer = get_model('procure', 'Offer')
 Order = get_model('procure', 'Order')
 
 
-@shared_task
+@shared_task(base=OutboxTask)
 def send_fcm_notification(**context):
     url = 'https://fcm.googleapis.com/fcm/send'
     headers = {
@@ -35,7 +39,7 @@ def send_fcm_notification(**context):
     requests.post(url, headers=headers, data=json.dumps(data))
 
 
-@shared_task
+@shared_task(base=OutboxTask)
 def send_inquiry_notification(**context):
     actor = context.pop('actor')
     recipient = context.pop('recipient')
@@ -56,7 +60,7 @@ def send_inquiry_notification(**context):
     )
 
 
-@shared_task
+@shared_task(base=OutboxTask)
 def send_offer_notification(**context):
     actor = context.pop('actor')
     recipient = context.pop('recipient')
@@ -77,7 +81,7 @@ def send_offer_notification(**context):
     )
 
 
-@shared_task
+@shared_task(base=OutboxTask)
 def send_order_notification(**context):
     actor = context.pop('actor')
     recipient = context.pop('recipient')
@@ -96,3 +100,74 @@ def send_order_notification(**context):
         target=target_obj,
         **context
     )
+
+
+@shared_task(base=OutboxTask)
+def update_leaderboard(offer_ids):
+    """Put committed offer to its inquiry leaderboard and broadcast rank"""
+    from apps.procure.utils.leaderboard import record_offers
+
+    changes = record_offers(offer_ids)
+    return sum(len(entries) for entries in changes.values())
+
+
+@shared_task
+def close_expired_inquiries(batch_size=None):
+    """
+    Close inquiry passed close_at in batch, each batch emit
+    `procure.inquiry.closed` in its own transaction
+    """
+    batch_size = batch_size or procure_settings.INQUIRY_CLOSE_BATCH_SIZE
+    closed = 0
+
+    while True:
+        now = timezone.now()
+        inquiry_ids = list(
+            Inquiry.objects
+            .filter(is_open=True, close_at__lte=now)
+            .order_by('close_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+
+        if not inquiry_ids:
+            break
+
+        with events.atomic():
+            # other worker may close it first
+            inquiries = Inquiry.objects.filter(id__in=inquiry_ids, is_open=True)
+            expired_ids = list(inquiries.select_for_update().values_list('id', flat=True))
+            Inquiry.objects.filter(id__in=expired_ids).update(is_open=False, update_at=now)
+            events.emit('procure.inquiry.closed', Inquiry.objects.filter(id__in=expired_ids))
+
+        closed += len(expired_ids)
+        if len(inquiry_ids) < batch_size:
+            break
+    return closed
+
+
+@shared_task
+def build_listing_snapshot():
+    """
+    Rebuild geo/keyword snapshot used by search and inquiry matching,
+    only on host of the worker, see `build_listing_snapshot` command
+    """
+    from apps.procure.utils.snapshot import build_snapshot
+
+    manifest = build_snapshot()
+    return manifest['count']
+
+
+@shared_task
+def purge_upload_sessions():
+    """Remove expired upload session and its part file"""
+    from apps.procure.utils.upload import purge_expired_sessions
+
+    return purge_expired_sessions()
+
+
+@shared_task
+def purge_thumbnails():
+    """Remove expired attachment thumbnail, generated again on request"""
+    from apps.procure.utils.thumbnail import purge_expired_thumbnails
+
+    return purge_expired_thumbnails()
@@ -1,3 +1,846 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import datetime
+import tempfile
 
-# Create your tests here.
+from unittest import mock
+
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+
+import redis
+
+from rest_framework.test import APIClient
+
+from utils import media
+from utils.cache import get_redis_connection
+from utils.generals import get_model
+from apps.person.tests import RedisTestCase
+from apps.procure import settings as procure_settings
+from apps.procure.utils import leaderboard
+from apps.procure.utils.negotiation import (
+    CursorError, decode_cursor, encode_cursor, get_history, persist_messages)
+from apps.procure.utils.openings import (
+    SLOTS_PER_DAY, SLOTS_PER_WEEK, build_bitmap, filter_open_at, is_open_at,
+    parse_open_at, slot_at)
+from apps.procure.utils.ranking import rank_from_database, rank_limit, rank_score, top_k
+from apps.procure.utils.snapshot import ListingSnapshot, build_snapshot
+from apps.procure.utils.tags import sync_tags
+from apps.procure.utils.upload import part_path, write_chunk
+
+UserModel = get_user_model()
+Blob = get_model('procure', 'Blob')
+Inquiry = get_model('procure', 'Inquiry')
+Listing = get_model('procure', 'Listing')
+ListingLocation = get_model('procure', 'ListingLocation')
+ListingOpening = get_model('procure', 'ListingOpening')
+ListingProduct = get_model('procure', 'ListingProduct')
+Negotiation = get_model('procure', 'Negotiation')
+Offer = get_model('procure', 'Offer')
+Propose = get_model('procure', 'Propose')
+InquiryItem = get_model('procure', 'InquiryItem')
+InquiryItemAttachment = get_model('procure', 'InquiryItemAttachment')
+UploadSession = get_model('procure', 'UploadSession')
+
+
+class MediaTestCase(TestCase):
+    """Own MEDIA_ROOT for each test, removed after"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+
+        media_settings = override_settings(
+            MEDIA_ROOT=media_root, UPLOAD_SESSION_DIR=os.path.join(media_root, '.upload'))
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = UserModel.objects.create_user('buyer', 'secret', email='buyer@example.com')
+        self.inquiry = Inquiry.objects.create(user=self.user, keyword='semen')
+        self.item = InquiryItem.objects.create(inquiry=self.inquiry, label='Semen')
+
+    def attach(self, content, name='nota.pdf'):
+        attachment = InquiryItemAttachment(inquiry_item=self.item)
+        attachment.file = ContentFile(content, name=name)
+        attachment.save()
+        return attachment
+
+    def blob(self, attachment):
+        return Blob.objects.get(name=attachment.file.name)
+
+
+class ContentAddressedStorageTest(MediaTestCase):
+
+    def test_identical_upload_share_blob(self):
+        first = self.attach(b'same content')
+        second = self.attach(b'same content', name='copy.pdf')
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(Blob.objects.count(), 1)
+        self.assertEqual(self.blob(first).refcount, 2)
+
+    def test_rolled_back_save_drop_reference(self):
+        first = self.attach(b'same content')
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.attach(b'same content')
+                raise RuntimeError
+
+        self.assertEqual(self.blob(first).refcount, 1)
+
+    def test_delete_one_of_two_reference_keep_file(self):
+        first = self.attach(b'same content')
+        second = self.attach(b'same content')
+        blob = self.blob(first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 1)
+        self.assertTrue(first.file.storage.exists(first.file.name))
+
+    def test_delete_last_reference_remove_file(self):
+        attachment = self.attach(b'only content')
+        name = attachment.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.delete()
+
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+        self.assertFalse(attachment.file.storage.exists(name))
+
+    def test_replace_file_release_old_blob(self):
+        attachment = self.attach(b'old content')
+        old_name = attachment.file.name
+
+        attachment = InquiryItemAttachment.objects.get(id=attachment.id)
+        attachment.file = ContentFile(b'new content', name='nota.pdf')
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.save()
+
+        self.assertNotEqual(attachment.file.name, old_name)
+        self.assertFalse(Blob.objects.filter(name=old_name).exists())
+        self.assertFalse(attachment.file.storage.exists(old_name))
+        self.assertEqual(self.blob(attachment).refcount, 1)
+
+    def test_reupload_same_content_keep_refcount(self):
+        attachment = self.attach(b'same content')
+
+        attachment = InquiryItemAttachment.objects.get(id=attachment.id)
+        attachment.file = ContentFile(b'same content', name='again.pdf')
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.save()
+
+        blob = self.blob(attachment)
+        self.assertEqual(blob.refcount, 1)
+        self.assertTrue(attachment.file.storage.exists(blob.name))
+
+
+class UploadApiTest(MediaTestCase):
+    content = b'0123456789' * 3
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        response = self.client.post(reverse('procure_api:upload-list'), {
+            'target': 'inquiry_item',
+            'target_uuid': str(self.item.uuid),
+            'filename': 'nota.pdf',
+            'size': len(self.content),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.session = UploadSession.objects.get(uuid=response.data['uuid'])
+
+    def put_chunk(self, start, end):
+        return self.client.generic(
+            'PUT', reverse('procure_api:upload-chunk', kwargs={'uuid': self.session.uuid}),
+            self.content[start:end + 1], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE='bytes %s-%s/%s' % (start, end, len(self.content))
+        )
+
+    def finalize(self):
+        return self.client.post(
+            reverse('procure_api:upload-finalize', kwargs={'uuid': self.session.uuid}))
+
+    def test_chunk_ahead_of_offset_rejected(self):
+        response = self.put_chunk(10, 19)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 0)
+
+    def test_stale_offset_conflict_return_current_offset(self):
+        self.assertEqual(self.put_chunk(0, 9).status_code, 200)
+
+        # retried first chunk after it already written
+        response = self.put_chunk(0, 9)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 10)
+
+    def test_resumed_chunks_finalized(self):
+        for start in (0, 10, 20):
+            response = self.put_chunk(start, start + 9)
+            self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.finalize()
+        self.assertEqual(response.status_code, 201)
+
+        attachment = InquiryItemAttachment.objects.get(inquiry_item=self.item)
+        self.assertEqual(attachment.filesize, len(self.content))
+        with attachment.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_losing_parallel_chunk_not_overwrite(self):
+        # both request passed offset check before either wrote
+        stale = UploadSession.objects.get(id=self.session.id)
+        self.assertEqual(self.put_chunk(0, 9).status_code, 200)
+
+        self.assertIsNone(write_chunk(stale, io.BytesIO(b'X' * 10), 0, 10))
+        with open(part_path(self.session), 'rb') as f:
+            self.assertEqual(f.read(), self.content[:10])
+
+        # chunk file never left behind
+        self.assertEqual(os.listdir(os.path.dirname(part_path(self.session))),
+                         [os.path.basename(part_path(self.session))])
+
+    def test_short_body_kept(self):
+        self.assertEqual(write_chunk(self.session, io.BytesIO(self.content[:4]), 0, 10), 4)
+
+        response = self.put_chunk(4, 13)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['offset'], 14)
+
+    def test_finalize_size_mismatch_start_over(self):
+        for start in (0, 10, 20):
+            self.put_chunk(start, start + 9)
+
+        # part file lost bytes, ie: written by host without shared directory
+        with open(part_path(self.session), 'r+b') as f:
+            f.truncate(len(self.content) - 5)
+
+        response = self.finalize()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 0)
+        self.assertFalse(InquiryItemAttachment.objects.filter(inquiry_item=self.item).exists())
+
+
+class TagSyncTest(TestCase):
+    words = ('semen', 'pasir', 'besi', 'cat', 'kayu', 'pipa', 'genteng', 'keramik')
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user('buyer', 'secret', email='buyer@example.com')
+        self.inquiry = Inquiry.objects.create(user=self.user, keyword='semen pasir')
+
+    def tag_queries(self, change):
+        with CaptureQueriesContext(connection) as queries:
+            change()
+        return [query['sql'] for query in queries.captured_queries
+                if 'procure_tag' in query['sql']]
+
+    def tag_names(self):
+        return set(self.inquiry.tags.values_list('name', flat=True))
+
+    def test_unchanged_keyword_no_tag_query(self):
+        inquiry = Inquiry.objects.get(id=self.inquiry.id)
+        inquiry.keyword = 'Semen  PASIR'
+
+        self.assertEqual(self.tag_queries(inquiry.save), [])
+        self.assertEqual(self.tag_names(), {'semen', 'pasir'})
+
+    def test_changed_keyword_constant_queries(self):
+        counts = list()
+        for size in (1, 4, 8):
+            # every tag new, every previous item removed
+            self.inquiry.keyword = ' '.join('%s%s' % (word, size) for word in self.words[:size])
+            counts.append(len(self.tag_queries(self.inquiry.save)))
+            self.assertEqual(len(self.tag_names()), size)
+
+        # lookup, create missing, lookup created, items, add item,
+        # collect and delete removed item
+        self.assertEqual(counts, [7, 7, 7])
+
+    def test_existing_tags_matched_by_name(self):
+        other = Inquiry.objects.create(user=self.user, keyword='besi semen')
+
+        with self.assertNumQueries(5):
+            # lookup, items, add item, collect and delete removed item
+            self.inquiry.keyword = 'semen besi'
+            sync_tags([self.inquiry])
+
+        self.assertEqual(self.tag_names(), {'semen', 'besi'})
+        self.assertEqual(get_model('procure', 'Tag').objects
+                         .filter(name__in=('semen', 'besi')).count(), 2)
+        self.assertEqual(set(other.tags.values_list('name', flat=True)), {'semen', 'besi'})
+
+
+class MediaServeTest(MediaTestCase):
+    content = b'0123456789'
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.path = self.write('thumbnail/nota.txt')
+        self.blob_path = self.write('blob/ab/cd/abcd.txt')
+
+    def write(self, name):
+        fullpath = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(fullpath), exist_ok=True)
+        with open(fullpath, 'wb') as f:
+            f.write(self.content)
+        return name
+
+    def serve(self, path=None, method='get', **headers):
+        request = getattr(self.factory, method)('/media/', **headers)
+        response = media.serve(request, path or self.path)
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.serve()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=%s' % settings.MEDIA_CACHE_MAX_AGE,
+                      response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_blob_cached_immutable(self):
+        response = self.serve(self.blob_path)
+        self.assertIn('max-age=%s' % media.IMMUTABLE_MAX_AGE, response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_range(self):
+        response = self.serve(HTTP_RANGE='bytes=2-5')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+
+    def test_suffix_and_open_range(self):
+        self.assertEqual(self.body(self.serve(HTTP_RANGE='bytes=-3')), b'789')
+        self.assertEqual(self.body(self.serve(HTTP_RANGE='bytes=7-')), b'789')
+        # end past file clamped
+        self.assertEqual(self.body(self.serve(HTTP_RANGE='bytes=8-100')), b'89')
+
+    def test_unsatisfiable_range(self):
+        for header in ('bytes=10-', 'bytes=5-2', 'bytes=-0'):
+            response = self.serve(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_unsupported_range_send_whole_file(self):
+        response = self.serve(HTTP_RANGE='bytes=0-1,4-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_if_range(self):
+        etag = self.serve()['ETag']
+
+        response = self.serve(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+        # file changed since client got part of it
+        response = self.serve(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+
+    def test_not_modified(self):
+        first = self.serve()
+
+        response = self.serve(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        response = self.serve(HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.serve(HTTP_IF_NONE_MATCH='"other"',
+                              HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_sendfile_handed_to_front_server(self):
+        with override_settings(MEDIA_SENDFILE_BACKEND='nginx'):
+            response = self.serve(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         settings.MEDIA_ACCEL_REDIRECT_URL + self.path)
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_SENDFILE_BACKEND='apache'):
+            response = self.serve()
+        self.assertEqual(response['X-Sendfile'],
+                         os.path.join(settings.MEDIA_ROOT, self.path))
+
+    def test_private_and_missing_not_served(self):
+        self.write('.upload/part')
+
+        for path in ('.upload/part', 'thumbnail/missing.txt', 'thumbnail', '../etc/passwd'):
+            with self.assertRaises(Http404, msg=path):
+                self.serve(path)
+
+    def test_only_safe_method(self):
+        self.assertEqual(self.serve(method='head').status_code, 200)
+        self.assertEqual(self.serve(method='post').status_code, 405)
+
+
+def opening(day, open_time, close_time, is_open=True):
+    return ListingOpening(day=day, open_time=datetime.time(*open_time),
+                          close_time=datetime.time(*close_time), is_open=is_open)
+
+
+def open_slots(bitmap):
+    return [slot for slot in range(SLOTS_PER_WEEK) if is_open_at(bitmap, slot)]
+
+
+class OpeningBitmapTest(SimpleTestCase):
+    MO, SA, SU = 0, 5, 6
+
+    def test_slot_boundaries(self):
+        slots = open_slots(build_bitmap([opening(self.MO, (8, 0), (17, 0))]))
+
+        # 08:00 open, 17:00 already closed
+        self.assertEqual(slots, list(range(32, 68)))
+
+    def test_open_time_inside_slot_round_up(self):
+        slots = open_slots(build_bitmap([opening(self.MO, (8, 10), (17, 10))]))
+
+        # 08:00 slot start before opened, 17:00 slot start while still open
+        self.assertEqual(slots, list(range(33, 69)))
+
+    def test_closing_past_midnight(self):
+        slots = open_slots(build_bitmap([opening(self.SA, (22, 0), (2, 0))]))
+
+        saturday = self.SA * SLOTS_PER_DAY
+        self.assertEqual(slots, list(range(saturday + 88, saturday + SLOTS_PER_DAY + 8)))
+
+    def test_sunday_past_midnight_continue_monday(self):
+        slots = open_slots(build_bitmap([opening(self.SU, (22, 0), (2, 0))]))
+
+        sunday = self.SU * SLOTS_PER_DAY
+        self.assertEqual(slots, list(range(0, 8)) + list(range(sunday + 88, SLOTS_PER_WEEK)))
+
+    def test_same_time_open_whole_day(self):
+        slots = open_slots(build_bitmap([opening(self.SU, (0, 0), (0, 0))]))
+        self.assertEqual(slots, list(range(self.SU * SLOTS_PER_DAY, SLOTS_PER_WEEK)))
+
+    def test_closed_day_ignored(self):
+        openings = [opening(day, (8, 0), (17, 0), is_open=day != self.MO) for day in range(7)]
+        slots = open_slots(build_bitmap(openings))
+
+        self.assertNotIn(40, slots)
+        self.assertIn(SLOTS_PER_DAY + 40, slots)
+        self.assertEqual(open_slots(build_bitmap([opening(self.MO, (0, 0), (0, 0), False)])), [])
+
+    def test_missing_bitmap_closed(self):
+        self.assertFalse(is_open_at(None, 0))
+        self.assertFalse(is_open_at(b'', 0))
+
+    def test_slot_at(self):
+        # 2024-01-01 is Monday
+        self.assertEqual(slot_at(datetime.datetime(2024, 1, 1, 0, 14)), 0)
+        self.assertEqual(slot_at(datetime.datetime(2024, 1, 2, 0, 15)), SLOTS_PER_DAY + 1)
+        self.assertEqual(slot_at(datetime.datetime(2024, 1, 7, 23, 59)), SLOTS_PER_WEEK - 1)
+
+        # aware value counted in local time, Asia/Jakarta
+        utc = datetime.datetime(2024, 1, 1, 1, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(slot_at(utc), slot_at(timezone.localtime(utc).replace(tzinfo=None)))
+
+    def test_parse_open_at(self):
+        self.assertIsNone(parse_open_at(None))
+        self.assertIsNone(parse_open_at(''))
+        self.assertEqual(parse_open_at('2024-01-01T08:00:00'), 32)
+        self.assertEqual(parse_open_at('2024-01-01T01:00:00+00:00'),
+                         slot_at(datetime.datetime(2024, 1, 1, 1, 0,
+                                                   tzinfo=datetime.timezone.utc)))
+
+        with mock.patch('django.utils.timezone.now',
+                        return_value=datetime.datetime(2024, 1, 2, 8, 0)):
+            self.assertEqual(parse_open_at('now'), SLOTS_PER_DAY + 32)
+
+    def test_parse_open_at_invalid(self):
+        for value in ('tomorrow', '2024-01-01', '2024-13-01T08:00:00', '2024-01-01T25:00:00'):
+            with self.assertRaises(ValueError, msg=value):
+                parse_open_at(value)
+
+
+class OpeningFilterTest(TestCase):
+
+    def setUp(self):
+        weekday = [opening(day, (8, 0), (17, 0)) for day in range(5)]
+        night = [opening(5, (22, 0), (2, 0)), opening(6, (22, 30), (1, 15))]
+        always = [opening(day, (0, 0), (0, 0)) for day in range(7)]
+        closed = [opening(day, (8, 0), (17, 0), is_open=False) for day in range(7)]
+
+        self.listings = [self.create_listing(openings)
+                         for openings in (weekday, night, always, closed)]
+        # never refreshed, bitmap NULL
+        self.listings.append(self.create_listing(None))
+
+    def create_listing(self, openings):
+        listing = Listing.objects.create(label='Toko', keyword='semen',
+                                         status=Listing.Status.APPROVED)
+        ListingLocation.objects.filter(listing=listing).update(latitude=-6.2, longitude=106.8)
+
+        if openings is not None:
+            for instance in openings:
+                ListingOpening.objects.filter(listing=listing, day=instance.day).update(
+                    open_time=instance.open_time, close_time=instance.close_time,
+                    is_open=instance.is_open)
+            listing.refresh_opening_bitmap()
+        return listing
+
+    def test_database_match_bitmap(self):
+        queryset = Listing.objects.filter(id__in=[listing.id for listing in self.listings])
+        bitmaps = dict(queryset.values_list('id', 'opening_bitmap'))
+
+        for slot in range(SLOTS_PER_WEEK):
+            expected = {listing_id for listing_id, bitmap in bitmaps.items()
+                        if is_open_at(bitmap and bytes(bitmap), slot)}
+            self.assertEqual(set(filter_open_at(queryset, slot).values_list('id', flat=True)),
+                             expected, slot)
+
+    def test_database_match_snapshot(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        snapshot = ListingSnapshot(path, build_snapshot(path))
+        queryset = Listing.objects.filter(id__in=[listing.id for listing in self.listings])
+
+        for slot in range(SLOTS_PER_WEEK):
+            ids, _distances = snapshot.nearby(-6.2, 106.8, 1, open_at=slot)
+            self.assertEqual(set(filter_open_at(queryset, slot).values_list('id', flat=True)),
+                             set(ids.tolist()), slot)
+
+        # weekday listing at Monday 08:00, night one at Sunday 00:30
+        self.assertEqual(list(filter_open_at(queryset, 32).order_by('id')
+                              .values_list('id', flat=True)),
+                         [self.listings[0].id, self.listings[2].id])
+        self.assertIn(self.listings[1].id, filter_open_at(queryset, 6 * SLOTS_PER_DAY + 2)
+                      .values_list('id', flat=True))
+
+
+class RankingTest(SimpleTestCase):
+    now = 1700000000
+
+    def test_score_weighted(self):
+        scores = rank_score([1, 0, 0, 0], [0, 0, 10, 0], [self.now] * 3 + [self.now - 86400 * 30],
+                            now=self.now)
+
+        # relevance first, then nearer, then newer
+        self.assertEqual(top_k(scores, 4).tolist(), [0, 1, 3, 2])
+        self.assertAlmostEqual(scores[0], 1)
+        # one half life old keep half of recency weight
+        self.assertAlmostEqual(scores[1] - scores[3],
+                               procure_settings.SEARCH_RANK_WEIGHTS['recency'] / 2)
+
+    def test_future_create_at_not_boost(self):
+        scores = rank_score([0, 0], [0, 0], [self.now, self.now + 86400], now=self.now)
+        self.assertEqual(scores[0], scores[1])
+
+    def test_top_k_tie_ordered_by_index(self):
+        scores = np.array([0.5, 0.9, 0.5, 0.9, 0.5, 0.1, 0.5])
+
+        self.assertEqual(top_k(scores, 3).tolist(), [1, 3, 0])
+        self.assertEqual(top_k(scores, 5).tolist(), [1, 3, 0, 2, 4])
+        self.assertEqual(top_k(np.zeros(50), 4).tolist(), [0, 1, 2, 3])
+
+    def test_top_k_same_as_full_sort(self):
+        rand = np.random.default_rng(1)
+        for size in (1, 7, 100, 1000):
+            # rounded, so many ties
+            scores = np.round(rand.random(size), 2)
+            expected = np.argsort(-scores, kind='stable')
+
+            for k in (0, 1, 5, size - 1, size, size + 10):
+                self.assertEqual(top_k(scores, k).tolist(), expected[:max(k, 0)].tolist(),
+                                 (size, k))
+
+    def test_rank_limit_bounded(self):
+        self.assertEqual(rank_limit(None, 20), 20)
+        self.assertEqual(rank_limit(100, 20), 120)
+        self.assertEqual(rank_limit(10 ** 6, 20), procure_settings.SEARCH_RANK_MAX_RESULTS)
+
+
+class RankFromDatabaseTest(TestCase):
+
+    def setUp(self):
+        self.listings = [
+            Listing.objects.create(label=label, keyword=keyword, status=Listing.Status.APPROVED)
+            for label, keyword in (('Toko Besi', 'besi'), ('Toko Kayu', 'kayu'),
+                                   ('Toko Cat', 'cat'), ('Toko Semen', 'semen pasir'),
+                                   ('Toko Pipa', 'pipa'))
+        ]
+        ListingProduct.objects.create(listing=self.listings[4], label='Semen Gresik')
+
+    def queryset(self):
+        # first listing nearest, 100 meters between each
+        first_id = self.listings[0].id
+        return Listing.objects \
+            .filter(id__in=[listing.id for listing in self.listings]) \
+            .annotate(distance=(F('id') - first_id) * 0.1) \
+            .order_by('distance')
+
+    def test_relevance_from_label_keyword_and_product(self):
+        ids, scores, distances, total = rank_from_database(self.queryset(), 3, ['semen'])
+
+        # label and keyword, then product only, then nearest
+        self.assertEqual(ids.tolist(), [self.listings[3].id, self.listings[4].id,
+                                        self.listings[0].id])
+        self.assertEqual(np.round(distances, 1).tolist(), [0.3, 0.4, 0])
+        self.assertEqual(total, 5)
+        self.assertTrue(scores[0] > scores[1] > scores[2])
+
+    def test_without_keyword_nearest_first(self):
+        ids, _scores, _distances, _total = rank_from_database(self.queryset(), 5)
+        self.assertEqual(ids.tolist(), [listing.id for listing in self.listings])
+
+    def test_only_candidates_scored(self):
+        with mock.patch.object(procure_settings, 'SEARCH_RANK_CANDIDATES', 3):
+            ids, _scores, _distances, total = rank_from_database(self.queryset(), 5, ['semen'])
+
+        # semen listing beyond nearest candidates never scored
+        self.assertEqual(sorted(ids.tolist()), [listing.id for listing in self.listings[:3]])
+        self.assertEqual(total, 5)
+
+    def test_total_counted_only_when_capped(self):
+        with mock.patch.object(procure_settings, 'SEARCH_RANK_CANDIDATES', 10), \
+                self.assertNumQueries(2):
+            # candidates and products, no count
+            _ids, _scores, _distances, total = rank_from_database(self.queryset(), 5, ['semen'])
+        self.assertEqual(total, 5)
+
+
+class LeaderboardTest(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserModel.objects.create_user('buyer', 'secret', email='buyer@example.com')
+        self.inquiry = Inquiry.objects.create(user=self.user, keyword='semen')
+        self.addCleanup(leaderboard.remove, [self.inquiry.id])
+
+        self.proposes = list()
+        for index in range(3):
+            seller = UserModel.objects.create_user('seller%s' % index, 'secret',
+                                                   email='seller%s@example.com' % index)
+            listing = Listing.objects.create(label='Toko %s' % index, keyword='semen',
+                                             status=Listing.Status.APPROVED)
+            self.proposes.append(Propose.objects.create(user=seller, listing=listing,
+                                                        inquiry=self.inquiry))
+
+    def offer(self, propose, cost):
+        return Offer.objects.create(propose=propose, user=propose.user, cost=cost)
+
+    def ranked(self):
+        return [entry[0] for entry in leaderboard.Leaderboard(self.inquiry)[0:10]]
+
+    def test_record_offer_move_rank(self):
+        for propose, cost in zip(self.proposes, (300, 100, 200)):
+            self.offer(propose, cost)
+        self.assertEqual(self.ranked(), [self.proposes[1].id, self.proposes[2].id,
+                                         self.proposes[0].id])
+
+        offer = self.offer(self.proposes[0], 50)
+        changes = leaderboard.record_offers([offer.id])
+
+        entry, = changes[self.inquiry.id]
+        self.assertEqual((entry['previous_rank'], entry['rank'], entry['cost']), (3, 1, 50))
+        self.assertEqual(self.ranked(), [self.proposes[0].id, self.proposes[1].id,
+                                         self.proposes[2].id])
+
+    def test_older_offer_ignored(self):
+        old = self.offer(self.proposes[0], 100)
+        self.offer(self.proposes[0], 300)
+        leaderboard.Leaderboard(self.inquiry)
+
+        offer, = leaderboard.get_offer_totals(id=old.id)
+        self.assertEqual(leaderboard.apply(offer), (None, None))
+        self.assertEqual(leaderboard.Leaderboard(self.inquiry)[0][1], 300)
+
+    def test_offer_before_board_built_hydrate(self):
+        offer = self.offer(self.proposes[0], 100)
+
+        offer, = leaderboard.get_offer_totals(id=offer.id)
+        with self.assertRaises(LookupError):
+            leaderboard.apply(offer)
+
+        self.assertEqual(leaderboard.update(offer), (None, 0))
+        self.assertEqual(self.ranked(), [self.proposes[0].id])
+
+    def test_rebuild_skipped_when_board_touched_meanwhile(self):
+        self.offer(self.proposes[0], 100)
+        index = leaderboard.index_key(self.inquiry.id)
+        get_offer_totals = leaderboard.get_offer_totals
+
+        def racing_writer(**filters):
+            # other writer hydrate board while this one read database
+            get_redis_connection().hset(index, 'other', 1)
+            return get_offer_totals(**filters)
+
+        with mock.patch.object(leaderboard, 'get_offer_totals', side_effect=racing_writer):
+            leaderboard.rebuild(self.inquiry)
+
+        self.assertEqual(get_redis_connection().hgetall(index), {'other': '1'})
+
+    def test_apply_retried_when_board_touched_meanwhile(self):
+        self.offer(self.proposes[0], 100)
+        leaderboard.Leaderboard(self.inquiry)
+        offer, = leaderboard.get_offer_totals(id=self.offer(self.proposes[0], 50).id)
+
+        decode_member = leaderboard.decode_member
+        calls = list()
+
+        def racing_writer(member):
+            if not calls:
+                get_redis_connection().hset(leaderboard.index_key(self.inquiry.id), 'other', 1)
+            calls.append(member)
+            return decode_member(member)
+
+        with mock.patch.object(leaderboard, 'decode_member', side_effect=racing_writer):
+            self.assertEqual(leaderboard.apply(offer), (0, 0))
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(leaderboard.Leaderboard(self.inquiry)[0][1], 50)
+
+    def test_closed_inquiry_ranked_from_database(self):
+        for propose, cost in zip(self.proposes, (300, 100, 200)):
+            self.offer(propose, cost)
+        expected = self.ranked()
+
+        Inquiry.objects.filter(id=self.inquiry.id).update(is_open=False)
+        self.inquiry.refresh_from_db()
+        leaderboard.remove([self.inquiry.id])
+
+        with mock.patch.object(leaderboard, 'get_redis_connection',
+                               side_effect=AssertionError("redis touched")):
+            board = leaderboard.Leaderboard(self.inquiry)
+            self.assertEqual(len(board), 3)
+            self.assertEqual([entry[0] for entry in board[0:10]], expected)
+
+        # late offer task never hydrate board again
+        offer, = leaderboard.get_offer_totals(id=self.offer(self.proposes[0], 10).id)
+        self.assertEqual(leaderboard.update(offer), (None, None))
+        self.assertFalse(get_redis_connection().exists(leaderboard.index_key(self.inquiry.id)))
+
+    def test_read_while_redis_down(self):
+        for propose, cost in zip(self.proposes, (300, 100, 200)):
+            self.offer(propose, cost)
+        expected = self.ranked()
+        down = mock.patch.object(leaderboard, 'get_redis_connection',
+                                 side_effect=redis.ConnectionError)
+
+        with down, self.assertLogs(leaderboard.logger, 'ERROR'):
+            board = leaderboard.Leaderboard(self.inquiry)
+            self.assertEqual(len(board), 3)
+            self.assertEqual([entry[0] for entry in board[0:10]], expected)
+            self.assertEqual([entry[3] for entry in board.filter([self.proposes[0].id])], [2])
+
+        # went down after board read started
+        board = leaderboard.Leaderboard(self.inquiry)
+        with down, self.assertLogs(leaderboard.logger, 'ERROR'):
+            self.assertEqual(len(board), 3)
+            self.assertEqual([entry[0] for entry in board[1:3]], expected[1:3])
+
+    def test_record_offer_when_redis_down_logged(self):
+        offer = self.offer(self.proposes[0], 100)
+
+        with mock.patch.object(leaderboard, 'get_redis_connection',
+                               side_effect=redis.ConnectionError), \
+                self.assertLogs(leaderboard.logger, 'ERROR'):
+            self.assertEqual(leaderboard.record_offers([offer.id]), {})
+
+
+class NegotiationHistoryTest(TestCase):
+    create_at = datetime.datetime(2024, 1, 1, 8, 0, 0, 123456)
+
+    def setUp(self):
+        self.user = UserModel.objects.create_user('buyer', 'secret', email='buyer@example.com')
+        self.inquiry = Inquiry.objects.create(user=self.user, keyword='semen')
+        listing = Listing.objects.create(label='Toko', keyword='semen',
+                                         status=Listing.Status.APPROVED)
+        self.propose = Propose.objects.create(user=self.user, listing=listing,
+                                              inquiry=self.inquiry)
+
+        persist_messages([
+            {'propose_id': self.propose.id, 'user_id': self.user.id,
+             'user_uuid': self.user.uuid, 'content': 'pesan %s' % index}
+            for index in range(7)
+        ])
+        # written in one batch, several share exact timestamp
+        negotiations = Negotiation.objects.filter(propose=self.propose).order_by('id')
+        for index, negotiation in enumerate(negotiations):
+            negotiations.filter(id=negotiation.id).update(
+                create_at=self.create_at + datetime.timedelta(seconds=index // 3))
+
+    def history(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get(reverse('procure_api:propose-negotiations',
+                                  kwargs={'uuid': self.propose.uuid}), params)
+
+    def test_paging_across_equal_timestamps(self):
+        expected = list(Negotiation.objects.filter(propose=self.propose)
+                        .order_by('-create_at', '-id').values_list('uuid', flat=True))
+
+        for limit in (1, 2, 3, 4):
+            seen, cursor = list(), None
+            while True:
+                messages, cursor = get_history(self.propose.id, cursor, limit)
+                self.assertLessEqual(len(messages), limit)
+                seen.extend(message['uuid'] for message in messages)
+                if cursor is None:
+                    break
+            self.assertEqual(seen, [str(value) for value in expected], limit)
+
+    def test_cursor_round_trip(self):
+        value = (self.create_at, 42)
+        self.assertEqual(decode_cursor(encode_cursor(*value)), value)
+
+    def test_invalid_cursor(self):
+        for cursor in ('', 'abc', '20240101080000123456', '20240101080000123456_1_2',
+                       '20241301080000123456_1', '20240101080000123456_x',
+                       '20240101080000123456_0', '20240101080000123456_-1',
+                       '20240101080000123456_%s' % 2 ** 63, None, 42):
+            with self.assertRaises(CursorError, msg=cursor):
+                decode_cursor(cursor)
+
+    def test_limit_clamped(self):
+        with mock.patch.object(procure_settings, 'NEGOTIATION_HISTORY_MAX_LIMIT', 5):
+            self.assertEqual(len(get_history(self.propose.id, limit=10 ** 9)[0]), 5)
+
+        for limit in (-3, 0, None):
+            messages, cursor = get_history(self.propose.id, limit=limit)
+            self.assertEqual(len(messages), 1 if limit else 7, limit)
+
+    def test_api_reject_invalid_cursor_and_limit(self):
+        for params in ({'before': 'abc'}, {'before': '20240101080000123456_%s' % 10 ** 30},
+                       {'limit': 'abc'}, {'limit': '1.5'}):
+            self.assertEqual(self.history(**params).status_code, 400, params)
+
+    def test_api_page(self):
+        response = self.history(limit=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.history(limit=-1, before=response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
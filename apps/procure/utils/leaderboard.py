@@ -0,0 +1,412 @@
+"""
+Live offer leaderboard of inquiry
+
+Sorted set `procure:leaderboard:<inquiry_id>` hold newest offer cost of
+each propose as score, member is `<reversed create_at>:<propose_id>` so
+equal cost ordered newest first, same as `InquiryApiView.proposes`.
+Hash `procure:leaderboard:<inquiry_id>:index` map propose_id to its
+current member, its `built` field mark board hydrated from database.
+
+Board updated after offer committed and rank change broadcasted to
+`leaderboard_<inquiry_id>` group. Database only read to hydrate missing
+board and serialize entry, board removed when inquiry closed and never
+hydrated again, closed inquiry ranked from database.
+"""
+import datetime
+import logging
+
+import redis
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import Sum
+from django.utils import timezone
+
+from utils.cache import get_redis_connection
+from utils.generals import get_model
+from apps.procure import settings as procure_settings
+
+logger = logging.getLogger(__name__)
+
+BUILT_FIELD = 'built'
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# microsecond, fit 17 digit until year 5138
+MEMBER_TIME_MAX = 10 ** 17
+MEMBER_FORMAT = '%017d:%s'
+
+# optimistic transaction retried when other writer touch the board
+APPLY_RETRIES = 5
+
+
+def board_key(inquiry_id):
+    return 'procure:leaderboard:%s' % inquiry_id
+
+
+def index_key(inquiry_id):
+    return 'procure:leaderboard:%s:index' % inquiry_id
+
+
+def group_name(inquiry_id):
+    return 'leaderboard_%s' % inquiry_id
+
+
+def to_micro(value):
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def encode_member(propose_id, create_at):
+    return MEMBER_FORMAT % (MEMBER_TIME_MAX - to_micro(create_at), propose_id)
+
+
+def decode_member(member):
+    """Return (propose_id, create_at in microsecond)"""
+    reversed_at, propose_id = member.split(':')
+    return int(propose_id), MEMBER_TIME_MAX - int(reversed_at)
+
+
+def get_offer_totals(**filters):
+    """
+    Offer with total cost, `cost` if filled else sum of item cost.
+    Return list of dict with id, propose_id, propose_uuid, listing_uuid,
+    listing_label, inquiry_id, cost and create_at
+    """
+    Offer = get_model('procure', 'Offer')
+    offers = Offer.objects \
+        .filter(**filters) \
+        .annotate(total_item_cost=Sum('items__cost')) \
+        .values('id', 'propose_id', 'propose__uuid', 'propose__inquiry_id',
+                'propose__listing__uuid', 'propose__listing__label',
+                'cost', 'total_item_cost', 'create_at') \
+        .order_by()
+
+    return [{
+        'id': offer['id'],
+        'propose_id': offer['propose_id'],
+        'propose_uuid': offer['propose__uuid'],
+        'listing_uuid': offer['propose__listing__uuid'],
+        'listing_label': offer['propose__listing__label'],
+        'inquiry_id': offer['propose__inquiry_id'],
+        'cost': offer['cost'] if offer['cost'] > 0 else offer['total_item_cost'] or 0,
+        'create_at': offer['create_at'],
+    } for offer in offers]
+
+
+def get_expire_at(inquiry):
+    """Board kept until inquiry closed plus LEADERBOARD_TTL"""
+    now = timezone.now()
+    close_at = inquiry.close_at or now
+
+    # not reloaded after create, still date
+    if not isinstance(close_at, datetime.datetime):
+        close_at = datetime.datetime.combine(close_at, datetime.time())
+
+    expire_at = max(close_at, now) \
+        + datetime.timedelta(seconds=procure_settings.LEADERBOARD_TTL)
+    return int(expire_at.timestamp())
+
+
+def rebuild(inquiry):
+    """
+    Hydrate board from newest offer of each propose. Skipped when other
+    writer touch the board meanwhile, its data is newer.
+    """
+    connection = get_redis_connection()
+    key, index = board_key(inquiry.id), index_key(inquiry.id)
+
+    with connection.pipeline(transaction=True) as pipe:
+        try:
+            pipe.watch(index)
+            offers = get_offer_totals(propose__inquiry_id=inquiry.id, is_newest=True)
+
+            members = dict()
+            for offer in offers:
+                members[str(offer['propose_id'])] = encode_member(offer['propose_id'],
+                                                                  offer['create_at'])
+
+            expire_at = get_expire_at(inquiry)
+            pipe.multi()
+            pipe.delete(key, index)
+            if offers:
+                pipe.zadd(key, {members[str(offer['propose_id'])]: offer['cost']
+                                for offer in offers})
+                pipe.expireat(key, expire_at)
+            pipe.hset(index, mapping=dict(members, **{BUILT_FIELD: 1}))
+            pipe.expireat(index, expire_at)
+            pipe.execute()
+        except redis.WatchError:
+            pass
+    return len(offers)
+
+
+def ensure(inquiry):
+    """
+    Hydrate board of open inquiry if missing, return False for closed one.
+    Its board removed on close and never written again
+    """
+    if not inquiry.is_open:
+        return False
+
+    if not get_redis_connection().hexists(index_key(inquiry.id), BUILT_FIELD):
+        rebuild(inquiry)
+    return True
+
+
+def get_closed_entries(inquiry):
+    """Entries of closed inquiry from database, same order as board"""
+    offers = get_offer_totals(propose__inquiry_id=inquiry.id, is_newest=True)
+    offers.sort(key=lambda offer: (offer['cost'], encode_member(offer['propose_id'],
+                                                                offer['create_at'])))
+    return [(offer['propose_id'], offer['cost'], offer['create_at'], rank)
+            for rank, offer in enumerate(offers)]
+
+
+def apply(offer):
+    """
+    Put offer cost to board atomically, offer older than current one of
+    its propose ignored. Return (previous rank, rank), previous None for
+    new propose, both None if nothing changed. Raise LookupError when board
+    not built yet.
+    """
+    key, index = board_key(offer['inquiry_id']), index_key(offer['inquiry_id'])
+    propose_id = str(offer['propose_id'])
+    member = encode_member(offer['propose_id'], offer['create_at'])
+
+    with get_redis_connection().pipeline(transaction=True) as pipe:
+        for _attempt in range(APPLY_RETRIES):
+            try:
+                pipe.watch(key, index)
+                if not pipe.hexists(index, BUILT_FIELD):
+                    raise LookupError("Leaderboard not built")
+
+                current = pipe.hget(index, propose_id)
+                if current is not None \
+                        and decode_member(current)[1] > to_micro(offer['create_at']):
+                    pipe.unwatch()
+                    return None, None
+
+                previous = pipe.zrank(key, current) if current is not None else None
+                ttl = pipe.ttl(index)
+
+                pipe.multi()
+                if current is not None:
+                    pipe.zrem(key, current)
+                pipe.zadd(key, {member: offer['cost']})
+                pipe.hset(index, propose_id, member)
+                if ttl > 0:
+                    pipe.expire(key, ttl)
+                pipe.zrank(key, member)
+                rank = pipe.execute()[-1]
+                return previous, rank
+            except redis.WatchError:
+                continue
+    raise redis.WatchError("Leaderboard busy")
+
+
+def broadcast(inquiry_id, entries):
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not entries:
+        return
+
+    async_to_sync(channel_layer.group_send)(group_name(inquiry_id), {
+        'type': 'leaderboard.rank',
+        'entries': entries,
+    })
+
+
+def update(offer):
+    """Return (previous rank, rank) of offer, board hydrated when missing"""
+    Inquiry = get_model('procure', 'Inquiry')
+
+    try:
+        return apply(offer)
+    except LookupError:
+        # board hydrated from database already contain the offer
+        inquiry = Inquiry.objects.filter(id=offer['inquiry_id'], is_open=True).first()
+        if inquiry is None:
+            return None, None
+
+        rebuild(inquiry)
+        return None, get_rank(offer['inquiry_id'], offer['propose_id'])
+
+
+def record_offers(offer_ids):
+    """
+    Update board of each offer inquiry, run by `update_leaderboard` task
+    after offer committed. Failure only logged, board fixed by rebuild,
+    `rebuild_leaderboards` or when expired
+    """
+    offers = get_offer_totals(id__in=offer_ids)
+
+    changes = dict()
+    for offer in offers:
+        try:
+            previous, rank = update(offer)
+        except redis.RedisError as e:
+            logger.error('Leaderboard of inquiry %s not updated: %s', offer['inquiry_id'], e)
+            continue
+
+        if rank is None:
+            continue
+
+        entry = serialize_entry(offer['propose_uuid'], offer['listing_uuid'],
+                                offer['listing_label'], offer['cost'],
+                                offer['create_at'], rank)
+        entry['previous_rank'] = previous + 1 if previous is not None else None
+        changes.setdefault(offer['inquiry_id'], list()).append(entry)
+
+    for inquiry_id, entries in changes.items():
+        try:
+            broadcast(inquiry_id, entries)
+        except Exception as e:
+            # client still get it from snapshot or endpoint
+            logger.error('Leaderboard of inquiry %s not broadcasted: %s', inquiry_id, e)
+    return changes
+
+
+def remove(inquiry_ids):
+    keys = [key for inquiry_id in inquiry_ids
+            for key in (board_key(inquiry_id), index_key(inquiry_id))]
+    if keys:
+        get_redis_connection().delete(*keys)
+
+
+def get_rank(inquiry_id, propose_id):
+    """Zero based rank of propose, None if not on board"""
+    member = get_redis_connection().hget(index_key(inquiry_id), str(propose_id))
+    if member is None:
+        return None
+    return get_redis_connection().zrank(board_key(inquiry_id), member)
+
+
+class Leaderboard:
+    """
+    Ranked propose of inquiry as lazy sequence, so it paginated by
+    LimitOffsetPagination without reading whole board. Item is
+    (propose_id, cost, create_at, rank) with zero based rank. Closed
+    inquiry ranked from database, redis not touched. Open inquiry also
+    ranked from database while redis unavailable.
+    """
+
+    def __init__(self, inquiry):
+        self.inquiry = inquiry
+        try:
+            self.entries = None if ensure(inquiry) else get_closed_entries(inquiry)
+        except redis.RedisError as e:
+            self.recover(e)
+
+    def recover(self, error):
+        logger.error('Leaderboard of inquiry %s ranked from database: %s',
+                     self.inquiry.id, error)
+        self.entries = get_closed_entries(self.inquiry)
+
+    def __len__(self):
+        if self.entries is not None:
+            return len(self.entries)
+
+        try:
+            return get_redis_connection().zcard(board_key(self.inquiry.id))
+        except redis.RedisError as e:
+            self.recover(e)
+            return len(self.entries)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else 0
+        if stop <= start:
+            return list()
+
+        if self.entries is not None:
+            return self.entries[start:stop]
+
+        try:
+            members = get_redis_connection() \
+                .zrange(board_key(self.inquiry.id), start, stop - 1, withscores=True)
+        except redis.RedisError as e:
+            self.recover(e)
+            return self.entries[start:stop]
+        return [to_entry(member, score, start + position)
+                for position, (member, score) in enumerate(members)]
+
+    def filter(self, propose_ids):
+        """Entries of given propose, ranked"""
+        propose_ids = [str(propose_id) for propose_id in propose_ids]
+        if not propose_ids:
+            return list()
+
+        if self.entries is not None:
+            return [entry for entry in self.entries if str(entry[0]) in propose_ids]
+
+        try:
+            connection = get_redis_connection()
+            members = connection.hmget(index_key(self.inquiry.id), propose_ids)
+            members = [member for member in members if member is not None]
+            if not members:
+                return list()
+
+            pipe = connection.pipeline(transaction=False)
+            for member in members:
+                pipe.zscore(board_key(self.inquiry.id), member)
+                pipe.zrank(board_key(self.inquiry.id), member)
+            results = pipe.execute()
+        except redis.RedisError as e:
+            self.recover(e)
+            return self.filter(propose_ids)
+
+        entries = [to_entry(member, score, rank)
+                   for member, score, rank in zip(members, results[::2], results[1::2])
+                   if rank is not None]
+        return sorted(entries, key=lambda entry: entry[3])
+
+
+def serialize_entry(propose_uuid, listing_uuid, listing_label, cost, create_at, rank):
+    return {
+        'propose': str(propose_uuid),
+        'listing': {'uuid': str(listing_uuid), 'label': listing_label},
+        'cost': cost,
+        'offer_date': create_at.isoformat(),
+        'rank': rank + 1,
+    }
+
+
+def to_entry(member, score, rank):
+    propose_id, create_at = decode_member(member)
+    return propose_id, int(score), EPOCH + datetime.timedelta(microseconds=create_at), rank
+
+
+def hydrate(entries):
+    """Attach rank, cost and offer date to propose of each entry, keep order"""
+    Propose = get_model('procure', 'Propose')
+    proposes = Propose.objects \
+        .select_related('listing', 'inquiry', 'user') \
+        .in_bulk([entry[0] for entry in entries])
+
+    results = list()
+    for propose_id, cost, create_at, rank in entries:
+        propose = proposes.get(propose_id)
+        if propose is None:
+            continue
+
+        propose.rank = rank + 1
+        propose.newest_offer_cost = cost
+        propose.newest_offer_date = create_at
+        results.append(propose)
+    return results
+
+
+def get_inquiry(uuid, user_id):
+    """Inquiry owned by user, None if not"""
+    Inquiry = get_model('procure', 'Inquiry')
+    return Inquiry.objects.filter(uuid=uuid, user_id=user_id).first()
+
+
+def get_snapshot(inquiry, limit=None):
+    """Top of board in same form as broadcasted entry"""
+    limit = limit or procure_settings.LEADERBOARD_SNAPSHOT_LIMIT
+    return [serialize_entry(propose.uuid, propose.listing.uuid, propose.listing.label,
+                            propose.newest_offer_cost, propose.newest_offer_date,
+                            propose.rank - 1)
+            for propose in hydrate(Leaderboard(inquiry)[0:limit])]
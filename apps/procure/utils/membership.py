@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from utils.generals import get_model
+from apps.procure import settings as procure_settings
+
+MEMBERSHIP_KEY = 'procure:membership:{}'
+MEMBERSHIP_TIMEOUT = procure_settings.MEMBERSHIP_CACHE_TIMEOUT
+
+
+def _membership_key(user_id):
+    return MEMBERSHIP_KEY.format(user_id)
+
+
+def build_memberships(user_id):
+    """Return {listing_id: roles} of user in single query"""
+    ListingMember = get_model('procure', 'ListingMember')
+    members = ListingMember.objects \
+        .filter(user_id=user_id) \
+        .with_roles() \
+        .values_list('listing_id', 'roles')
+
+    return dict(members)
+
+
+def get_memberships(user_id):
+    """Return {listing_id: roles} from cache, fallback to database"""
+    key = _membership_key(user_id)
+    memberships = cache.get(key)
+
+    if memberships is None:
+        memberships = build_memberships(user_id)
+        cache.set(key, memberships, MEMBERSHIP_TIMEOUT)
+    return memberships
+
+
+def has_role(user_id, listing_id, role):
+    return bool(get_memberships(user_id).get(listing_id, 0) & role)
+
+
+def get_listing_ids(user_id, role=None):
+    """Listing ids where user is member, limited to role if given"""
+    return [listing_id for listing_id, roles in get_memberships(user_id).items()
+            if role is None or roles & role]
+
+
+def invalidate_memberships(*user_ids):
+    keys = [_membership_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+
+    # other request may cache old roles before commit
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,204 @@
+"""
+Negotiation messaging
+
+Message from every connection of a process collected by NegotiationWriter
+and written together with bulk_create, each sender wait until its batch
+committed before message broadcasted to `negotiation_<propose_id>` group.
+
+History paginated by keyset (create_at, id), newest first, cursor is
+`<create_at %Y%m%d%H%M%S%f>_<id>` of last message in page.
+"""
+import uuid
+import asyncio
+import datetime
+import weakref
+
+from channels.db import database_sync_to_async
+from django.db import transaction
+from django.db.models import Q
+
+from utils.generals import get_model
+from apps.procure import settings as procure_settings
+from apps.procure.utils.membership import get_listing_ids
+
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+# signed bigint primary key
+CURSOR_MAX_ID = 2 ** 63 - 1
+
+
+class CursorError(ValueError):
+    pass
+
+
+def group_name(propose_id):
+    return 'negotiation_%s' % propose_id
+
+
+def is_participant(propose, user_id):
+    """Inquiry owner or member of proposing listing"""
+    return propose.inquiry.user_id == user_id \
+        or propose.listing_id in get_listing_ids(user_id)
+
+
+def get_propose(uuid, user_id):
+    """Propose where user is participant, None if not"""
+    Propose = get_model('procure', 'Propose')
+    propose = Propose.objects.select_related('inquiry').filter(uuid=uuid).first()
+
+    if propose is None or not is_participant(propose, user_id):
+        return None
+    return propose
+
+
+def serialize_message(negotiation, user_uuid, content):
+    return {
+        'uuid': str(negotiation.uuid),
+        'user': str(user_uuid),
+        'media_type': negotiation.media_type,
+        'content': content,
+        'create_at': negotiation.create_at.isoformat(),
+        'cursor': encode_cursor(negotiation.create_at, negotiation.id),
+    }
+
+
+def persist_messages(messages):
+    """
+    Write text messages in one transaction, three query whatever size.
+    `messages` list of dict with propose_id, user_id, user_uuid and content.
+    Return serialized message in same order
+    """
+    Negotiation = get_model('procure', 'Negotiation')
+    NegotiationText = get_model('procure', 'NegotiationText')
+
+    negotiations = [
+        Negotiation(uuid=uuid.uuid4(), propose_id=message['propose_id'],
+                    user_id=message['user_id'], media_type=Negotiation.MediaType.TEXT)
+        for message in messages
+    ]
+
+    with transaction.atomic():
+        Negotiation.objects.bulk_create(negotiations)
+
+        # id not returned by bulk_create on mysql
+        ids = dict(Negotiation.objects
+                   .filter(uuid__in=[negotiation.uuid for negotiation in negotiations])
+                   .values_list('uuid', 'id'))
+
+        for negotiation in negotiations:
+            negotiation.id = ids[negotiation.uuid]
+
+        NegotiationText.objects.bulk_create([
+            NegotiationText(negotiation_id=negotiation.id, content=message['content'])
+            for negotiation, message in zip(negotiations, messages)
+        ])
+
+    return [serialize_message(negotiation, message['user_uuid'], message['content'])
+            for negotiation, message in zip(negotiations, messages)]
+
+
+class NegotiationWriter:
+    """Per event loop message batcher"""
+
+    def __init__(self, batch_size=None, interval=None):
+        self.batch_size = batch_size or procure_settings.NEGOTIATION_BATCH_SIZE
+        self.interval = interval if interval is not None \
+            else procure_settings.NEGOTIATION_FLUSH_INTERVAL
+        self._pending = list()
+        self._timer = None
+
+    async def write(self, message):
+        """Return serialized message after its batch committed"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((message, future))
+
+        if len(self._pending) >= self.batch_size:
+            asyncio.ensure_future(self.flush())
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.interval, lambda: asyncio.ensure_future(self.flush()))
+        return await future
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, list()
+        if not pending:
+            return
+
+        try:
+            results = await database_sync_to_async(persist_messages)(
+                [message for message, _future in pending])
+        except Exception as e:
+            for _message, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_message, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+_writers = weakref.WeakKeyDictionary()
+
+
+def get_writer():
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        writer = _writers[loop] = NegotiationWriter()
+    return writer
+
+
+def encode_cursor(create_at, id):
+    # exact to microsecond, float timestamp may round
+    return '%s_%s' % (create_at.strftime(CURSOR_FORMAT), id)
+
+
+def decode_cursor(cursor):
+    try:
+        create_at, id = cursor.split('_')
+        create_at, id = datetime.datetime.strptime(create_at, CURSOR_FORMAT), int(id)
+    except (AttributeError, ValueError):
+        raise CursorError("Cursor not valid")
+
+    # out of range id overflow database parameter
+    if not 0 < id <= CURSOR_MAX_ID:
+        raise CursorError("Cursor not valid")
+    return create_at, id
+
+
+def get_history(propose_id, before=None, limit=None):
+    """
+    Return (messages, next cursor) older than `before` cursor,
+    served by (propose, create_at, id) index
+    """
+    Negotiation = get_model('procure', 'Negotiation')
+    # negative slice not supported by queryset
+    limit = max(1, min(limit or procure_settings.NEGOTIATION_HISTORY_LIMIT,
+                       procure_settings.NEGOTIATION_HISTORY_MAX_LIMIT))
+
+    negotiations = Negotiation.objects \
+        .filter(propose_id=propose_id) \
+        .select_related('user', 'text') \
+        .order_by('-create_at', '-id')
+
+    if before:
+        create_at, id = decode_cursor(before)
+        negotiations = negotiations.filter(
+            Q(create_at__lt=create_at) | Q(create_at=create_at, id__lt=id)
+        )
+
+    negotiations = list(negotiations[:limit + 1])
+    has_next = len(negotiations) > limit
+    negotiations = negotiations[:limit]
+
+    messages = [
+        serialize_message(negotiation, negotiation.user.uuid,
+                          getattr(getattr(negotiation, 'text', None), 'content', None))
+        for negotiation in negotiations
+    ]
+    return messages, messages[-1]['cursor'] if has_next else None
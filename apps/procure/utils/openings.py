@@ -0,0 +1,95 @@
+"""
+Weekly opening bitmap
+
+Week split into 7 x 96 quarter-hour slot, Monday 00:00 is slot 0.
+Slot open when its start time inside open_time - close_time of an
+open day. Close time before open time continue to next day,
+same open and close time mean open whole day.
+
+Bit stored little-endian in 84 bytes, slot `i` is bit `i % 8` of byte `i // 8`.
+"""
+from django.db.models import BinaryField
+from django.db.models.functions import Substr
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+BITMAP_SIZE = SLOTS_PER_WEEK // 8
+
+
+def _slot(value, ceil=False):
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    slot, remain = divmod(seconds, SLOT_MINUTES * 60)
+    return slot + 1 if ceil and remain else slot
+
+
+def build_bitmap(openings):
+    """Return bytes from ListingOpening instances"""
+    bitmap = bytearray(BITMAP_SIZE)
+
+    for opening in openings:
+        if not opening.is_open:
+            continue
+
+        start = _slot(opening.open_time, ceil=True)
+        end = _slot(opening.close_time, ceil=True)
+        if end <= start:
+            end += SLOTS_PER_DAY
+
+        offset = opening.day * SLOTS_PER_DAY
+        for slot in range(offset + start, offset + end):
+            slot %= SLOTS_PER_WEEK
+            bitmap[slot // 8] |= 1 << (slot % 8)
+    return bytes(bitmap)
+
+
+def slot_at(value):
+    """Week slot of datetime, naive value already in local time"""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.weekday() * SLOTS_PER_DAY + _slot(value)
+
+
+def is_open_at(bitmap, slot):
+    if not bitmap:
+        return False
+    return bool(bitmap[slot // 8] >> (slot % 8) & 1)
+
+
+def parse_open_at(value):
+    """
+    Parse `open_at` query param, `now` or ISO datetime.
+    Return week slot, None if not given. Raise ValueError if not valid
+    """
+    if not value:
+        return None
+
+    if value == 'now':
+        return slot_at(timezone.now())
+
+    # raise ValueError on well formatted but invalid value
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError("open_at not valid: %s" % value)
+
+    # offset given by client, slot counted in local time
+    if timezone.is_aware(parsed):
+        parsed = timezone.localtime(parsed)
+    return slot_at(parsed)
+
+
+def filter_open_at(queryset, slot):
+    """
+    Database fallback, listing open at slot. Byte of slot compared in SQL
+    against every byte value having its bit set, portable without bitwise
+    function on binary column
+    """
+    mask = 1 << (slot % 8)
+    values = [bytes([value]) for value in range(256) if value & mask]
+
+    return queryset \
+        .alias(opening_slot_byte=Substr('opening_bitmap', slot // 8 + 1, 1,
+                                        output_field=BinaryField())) \
+        .filter(opening_slot_byte__in=values)
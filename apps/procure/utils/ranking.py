@@ -0,0 +1,125 @@
+"""
+Ranked listing search
+
+    score = relevance * w_relevance
+            + exp(-distance / SEARCH_DISTANCE_SCALE) * w_distance
+            + 0.5 ** (age_days / SEARCH_RECENCY_HALF_LIFE) * w_recency
+
+Relevance is weighted share of (keyword, field) matched as `icontains`
+in label, keyword and product label, each term from 0 to 1.
+Only best `k` ordered, rest of candidate never sorted.
+"""
+import time
+
+import numpy as np
+
+from collections import defaultdict
+from collections.abc import Sequence
+
+from utils.generals import get_model
+from apps.procure import settings as procure_settings
+
+DAY_SECONDS = 60 * 60 * 24
+
+
+def rank_score(relevance, distances, create_at, now=None):
+    weights = procure_settings.SEARCH_RANK_WEIGHTS
+    now = now or time.time()
+
+    age_days = np.maximum(now - np.asarray(create_at, dtype=np.float64), 0) / DAY_SECONDS
+    distance_decay = np.exp(-np.asarray(distances, dtype=np.float64)
+                            / procure_settings.SEARCH_DISTANCE_SCALE)
+    recency = 0.5 ** (age_days / procure_settings.SEARCH_RECENCY_HALF_LIFE)
+
+    return weights['relevance'] * np.asarray(relevance, dtype=np.float64) \
+        + weights['distance'] * distance_decay \
+        + weights['recency'] * recency
+
+
+def top_k(scores, k):
+    """
+    Index of k highest score, best first. Same as stable full sort,
+    equal score ordered by index so page never shuffled
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < len(scores):
+        # tie at the cut, lowest index taken
+        threshold = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > threshold)
+        tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+        index = np.concatenate([above, tied])
+    else:
+        index = np.arange(len(scores))
+    return index[np.argsort(-scores[index], kind='stable')]
+
+
+def rank_limit(offset, limit):
+    """Listing need to be ordered for requested page, bounded"""
+    return min((offset or 0) + (limit or 0), procure_settings.SEARCH_RANK_MAX_RESULTS)
+
+
+class RankedResult(Sequence):
+    """
+    Ranked top-k as paginate-able sequence, length is all candidate
+    so `next` link still built, page after k is empty
+    """
+
+    def __init__(self, items, total):
+        self.items = items
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+
+def rank_from_database(queryset, k, keywords=None):
+    """
+    Database fallback, `queryset` already filtered, ordered and annotated
+    with `distance`. Only first SEARCH_RANK_CANDIDATES scored, same way
+    as snapshot. Return (ids, scores, distances, total)
+    """
+    ListingProduct = get_model('procure', 'ListingProduct')
+    weights = procure_settings.SEARCH_FIELD_WEIGHTS
+    keywords = [keyword.lower() for keyword in (keywords or []) if keyword]
+
+    candidates = list(
+        queryset.values_list('id', 'label', 'keyword', 'distance', 'create_at')
+        [:procure_settings.SEARCH_RANK_CANDIDATES]
+    )
+    total = queryset.count() if len(candidates) == procure_settings.SEARCH_RANK_CANDIDATES \
+        else len(candidates)
+
+    products = defaultdict(list)
+    if keywords and weights.get('product'):
+        product_labels = ListingProduct.objects \
+            .filter(listing_id__in=[candidate[0] for candidate in candidates]) \
+            .values_list('listing_id', 'label')
+
+        for listing_id, label in product_labels:
+            products[listing_id].append(label.lower())
+
+    relevance = list()
+    for listing_id, label, keyword, _distance, _create_at in candidates:
+        fields = {
+            'label': [(label or '').lower()],
+            'keyword': [(keyword or '').lower()],
+            'product': products[listing_id],
+        }
+
+        matched = sum(weight for keyword_ in keywords for field, weight in weights.items()
+                      if any(keyword_ in value for value in fields[field]))
+        relevance.append(matched / (len(keywords) * sum(weights.values())) if keywords else 0)
+
+    ids = np.asarray([candidate[0] for candidate in candidates], dtype=np.int64)
+    distances = np.asarray([candidate[3] for candidate in candidates], dtype=np.float64)
+    scores = rank_score(relevance, distances,
+                        [candidate[4].timestamp() for candidate in candidates])
+
+    top = top_k(scores, k)
+    return ids[top], scores[top], distances[top], total
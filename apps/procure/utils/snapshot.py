@@ -0,0 +1,300 @@
+"""
+Listing geo/keyword snapshot
+
+Listing with location written as plain .npy arrays, opened with
+mmap_mode so every gunicorn and celery process on same host share
+page cache instead of own copy.
+
+    <LISTING_SNAPSHOT_DIR>/manifest.json        current version
+    <LISTING_SNAPSHOT_DIR>/<version>/ids.npy    listing id, one row per listing
+                                    latitude.npy, longitude.npy  radians
+                                    cos_latitude.npy
+                                    status.npy   index of Listing.Status
+                                    opening_bitmap.npy  (n, 84) weekly slot
+                                    create_at.npy  unix timestamp
+                                    vocabulary.npy  unique lowercase token
+                                    token_ids.npy, token_rows.npy, token_fields.npy
+
+Version directory never changed once written, manifest replaced
+atomically so reader always see complete snapshot.
+
+Directory is host local, mapped file of removed version must stay on
+the host page cache. Each web host build its own by running
+`manage.py build_listing_snapshot` on start and every 5 minutes (cron),
+`build_listing_snapshot` beat task only cover host of its worker. Host
+without fresh snapshot log warning and fallback to database.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import logging
+
+import numpy as np
+
+from django.utils import timezone
+
+from utils.generals import get_model
+from apps.procure import settings as procure_settings
+from apps.procure.utils.openings import BITMAP_SIZE
+from apps.procure.utils.ranking import rank_score, top_k
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS = 6371
+TOKEN_FIELDS = ('keyword', 'label', 'product')
+# fields of current public search
+SEARCH_FIELDS = ('keyword', 'label')
+ARRAYS = ('ids', 'latitude', 'longitude', 'cos_latitude', 'status',
+          'opening_bitmap', 'create_at', 'vocabulary', 'token_ids', 'token_rows', 'token_fields')
+
+_cache = {'checked_at': 0, 'mtime': None, 'snapshot': None}
+
+
+def tokenize(value):
+    # same split as search keyword
+    return [token for token in re.split(r"[^A-Za-z']+", (value or '').lower())
+            if token]
+
+
+def _manifest_path(path):
+    return os.path.join(path, 'manifest.json')
+
+
+def build_snapshot(path=None):
+    """Write new snapshot version, return its manifest"""
+    Listing = get_model('procure', 'Listing')
+    ListingProduct = get_model('procure', 'ListingProduct')
+    path = path or procure_settings.LISTING_SNAPSHOT_DIR
+    statuses = list(Listing.Status.values)
+
+    ids, latitudes, longitudes, status, bitmaps, create_at = [], [], [], [], [], []
+    vocabulary = dict()
+    token_ids, token_rows, token_fields = [], [], []
+
+    def add_tokens(row, field, value):
+        for token in set(tokenize(value)):
+            token_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+            token_rows.append(row)
+            token_fields.append(field)
+
+    listings = Listing.objects \
+        .filter(location__isnull=False) \
+        .order_by('id') \
+        .values_list('id', 'status', 'keyword', 'label', 'location__latitude',
+                     'location__longitude', 'opening_bitmap', 'create_at') \
+        .iterator(chunk_size=2000)
+
+    for row, (listing_id, listing_status, keyword, label, latitude, longitude,
+              bitmap, created) in enumerate(listings):
+        ids.append(listing_id)
+        status.append(statuses.index(listing_status))
+        bitmaps.append(bytes(bitmap) if bitmap else bytes(BITMAP_SIZE))
+        latitudes.append(latitude or 0)
+        longitudes.append(longitude or 0)
+        create_at.append(created.timestamp())
+
+        add_tokens(row, TOKEN_FIELDS.index('keyword'), keyword)
+        add_tokens(row, TOKEN_FIELDS.index('label'), label)
+
+    rows = {listing_id: row for row, listing_id in enumerate(ids)}
+    products = ListingProduct.objects \
+        .filter(listing_id__in=rows) \
+        .values_list('listing_id', 'label') \
+        .iterator(chunk_size=2000)
+
+    for listing_id, label in products:
+        add_tokens(rows[listing_id], TOKEN_FIELDS.index('product'), label)
+
+    latitude = np.radians(np.asarray(latitudes, dtype=np.float64))
+    arrays = {
+        'ids': np.asarray(ids, dtype=np.int64),
+        'latitude': latitude,
+        'longitude': np.radians(np.asarray(longitudes, dtype=np.float64)),
+        'cos_latitude': np.cos(latitude),
+        'status': np.asarray(status, dtype=np.int8),
+        'opening_bitmap': np.frombuffer(b''.join(bitmaps), dtype=np.uint8)
+        .reshape(len(ids), BITMAP_SIZE),
+        'create_at': np.asarray(create_at, dtype=np.float64),
+        'vocabulary': np.asarray(list(vocabulary) or [''], dtype=np.str_),
+        'token_ids': np.asarray(token_ids, dtype=np.int32),
+        'token_rows': np.asarray(token_rows, dtype=np.int32),
+        'token_fields': np.asarray(token_fields, dtype=np.int8),
+    }
+
+    version = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    version_path = os.path.join(path, version)
+    os.makedirs(version_path, exist_ok=True)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(version_path, '%s.npy' % name), array)
+
+    manifest = {
+        'version': version,
+        'build_at': time.time(),
+        'count': len(ids),
+        'statuses': statuses,
+    }
+
+    tmp_path = _manifest_path(path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, _manifest_path(path))
+
+    cleanup_snapshots(path)
+    return manifest
+
+
+def cleanup_snapshots(path):
+    """Remove older version, process still mapping removed file keep their pages"""
+    versions = sorted(name for name in os.listdir(path)
+                      if os.path.isdir(os.path.join(path, name)))
+
+    for name in versions[:-procure_settings.LISTING_SNAPSHOT_KEEP]:
+        shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+class ListingSnapshot:
+    def __init__(self, path, manifest):
+        self.manifest = manifest
+        self.statuses = manifest['statuses']
+        version_path = os.path.join(path, manifest['version'])
+
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(version_path, '%s.npy' % name),
+                                        mmap_mode='r'))
+
+    @property
+    def age(self):
+        return time.time() - self.manifest['build_at']
+
+    def token_hits(self, keyword, fields):
+        """Row mask of listing with token in fields containing keyword"""
+        matched = np.zeros(len(self.ids), dtype=bool)
+        token_mask = np.char.find(self.vocabulary, keyword.lower()) >= 0
+
+        field_mask = np.isin(self.token_fields, [TOKEN_FIELDS.index(f) for f in fields])
+        hits = token_mask[self.token_ids] & field_mask
+        matched[self.token_rows[hits]] = True
+        return matched
+
+    def match_keywords(self, keywords, fields=SEARCH_FIELDS):
+        """Row mask of listing with any token containing any keyword"""
+        matched = np.zeros(len(self.ids), dtype=bool)
+        for keyword in keywords:
+            matched |= self.token_hits(keyword, fields)
+        return matched
+
+    def relevance(self, rows, keywords, weights):
+        """Weighted share of (keyword, field) matched, from 0 to 1"""
+        scores = np.zeros(len(rows), dtype=np.float64)
+        if not keywords:
+            return scores
+
+        for keyword in keywords:
+            for field, weight in weights.items():
+                scores += weight * self.token_hits(keyword, (field,))[rows]
+        return scores / (len(keywords) * sum(weights.values()))
+
+    def candidates(self, latitude, longitude, radius, keywords=None, fields=SEARCH_FIELDS,
+                   status=None, exclude_ids=None, open_at=None):
+        """Return (rows, distances) within radius kilometers, not sorted"""
+        latitude = np.radians(float(latitude))
+        longitude = np.radians(float(longitude))
+        radius = float(radius)
+
+        # cheap latitude band before trigonometry
+        mask = np.abs(self.latitude - latitude) <= radius / EARTH_RADIUS
+
+        if status is not None:
+            mask &= self.status == self.statuses.index(status)
+
+        if exclude_ids:
+            mask &= ~np.isin(self.ids, list(exclude_ids))
+
+        if open_at is not None:
+            mask &= (self.opening_bitmap[:, open_at // 8] >> (open_at % 8) & 1).astype(bool)
+
+        if keywords:
+            mask &= self.match_keywords(keywords, fields=fields)
+
+        rows = np.flatnonzero(mask)
+        distances = haversine(latitude, longitude, self.latitude[rows],
+                              self.longitude[rows], self.cos_latitude[rows])
+
+        within = distances <= radius
+        return rows[within], distances[within]
+
+    def nearby(self, latitude, longitude, radius, keywords=None, fields=SEARCH_FIELDS,
+               status=None, exclude_ids=None, open_at=None):
+        """
+        Return (ids, distances) within radius kilometers sorted by distance,
+        keyword matched as `icontains` on any token, `open_at` is week slot
+        """
+        keywords = [keyword for keyword in (keywords or []) if keyword]
+        rows, distances = self.candidates(latitude, longitude, radius, keywords=keywords,
+                                          fields=fields, status=status,
+                                          exclude_ids=exclude_ids, open_at=open_at)
+
+        order = np.argsort(distances, kind='stable')
+        return self.ids[rows[order]], distances[order]
+
+    def ranked(self, latitude, longitude, radius, k, keywords=None, open_at=None):
+        """
+        Return (ids, scores, distances, total) of best k listing,
+        keyword searched in label, keyword and product label
+        """
+        keywords = [keyword for keyword in (keywords or []) if keyword]
+        rows, distances = self.candidates(latitude, longitude, radius, keywords=keywords,
+                                          fields=TOKEN_FIELDS, open_at=open_at)
+
+        relevance = self.relevance(rows, keywords, procure_settings.SEARCH_FIELD_WEIGHTS)
+        scores = rank_score(relevance, distances, self.create_at[rows])
+
+        top = top_k(scores, k)
+        return self.ids[rows[top]], scores[top], distances[top], len(rows)
+
+
+def haversine(latitude, longitude, latitudes, longitudes, cos_latitudes):
+    """Distance in kilometers, all angle in radians"""
+    a = np.sin((latitudes - latitude) / 2) ** 2 \
+        + np.cos(latitude) * cos_latitudes * np.sin((longitudes - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def get_snapshot(path=None):
+    """
+    Return current snapshot or None when missing or older than
+    LISTING_SNAPSHOT_MAX_AGE, caller fallback to database
+    """
+    path = path or procure_settings.LISTING_SNAPSHOT_DIR
+    now = time.time()
+
+    if now - _cache['checked_at'] >= procure_settings.LISTING_SNAPSHOT_CHECK_INTERVAL:
+        _cache['checked_at'] = now
+
+        try:
+            mtime = os.stat(_manifest_path(path)).st_mtime
+        except FileNotFoundError:
+            logger.warning('Listing snapshot missing in %s, run build_listing_snapshot', path)
+            _cache.update({'mtime': None, 'snapshot': None})
+            return None
+
+        if mtime != _cache['mtime']:
+            try:
+                with open(_manifest_path(path)) as f:
+                    manifest = json.load(f)
+                snapshot = ListingSnapshot(path, manifest)
+            except (OSError, ValueError, KeyError):
+                snapshot = None
+            _cache.update({'mtime': mtime, 'snapshot': snapshot})
+
+        snapshot = _cache['snapshot']
+        if snapshot is None or snapshot.age > procure_settings.LISTING_SNAPSHOT_MAX_AGE:
+            logger.warning('Listing snapshot in %s stale, run build_listing_snapshot', path)
+
+    snapshot = _cache['snapshot']
+    if snapshot is None or snapshot.age > procure_settings.LISTING_SNAPSHOT_MAX_AGE:
+        return None
+    return snapshot
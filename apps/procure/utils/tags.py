@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from taggit.models import TagBase
+
+from utils.generals import get_model
+
+TAG_MAX_LENGTH = TagBase._meta.get_field('name').max_length
+
+
+def normalize_tags(keyword):
+    """Keyword to set of lowercase tag name, TAGGIT_CASE_INSENSITIVE"""
+    if not keyword:
+        return set()
+    return {word[:TAG_MAX_LENGTH] for word in keyword.lower().split()}
+
+
+def get_or_create_tags(names):
+    """Return {lowercase name: tag id}, missing tag created in bulk"""
+    Tag = get_model('procure', 'Tag')
+
+    if not names:
+        return dict()
+
+    def lookup(names):
+        # plain name use unique index, collation already case insensitive
+        # and tag created here always lowercase
+        return {
+            name.lower(): tag_id for name, tag_id in
+            Tag.objects.filter(name__in=names).values_list('name', 'id')
+        }
+
+    tags = lookup(names)
+    missing = set(names) - set(tags)
+
+    if missing:
+        new_tags = list()
+        for name in missing:
+            tag = Tag(name=name)
+            tag.slug = tag.slugify(name)
+            new_tags.append(tag)
+
+        # concurrent insert or slug collision just skipped
+        Tag.objects.bulk_create(new_tags, ignore_conflicts=True)
+        tags.update(lookup(missing))
+
+        # slug collision, let taggit find unique slug
+        for name in missing - set(tags):
+            tag, _created = Tag.objects.get_or_create(name=name)
+            tags[name] = tag.id
+    return tags
+
+
+def sync_tags(instances, field='keyword'):
+    """
+    Sync tags of many instance with their keyword using set difference,
+    constant number of query whatever tags count
+    """
+    if not instances:
+        return
+
+    TagItem = get_model('procure', 'TagItem')
+    content_type = ContentType.objects.get_for_model(instances[0])
+    wanted = {instance.pk: normalize_tags(getattr(instance, field, None))
+              for instance in instances}
+
+    tags = get_or_create_tags(set().union(*wanted.values()))
+    current = defaultdict(dict)
+
+    items = TagItem.objects \
+        .filter(content_type=content_type, object_id__in=wanted.keys()) \
+        .values_list('id', 'object_id', 'tag_id')
+
+    for item_id, object_id, tag_id in items:
+        current[object_id][tag_id] = item_id
+
+    create_items = list()
+    delete_items = list()
+
+    for object_id, names in wanted.items():
+        tag_ids = {tags[name] for name in names}
+        existing = current[object_id]
+
+        create_items.extend(
+            TagItem(content_type=content_type, object_id=object_id, tag_id=tag_id)
+            for tag_id in tag_ids - set(existing)
+        )
+
+        delete_items.extend(
+            item_id for tag_id, item_id in existing.items()
+            if tag_id not in tag_ids
+        )
+
+    if create_items:
+        TagItem.objects.bulk_create(create_items)
+
+    if delete_items:
+        TagItem.objects.filter(id__in=delete_items).delete()
@@ -0,0 +1,196 @@
+"""
+On-demand attachment thumbnail
+
+Derivative generated on first request inside process pool, so decode of
+large upload never hold request thread GIL. Written to disk as
+
+    <settings.THUMBNAIL_CACHE_DIR>/<digest[:2]>/<digest>_<width>x<height>[c].<format>
+
+where digest is sha256 of source content, same upload attached twice
+share derivative. Digest of each file remembered in cache so next request
+only need one `os.path.exists`. Derivative older than THUMBNAIL_CACHE_EXPIRE
+removed by `purge_thumbnails` task, generated again when requested.
+"""
+import os
+import time
+import threading
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from utils.generals import get_model
+from utils.images import FORMATS, derivative_path, render_derivatives
+from apps.procure import settings as procure_settings
+from apps.procure.utils.membership import get_listing_ids
+
+# url kind to model
+ATTACHMENT_MODELS = {
+    'listing': 'ListingAttachment',
+    'product': 'ListingProductAttachment',
+    'inquiry': 'InquiryItemAttachment',
+    'negotiation': 'NegotiationAttachment',
+}
+
+# url kind to (inquiry owner, propose) lookup, same participant as
+# `negotiation.get_propose`, kind not listed here is public
+ATTACHMENT_SCOPES = {
+    'inquiry': ('inquiry_item__inquiry__user_id', 'inquiry_item__inquiry__proposes'),
+    'negotiation': ('negotiation__propose__inquiry__user_id', 'negotiation__propose'),
+}
+
+DIGEST_TIMEOUT = 60 * 60 * 24 * 30
+
+_lock = threading.Lock()
+_executor = None
+_pending = dict()
+
+
+class ThumbnailSpecError(ValueError):
+    pass
+
+
+def parse_spec(size, format=None, crop=None):
+    """
+    Parse `size` (`256` or `256x128`), `format` and `crop` query param.
+    Return (width, height, format, crop)
+    """
+    try:
+        width, _x, height = (size or '').lower().partition('x')
+        width = int(width)
+        height = int(height) if height else width
+    except ValueError:
+        raise ThumbnailSpecError("size must be like 256 or 256x128")
+
+    sizes = procure_settings.THUMBNAIL_SIZES
+    if width not in sizes or height not in sizes:
+        raise ThumbnailSpecError("size must be one of %s" % ', '.join(map(str, sizes)))
+
+    format = (format or procure_settings.THUMBNAIL_FORMATS[0]).lower()
+    if format == 'jpg':
+        format = 'jpeg'
+
+    if format not in procure_settings.THUMBNAIL_FORMATS:
+        raise ThumbnailSpecError("format must be one of %s"
+                                 % ', '.join(procure_settings.THUMBNAIL_FORMATS))
+
+    crop = str(crop).lower() in ('1', 'true', 'yes')
+    return width, height, format, crop
+
+
+def get_attachment_model(kind):
+    model_name = ATTACHMENT_MODELS.get(kind)
+    return get_model('procure', model_name) if model_name else None
+
+
+def get_attachment(kind, uuid, user_id):
+    """
+    Attachment of kind visible to user, None if not. Inquiry and negotiation
+    attachment only for inquiry owner or member of proposing listing
+    """
+    model = get_attachment_model(kind)
+    if model is None:
+        return None
+
+    queryset = model.objects.only('id', 'file', 'filemime').filter(uuid=uuid)
+    if kind in ATTACHMENT_SCOPES:
+        owner, propose = ATTACHMENT_SCOPES[kind]
+        queryset = queryset.filter(
+            Q(**{owner: user_id})
+            | Q(**{propose + '__listing_id__in': get_listing_ids(user_id)})
+        )
+    return queryset.first()
+
+
+def is_image(attachment):
+    mimetype = attachment.filemime or ''
+    return mimetype.startswith('image/')
+
+
+def mimetype(format):
+    return FORMATS[format][1]
+
+
+def _digest_key(file):
+    return 'procure:thumbnail:digest:{}:{}'.format(file.name, file.size)
+
+
+def _get_executor():
+    global _executor
+
+    if _executor is None:
+        # spawn, forked child of threaded server may inherit held lock
+        _executor = ProcessPoolExecutor(
+            max_workers=procure_settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    _executor = None
+
+
+def get_thumbnail(attachment, spec):
+    """
+    Return path of derivative, generated in process pool if missing.
+    Concurrent request of same derivative wait for single job
+    """
+    directory = settings.THUMBNAIL_CACHE_DIR
+    file = attachment.file
+    key = _digest_key(file)
+
+    digest = cache.get(key)
+    if digest:
+        path = derivative_path(directory, digest, *spec)
+        if os.path.exists(path):
+            return path
+
+    job = (file.name, spec)
+    with _lock:
+        future = _pending.get(job)
+        if future is None:
+            try:
+                future = _get_executor().submit(render_derivatives, file.path,
+                                                directory, [spec], digest)
+            except BrokenProcessPool:
+                _reset_executor()
+                future = _get_executor().submit(render_derivatives, file.path,
+                                                directory, [spec], digest)
+
+            _pending[job] = future
+            future.add_done_callback(lambda _future: _pending.pop(job, None))
+
+    digest, (path,) = future.result(timeout=procure_settings.THUMBNAIL_TIMEOUT)
+    cache.set(key, digest, DIGEST_TIMEOUT)
+    return path
+
+
+def set_digest(file, digest):
+    cache.set(_digest_key(file), digest, DIGEST_TIMEOUT)
+
+
+def purge_expired_thumbnails():
+    """Remove derivative older than THUMBNAIL_CACHE_EXPIRE, return count"""
+    expire_at = time.time() - procure_settings.THUMBNAIL_CACHE_EXPIRE
+
+    count = 0
+    for root, _dirs, names in os.walk(settings.THUMBNAIL_CACHE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < expire_at:
+                    os.unlink(path)
+                    count += 1
+            except FileNotFoundError:
+                # removed by other run
+                pass
+    return count
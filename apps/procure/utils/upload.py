@@ -0,0 +1,146 @@
+"""
+Resumable attachment upload
+
+Each chunk streamed from request body into its own temporary file,
+whole body never held in memory, then copied to
+<UPLOAD_SESSION_DIR>/<session uuid>.part at its offset while session row
+locked. Retried or parallel chunk never skip nor overwrite bytes.
+"""
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from utils.generals import get_model
+from apps.procure import settings as procure_settings
+
+COPY_BUFFER_SIZE = 64 * 1024
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+# target: (model, attachment model, attachment foreign key, owner lookup)
+TARGETS = {
+    'inquiry_item': ('InquiryItem', 'InquiryItemAttachment', 'inquiry_item', 'inquiry__user_id'),
+    'negotiation': ('Negotiation', 'NegotiationAttachment', 'negotiation', 'user_id'),
+}
+
+
+class ChunkError(ValueError):
+    pass
+
+
+def part_path(session):
+    return os.path.join(settings.UPLOAD_SESSION_DIR, '%s.part' % session.uuid)
+
+
+def get_target(target, uuid, user_id):
+    """Target instance owned by user, None if not found"""
+    model_name, _attachment, _field, owner = TARGETS[target]
+    model = get_model('procure', model_name)
+    return model.objects.filter(uuid=uuid, **{owner: user_id}).first()
+
+
+def parse_content_range(header, session):
+    """Return (start, length) of chunk from `Content-Range: bytes 0-1023/4096`"""
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise ChunkError("Content-Range must be like bytes 0-1023/%s" % session.size)
+
+    start, end, total = map(int, match.groups())
+    length = end - start + 1
+
+    if total != session.size or end >= total or length <= 0:
+        raise ChunkError("Content-Range outside of upload size %s" % session.size)
+
+    if length > procure_settings.UPLOAD_CHUNK_MAX_SIZE:
+        raise ChunkError("Chunk larger than %s bytes" % procure_settings.UPLOAD_CHUNK_MAX_SIZE)
+    return start, length
+
+
+def write_chunk(session, stream, start, length):
+    """
+    Copy `length` bytes of stream to part file at `start`, return new
+    offset or None if other request moved offset meanwhile.
+    Short body (connection lost) still kept, client resume from there
+    """
+    UploadSession = get_model('procure', 'UploadSession')
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # client may send slowly, row only locked while copying local file
+    with tempfile.TemporaryFile(dir=os.path.dirname(path)) as chunk_file:
+        written = 0
+        while written < length:
+            chunk = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not chunk:
+                break
+            chunk_file.write(chunk)
+            written += len(chunk)
+
+        with transaction.atomic():
+            locked = UploadSession.objects.select_for_update() \
+                .only('offset', 'status').get(id=session.id)
+            if locked.offset != start or locked.status != UploadSession.Status.PENDING:
+                return None
+
+            chunk_file.seek(0)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                f.seek(start)
+                shutil.copyfileobj(chunk_file, f, COPY_BUFFER_SIZE)
+
+            offset = start + written
+            UploadSession.objects.filter(id=session.id).update(offset=offset)
+    return offset
+
+
+def finalize(session):
+    """
+    Attach assembled file to target, run inside transaction.
+    Raise ChunkError when part file missing or size not match
+    """
+    UploadSession = get_model('procure', 'UploadSession')
+    _model, attachment_model_name, field, _owner = TARGETS[session.target]
+    Attachment = get_model('procure', attachment_model_name)
+    path = part_path(session)
+
+    # chunk written by other host without shared UPLOAD_SESSION_DIR
+    if not os.path.isfile(path) or os.path.getsize(path) != session.size:
+        raise ChunkError("Uploaded file incomplete, upload again")
+
+    attachment = Attachment(caption=session.caption, **{'%s_id' % field: session.target_id})
+    with open(path, 'rb') as f:
+        # storage stream and hash it, see ContentAddressedStorage
+        attachment.file = File(f, name=session.filename)
+        attachment.save()
+
+    session.status = UploadSession.Status.COMPLETE
+    session.attachment_uuid = attachment.uuid
+    session.save(update_fields=['status', 'attachment_uuid', 'update_at'])
+
+    transaction.on_commit(lambda: remove_part(path))
+    return attachment
+
+
+def remove_part(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired_sessions():
+    """Unfinished part file removed, finished only the record"""
+    UploadSession = get_model('procure', 'UploadSession')
+    sessions = UploadSession.objects.filter(expire_at__lt=timezone.now())
+
+    count = 0
+    for session in sessions.only('id', 'uuid').iterator():
+        remove_part(part_path(session))
+        count += 1
+
+    sessions.delete()
+    return count
@@ -1,6 +1,39 @@
 from django.conf import settings
+from celery.schedules import crontab
 
 broker_url = settings.REDIS_URL
 broker_transport_options = {'visibility_timeout': 3600} 
 result_backend = settings.REDIS_URL
 task_serializer = 'json'
+
+# periodic tasks, run with `celery -A setup beat`
+beat_schedule = {
+    'purge-expired-securecode': {
+        'task': 'apps.person.tasks.purge_expired_securecode',
+        'schedule': crontab(minute=0, hour=3),
+    },
+    'deliver-mail-outbox': {
+        'task': 'apps.notifier.tasks.deliver_mail_outbox',
+        'schedule': 60.0,
+    },
+    'close-expired-inquiries': {
+        'task': 'apps.procure.tasks.close_expired_inquiries',
+        'schedule': crontab(minute='*/5'),
+    },
+    'build-listing-snapshot': {
+        'task': 'apps.procure.tasks.build_listing_snapshot',
+        'schedule': crontab(minute='*/5'),
+    },
+    'relay-outbox': {
+        'task': 'apps.notifier.tasks.relay_outbox',
+        'schedule': 30.0,
+    },
+    'purge-upload-sessions': {
+        'task': 'apps.procure.tasks.purge_upload_sessions',
+        'schedule': crontab(minute=30),
+    },
+    'purge-thumbnails': {
+        'task': 'apps.procure.tasks.purge_thumbnails',
+        'schedule': crontab(minute=0, hour=4),
+    },
+}
@@ -12,6 +12,8 @@ DEBUG_PROPAGATE_EXCEPTIONS = False
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(PROJECT_PATH, 'media/')
+UPLOAD_SESSION_DIR = os.path.join(MEDIA_ROOT, '.upload')
+THUMBNAIL_CACHE_DIR = os.path.join(MEDIA_ROOT, '.thumbnail')
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (
@@ -19,6 +21,11 @@ STATICFILES_DIRS = (
 )
 
 
+# Email
+# outbox delivered to console, no SMTP needed on local
+MAIL_OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 DATABASES = {
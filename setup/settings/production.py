@@ -83,6 +83,15 @@ CORS_ALLOW_HEADERS = list(default_headers) + [
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 STATIC_ROOT = os.path.join(PROJECT_PATH, 'static')
 MEDIA_ROOT = os.path.join(PROJECT_PATH, 'media')
+UPLOAD_SESSION_DIR = os.path.join(MEDIA_ROOT, '.upload')
+THUMBNAIL_CACHE_DIR = os.path.join(MEDIA_ROOT, '.thumbnail')
+
+# hashed name from collectstatic, WhiteNoise send it as immutable
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# nginx:
+#   location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+# then set MEDIA_SENDFILE_BACKEND = 'nginx'
 
 
 # Database
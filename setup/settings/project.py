@@ -40,6 +40,10 @@ PROJECT_MIDDLEWARE = [
 ]
 MIDDLEWARE = PROJECT_MIDDLEWARE + MIDDLEWARE
 
+# static files, right after SecurityMiddleware
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                  'whitenoise.middleware.WhiteNoiseMiddleware')
+
 
 # Specifying authentication backends
 # https://docs.djangoproject.com/en/3.0/topics/auth/customizing/
@@ -116,18 +120,30 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # for mobile apps this must removed
         # 'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
+        # credentials only accepted on token endpoint, exchanged for JWT
+        # BasicAuthentication hash password on every request
+        'apps.person.utils.auth.JWTAuthenticationExtend'
     ],
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.NamespaceVersioning',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
-    'PAGE_SIZE': PAGINATION_PER_PAGE
+    'PAGE_SIZE': PAGINATION_PER_PAGE,
+    # used by utils.throttling, key `<scope>.<kind>` or `<scope>`
+    'DEFAULT_THROTTLE_RATES': {
+        'securecode.ip': '30/hour',
+        'securecode.identifier': '5/hour',
+        'existence_check.ip': '60/minute',
+        'token.ip': '30/minute',
+        'token.identifier': '10/minute',
+        'listing_search.user': '60/minute',
+    },
 }
 
 
 # Email Configuration
 # https://docs.djangoproject.com/en/3.0/topics/email/
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# email written to outbox, delivered by apps.notifier.tasks.deliver_mail_outbox
+EMAIL_BACKEND = 'apps.notifier.backends.OutboxEmailBackend'
+MAIL_OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
 
 # REDIS
@@ -148,3 +164,34 @@ EMAIL_USE_SSL = False
 # Django-taggit
 # https: // django-taggit.readthedocs.io/en/latest/getting_started.html
 TAGGIT_CASE_INSENSITIVE = True
+
+
+# Django-simple-history
+# written in bulk after commit by utils.history.BufferedHistoricalRecords
+# True send record to celery instead of write it in request
+HISTORY_WRITE_QUEUE = False
+
+# days kept by `manage.py prune_history`
+HISTORY_RETENTION_DAYS = 180
+
+
+# MEDIA
+# served by utils.media.serve, file handed to front server when set
+# 'nginx' (X-Accel-Redirect) or 'apache' (X-Sendfile)
+MEDIA_SENDFILE_BACKEND = None
+
+# nginx internal location alias of MEDIA_ROOT
+MEDIA_ACCEL_REDIRECT_URL = '/protected-media/'
+
+# seconds, private cache of media outside content addressed blob,
+# blob never change so always cached as immutable for one year
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
+
+# directories below set next to MEDIA_ROOT of each environment,
+# shared between hosts like MEDIA_ROOT itself:
+#   UPLOAD_SESSION_DIR    part file of resumable upload, chunk of one
+#                         session may reach any web host, never served
+#                         by utils.media
+#   THUMBNAIL_CACHE_DIR   attachment thumbnail keyed by content hash and
+#                         spec, each derivative generated once, expired
+#                         one removed by `purge_thumbnails`
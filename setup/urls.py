@@ -1,19 +1,18 @@
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 
 from api import routers as api_routers
+from utils import media
 
 urlpatterns = [
     path('api/', include(api_routers)),
     path('admin/', admin.site.urls),
-]
 
-urlpatterns += static(settings.MEDIA_URL,
-                      document_root=settings.MEDIA_ROOT)
-urlpatterns += static(settings.STATIC_URL,
-                      document_root=settings.STATIC_ROOT)
+    # static served by WhiteNoiseMiddleware
+    re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), media.serve,
+            name='media'),
+]
 
 # Remove admin sidebar nav sidebar
 # https://docs.djangoproject.com/en/3.1/ref/contrib/admin/#django.contrib.admin.AdminSite.enable_nav_sidebar
@@ -26,8 +25,3 @@ if settings.DEBUG and not settings.IS_UNIX:
     urlpatterns = [
         path('__debug__/', include(debug_toolbar.urls)),
     ] + urlpatterns
-
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL,
-                          document_root=settings.STATIC_ROOT)
@@ -1,58 +1,52 @@
 from urllib.parse import parse_qs
 
-from django.db import close_old_connections
-from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
-from channels.auth import AuthMiddlewareStack
+from channels.middleware import BaseMiddleware
 
-UserModel = get_user_model()
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
+from apps.person.utils.auth import JWTAuthenticationExtend
+from apps.person.utils.snapshot import get_cached_user, get_user_snapshot
 
-@database_sync_to_async
-def get_user(token):
-    user = UserModel.objects.get(uuid=token)
+jwt_authentication = JWTAuthenticationExtend()
 
-    if user:
-        return user
-    return None
 
+async def get_user(token):
+    # validate same access token as REST API
+    try:
+        validated_token = jwt_authentication.get_validated_token(token)
+        user_uuid = validated_token[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return AnonymousUser()
 
-class TokenAuthMiddleware:
-    def __init__(self, inner):
-        self.inner = inner
+    # cache lookup run outside DB thread,
+    # so reconnect storm not queued behind ORM calls
+    user = await sync_to_async(get_cached_user, thread_sensitive=False)(user_uuid)
+    if user is None:
+        user = await database_sync_to_async(get_user_snapshot)(user_uuid)
 
-    def __call__(self, scope):
-        return TokenAuthMiddlewareInstance(scope, self)
+    if user is None or not user.is_active:
+        return AnonymousUser()
+    return user
 
 
-class TokenAuthMiddlewareInstance:
+class TokenAuthMiddleware(BaseMiddleware):
     """
-    Yeah, this is black magic:
-    https://github.com/django/channels/issues/1399
+    Authenticate websocket with SimpleJWT access token
+    :token set in request param, ie: ws://host/ws/path/?token=<access>
     """
 
-    def __init__(self, scope, middleware):
-        self.middleware = middleware
-        self.scope = dict(scope)
-        self.inner = self.middleware.inner
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        query_param = parse_qs(scope.get('query_string', b''))
+        token = query_param.get(b'token', [b''])[0].decode('utf-8')
 
-    async def __call__(self, receive, send):
-        query_param = parse_qs(self.scope['query_string'])
+        scope['user'] = await get_user(token) if token else AnonymousUser()
+        return await super().__call__(scope, receive, send)
 
-        # close old connection
-        close_old_connections()
 
-        # check JWT token
-        # then authenticated user
-        # :token set in request param
-        if b'token' in query_param:
-            token = query_param[b'token'][0].decode('utf-8')
-            if token:
-                self.scope['user'] = await get_user(token)
-
-        return await self.inner(self.scope, receive, send)
-
-
-def TokenAuthMiddlewareStack(inner): return TokenAuthMiddleware(
-    AuthMiddlewareStack(inner))
+def TokenAuthMiddlewareStack(inner): return TokenAuthMiddleware(inner)
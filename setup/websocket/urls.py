@@ -1,4 +1,11 @@
 from django.urls import path
 
+from apps.notifier.consumers import NotificationConsumer
+from apps.procure.consumers import InquiryLeaderboardConsumer, NegotiationConsumer
+
 # Channels
-websocket_urlpatterns = []
+websocket_urlpatterns = [
+    path('ws/notifier/notifications/', NotificationConsumer.as_asgi()),
+    path('ws/procure/proposes/<uuid:uuid>/negotiations/', NegotiationConsumer.as_asgi()),
+    path('ws/procure/inquiries/<uuid:uuid>/leaderboard/', InquiryLeaderboardConsumer.as_asgi()),
+]
@@ -0,0 +1,18 @@
+import redis
+
+from django.conf import settings
+
+_connection = None
+
+
+def get_redis_connection():
+    """
+    Shared redis client for atomic operations not covered by django cache,
+    connection pool created once per process
+    """
+    global _connection
+
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.REDIS_URL,
+                                           decode_responses=True)
+    return _connection
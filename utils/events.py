@@ -0,0 +1,173 @@
+"""
+Domain event dispatcher
+
+Handler subscribed to event name and always receive list of instance,
+so same handler serve single save and bulk operation.
+
+    @events.subscribe('procure.offer.created', select_related=('propose__inquiry',))
+    def offer_created_handler(offers):
+        ...
+
+    @transaction.atomic
+    def create(self, request):
+        with events.atomic():
+            Offer.objects.bulk_create(offers)
+            events.emit('procure.offer.created', offers)
+
+        # rows created by handler already there
+        return Response(RetrieveOfferSerializer(offers, many=True).data)
+
+Inside `events.atomic` event collected and deduplicated by (event, pk),
+handlers run in batch when outermost block exit, before commit of any
+enclosing transaction. Build response after the block.
+Outside it event dispatched immediately with the emitted instances,
+reloaded only when a handler ask select_related or queryset emitted.
+Collected event always reloaded once per event with select_related
+from all handlers, rows rolled back by inner savepoint simply not found.
+"""
+import threading
+
+from collections import defaultdict
+from contextlib import ContextDecorator
+
+from django.db import transaction
+from django.db.models import QuerySet
+
+# handler can emit another event, stop endless cascade
+MAX_FLUSH_ROUNDS = 10
+
+_handlers = defaultdict(list)
+_state = threading.local()
+
+
+def subscribe(event, select_related=()):
+    def decorator(handler):
+        _handlers[event].append((handler, tuple(select_related)))
+        return handler
+    return decorator
+
+
+def _collectors():
+    if not hasattr(_state, 'collectors'):
+        _state.collectors = []
+    return _state.collectors
+
+
+def _collect(collected, event, model, pks):
+    _model, _pks = collected.setdefault(event, (model, dict()))
+    _pks.update(dict.fromkeys(pks))
+
+
+def emit(event, instances):
+    """Emit event for instance, list of instance or queryset"""
+    if not _handlers.get(event):
+        return
+
+    if isinstance(instances, QuerySet):
+        model = instances.model
+        pks = list(instances.values_list('pk', flat=True))
+    else:
+        if not isinstance(instances, (list, tuple, set)):
+            instances = [instances]
+
+        instances = [instance for instance in instances if instance.pk is not None]
+        if not instances:
+            return
+
+        model = instances[0]._meta.concrete_model
+        pks = [instance.pk for instance in instances]
+
+    if not pks:
+        return
+
+    collectors = _collectors()
+    if collectors:
+        _collect(collectors[-1][0], event, model, pks)
+    elif isinstance(instances, QuerySet):
+        dispatch(event, model, pks)
+    else:
+        dispatch(event, model, pks, instances=instances)
+
+
+def emit_model_saved(sender, instance, created, raw=False, **kwargs):
+    """post_save receiver, emit `<app_label>.<model>.created` and `.saved`"""
+    if raw:
+        return
+
+    label = instance._meta.label_lower
+    if created:
+        emit('%s.created' % label, instance)
+    emit('%s.saved' % label, instance)
+
+
+def dispatch(event, model, pks, instances=None):
+    handlers = _handlers.get(event, [])
+    related = set()
+
+    for _handler, select_related in handlers:
+        related.update(select_related)
+
+    if instances is not None and not related:
+        # just saved, nothing to load
+        objs = {instance.pk: instance for instance in instances}
+    else:
+        queryset = model._base_manager.all()
+        if related:
+            queryset = queryset.select_related(*related)
+        objs = queryset.in_bulk(list(pks))
+
+    instances = [objs[pk] for pk in dict.fromkeys(pks) if pk in objs]
+
+    if instances:
+        for handler, _select_related in handlers:
+            handler(instances)
+
+
+def flush(collected):
+    for _round in range(MAX_FLUSH_ROUNDS):
+        if not collected:
+            return
+
+        pending = dict(collected)
+        collected.clear()
+
+        for event, (model, pks) in pending.items():
+            dispatch(event, model, pks)
+
+    raise RuntimeError('Domain event still emitted after %s rounds' % MAX_FLUSH_ROUNDS)
+
+
+class atomic(ContextDecorator):
+    """
+    transaction.atomic which collect domain event, nested block
+    pass their event to outer block, outermost one run handlers
+    """
+
+    def __init__(self, using=None, savepoint=True):
+        self.using = using
+        self.savepoint = savepoint
+
+    def __enter__(self):
+        # decorated function shared between threads, keep state in thread local
+        atomic = transaction.atomic(using=self.using, savepoint=self.savepoint)
+        atomic.__enter__()
+        _collectors().append((dict(), atomic))
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        collectors = _collectors()
+        collected, atomic = collectors[-1]
+
+        try:
+            if exc_type is None:
+                if len(collectors) > 1:
+                    for event, (model, pks) in collected.items():
+                        _collect(collectors[-2][0], event, model, pks)
+                else:
+                    flush(collected)
+        except Exception as e:
+            collectors.pop()
+            atomic.__exit__(type(e), e, e.__traceback__)
+            raise
+
+        collectors.pop()
+        return atomic.__exit__(exc_type, exc_value, traceback)
@@ -1,9 +1,18 @@
 import os
 import calendar
 import time
+import hashlib
+import mimetypes
+import tempfile
 
 from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.template.defaultfilters import slugify
+from django.utils.deconstruct import deconstructible
+
+from utils.generals import get_model
+from utils.mixin.generals import DEFERRED
 
 ALLOWED_EXTENSIONS = ['.jpeg', '.jpg', '.png', '.pdf', '.docx']
 
@@ -27,6 +36,183 @@ class FileSystemStorageExtend(FileSystemStorage):
                 dirname, self.get_valid_name(slugify(filename)+file_ext)))
 
 
+@deconstructible
+class ContentAddressedStorage(FileSystemStorageExtend):
+    """
+    Each content stored once as `blob/<ab>/<cd>/<sha256><ext>`, digest
+    calculated while upload streamed to temporary file. Reference counted
+    in `blob_model` within caller transaction, file and row removed after
+    commit of last reference deleted.
+
+    Digest, size and mimetype attached to saved content as `content.blob`
+    so model fill metadata without read file again, see `fill_file_metadata`
+    """
+
+    BLOB_DIR = 'blob'
+
+    def __init__(self, *args, blob_model='procure.Blob', **kwargs):
+        super().__init__(*args, **kwargs)
+        self.blob_model = blob_model
+
+    def _blob_model(self):
+        return get_model(*self.blob_model.split('.'))
+
+    def generate_filename(self, filename):
+        # name only used for extension, no instance needed
+        return FileSystemStorage.generate_filename(self, filename)
+
+    def get_available_name(self, name, max_length=None):
+        # same content always same name
+        return name
+
+    def _stream(self, content):
+        """Write to temporary file in storage, return (path, digest, size)"""
+        directory = self.path(self.BLOB_DIR)
+        os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.upload')
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp, digest.hexdigest(), size
+
+    def _acquire(self, digest, defaults):
+        """
+        Blob of digest locked and referenced once more in caller transaction,
+        so rolled back save drop its reference too. Concurrent identical
+        upload hit unique digest, retried as existing blob.
+        """
+        Blob = self._blob_model()
+
+        blobs = Blob.objects.select_for_update()
+        blob = blobs.filter(digest=digest).first()
+        if blob is None:
+            try:
+                with transaction.atomic():
+                    blob = Blob.objects.create(digest=digest, **defaults)
+            except IntegrityError:
+                # created by other upload meanwhile
+                blob = blobs.get(digest=digest)
+
+        Blob.objects.filter(id=blob.id).update(refcount=F('refcount') + 1)
+        return blob
+
+    def _save(self, name, content):
+        tmp, digest, size = self._stream(content)
+        ext = os.path.splitext(name)[1].lower()
+        blob_name = '/'.join([self.BLOB_DIR, digest[:2], digest[2:4], digest + ext])
+        mimetype = mimetypes.guess_type(name)[0] \
+            or getattr(content, 'content_type', None) \
+            or 'application/octet-stream'
+
+        try:
+            with transaction.atomic():
+                blob = self._acquire(digest, {'name': blob_name, 'size': size,
+                                              'mimetype': mimetype})
+
+                # file only removed by `_collect` holding the same row lock
+                path = self.path(blob.name)
+                if os.path.exists(path):
+                    os.unlink(tmp)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.chmod(tmp, self.file_permissions_mode or 0o644)
+                    os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        content.blob = blob
+        return blob.name
+
+    def _collect(self, name):
+        """Remove unreferenced blob and its file, after delete committed"""
+        Blob = self._blob_model()
+
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name, refcount=0).first()
+            if blob is None:
+                # referenced again meanwhile
+                return
+
+            blob.delete()
+            super().delete(name)
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+
+        if not name.startswith(self.BLOB_DIR + '/'):
+            # stored before content addressed
+            return super().delete(name)
+
+        # decrement part of caller transaction, rolled back with it
+        Blob = self._blob_model()
+        updated = Blob.objects.filter(name=name, refcount__gt=0) \
+            .update(refcount=F('refcount') - 1)
+
+        if updated:
+            transaction.on_commit(lambda: self._collect(name))
+
+
+def fill_file_metadata(instance, field='file'):
+    """
+    Save uncommitted upload now and fill filename, filepath, filesize
+    and filemime from what storage found while writing it
+    """
+    file = getattr(instance, field)
+    if not file or file._committed:
+        return
+
+    content = file.file
+    filename = os.path.basename(content.name or file.name)
+    file.save(filename, content, save=False)
+
+    # new reference taken even when same content as replaced file
+    instance._file_stored = True
+
+    blob = getattr(content, 'blob', None)
+    instance.filename = filename[:255]
+    instance.filepath = file.name
+    instance.filesize = blob.size if blob else content.size
+    instance.filemime = blob.mimetype if blob else \
+        mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def release_file_handler(sender, instance, **kwargs):
+    """post_delete of attachment, drop its blob reference"""
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+def replace_file_handler(sender, instance, created, update_fields=None, **kwargs):
+    """
+    post_save of attachment tracking `file`, drop blob reference of
+    replaced file. Released in saving transaction, file removed on commit
+    """
+    stored = instance.__dict__.pop('_file_stored', False)
+    if created or (update_fields is not None and 'file' not in update_fields):
+        return
+
+    old = instance.loaded_value('file')
+    name = getattr(old, 'name', old)
+    if name is DEFERRED or not name:
+        return
+
+    if stored or name != instance.file.name:
+        instance.file.storage.delete(name)
+
+
 def handle_upload_attachment(instance, file):
     if instance and file:
         name, ext = os.path.splitext(file.name)
@@ -0,0 +1,242 @@
+"""
+Buffered simple_history backend
+
+    register(Offer, app=__package__, records_class=BufferedHistoricalRecords,
+             fields=('cost', 'description',), diff_only=True)
+
+`fields` allowlist columns copied to historical table, primary key
+always kept. `diff_only` skip update record when no tracked field
+changed since the instance loaded.
+
+Record written in bulk after transaction committed, rolled back
+savepoint drop their record, post_create_historical_record sent for
+each after written. With HISTORY_WRITE_QUEUE record sent to celery
+instead of written by the request.
+"""
+import json
+import logging
+import weakref
+import threading
+
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.db.models.signals import post_init
+from django.utils import timezone
+
+from celery import shared_task
+from simple_history.models import HistoricalRecords
+from simple_history.signals import (
+    post_create_historical_record,
+    pre_create_historical_record
+)
+
+_state = threading.local()
+logger = logging.getLogger(__name__)
+
+
+class HistoryBuffer:
+    """
+    Record written together by one on_commit callback. Only that callback
+    hold the buffer, so it gone once committed or its savepoint rolled back.
+    """
+
+    def __init__(self, using, savepoint_ids):
+        self.using = using
+        self.savepoint_ids = set(savepoint_ids)
+        self.records = list()
+        self.is_written = False
+
+    def __call__(self):
+        self.is_written = True
+
+        # data already committed, error here would skip later callbacks
+        try:
+            write_records(self.records, self.using)
+        except Exception:
+            logger.exception('History records not written')
+
+
+def get_buffer(using):
+    """
+    Buffer for current transaction. Record may join buffer registered
+    under same or deeper savepoints, deeper one already released
+    so both dropped together if outer savepoint rolled back.
+    """
+    if not hasattr(_state, 'buffers'):
+        _state.buffers = defaultdict(list)
+
+    refs = _state.buffers[using] = [
+        ref for ref in _state.buffers[using]
+        if ref() is not None and not ref().is_written
+    ]
+
+    savepoint_ids = set(connections[using].savepoint_ids)
+    for ref in reversed(refs):
+        buffer = ref()
+        if buffer is not None and savepoint_ids <= buffer.savepoint_ids:
+            return buffer
+
+    buffer = HistoryBuffer(using, savepoint_ids)
+    refs.append(weakref.ref(buffer))
+    transaction.on_commit(buffer, using=using)
+    return buffer
+
+
+def write_records(records, using=None):
+    """`records` list of (instance, history_instance, signal kwargs)"""
+    grouped = defaultdict(list)
+    for record in records:
+        grouped[record[1].__class__].append(record)
+
+    if getattr(settings, 'HISTORY_WRITE_QUEUE', False):
+        queue_records(grouped)
+    else:
+        try:
+            with transaction.atomic(using=using):
+                for model, model_records in grouped.items():
+                    model._default_manager.using(using).bulk_create(
+                        [history_instance for _instance, history_instance, _kwargs in model_records])
+        except Exception:
+            # not lost, worker retry the write
+            logger.exception('History bulk write failed, sent to queue')
+            queue_records(grouped)
+
+    # queued record sent when handed to celery
+    for model, model_records in grouped.items():
+        for instance, history_instance, kwargs in model_records:
+            post_create_historical_record.send(
+                sender=model,
+                instance=instance,
+                history_instance=history_instance,
+                **kwargs
+            )
+
+
+def queue_records(grouped):
+    for model, model_records in grouped.items():
+        write_history.delay(model._meta.label, serialize_records(
+            [history_instance for _instance, history_instance, _kwargs in model_records]))
+
+
+def serialize_records(records):
+    fields = records[0]._meta.concrete_fields
+    return json.dumps(
+        [{field.attname: getattr(record, field.attname) for field in fields}
+         for record in records],
+        cls=DjangoJSONEncoder
+    )
+
+
+@shared_task
+def write_history(label, rows):
+    model = apps.get_model(label)
+    fields = model._meta.concrete_fields
+    records = [
+        model(**{field.attname: field.to_python(row[field.attname]) for field in fields})
+        for row in json.loads(rows)
+    ]
+
+    model._default_manager.bulk_create(records)
+
+
+class BufferedHistoricalRecords(HistoricalRecords):
+    def __init__(self, *args, fields=None, diff_only=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.allowed_fields = fields
+        self.diff_only = diff_only
+
+    def fields_included(self, model):
+        fields = super().fields_included(model)
+        if self.allowed_fields is None:
+            return fields
+
+        return [field for field in fields
+                if field.primary_key or field.name in self.allowed_fields]
+
+    def tracked_fields(self, model):
+        # auto_now always changed, not a change by itself
+        return [field for field in self.fields_included(model)
+                if not field.primary_key and not getattr(field, 'auto_now', False)]
+
+    def finalize(self, sender, **kwargs):
+        super().finalize(sender, **kwargs)
+
+        if self.diff_only and sender is self.cls:
+            post_init.connect(self.snapshot, sender=sender, weak=False,
+                              dispatch_uid='history_snapshot_%s' % sender._meta.label_lower)
+
+    def snapshot(self, instance, **kwargs):
+        # deferred field not in __dict__, never load it here
+        instance._history_snapshot = {
+            field.attname: instance.__dict__[field.attname]
+            for field in self.tracked_fields(instance.__class__)
+            if field.attname in instance.__dict__
+        }
+
+    def has_changed(self, instance):
+        snapshot = getattr(instance, '_history_snapshot', None)
+        if snapshot is None:
+            return True
+
+        for field in self.tracked_fields(instance.__class__):
+            if field.attname not in instance.__dict__:
+                continue
+
+            if (
+                field.attname not in snapshot
+                or snapshot[field.attname] != instance.__dict__[field.attname]
+            ):
+                return True
+        return False
+
+    def create_historical_record(self, instance, history_type, using=None):
+        if self.diff_only and history_type == '~' and not self.has_changed(instance):
+            return
+
+        using = using if self.use_base_model_db else None
+        history_date = getattr(instance, '_history_date', timezone.now())
+        history_user = self.get_history_user(instance)
+        history_change_reason = self.get_change_reason_for_object(
+            instance, history_type, using
+        )
+        manager = getattr(instance, self.manager_name)
+
+        attrs = {}
+        for field in self.fields_included(instance):
+            attrs[field.attname] = getattr(instance, field.attname)
+
+        history_instance = manager.model(
+            history_date=history_date,
+            history_type=history_type,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            **attrs,
+        )
+
+        signal_kwargs = {
+            'history_date': history_date,
+            'history_user': history_user,
+            'history_change_reason': history_change_reason,
+            'using': using,
+        }
+
+        pre_create_historical_record.send(
+            sender=manager.model,
+            instance=instance,
+            history_instance=history_instance,
+            **signal_kwargs
+        )
+
+        record = (instance, history_instance, signal_kwargs)
+        write_using = using or router.db_for_write(manager.model, instance=instance)
+        if connections[write_using].in_atomic_block:
+            get_buffer(write_using).records.append(record)
+        else:
+            write_records([record], write_using)
+
+        if self.diff_only:
+            self.snapshot(instance)
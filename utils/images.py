@@ -0,0 +1,125 @@
+"""
+Image derivative with Pillow
+
+Orientation from EXIF applied to pixels then all metadata dropped,
+so derivative never leak camera or GPS information.
+"""
+import io
+import os
+import hashlib
+import tempfile
+
+from PIL import Image, ImageOps
+
+# pillow format, mimetype, save options
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'image/png', {'optimize': True}),
+}
+
+
+def open_image(file):
+    """Open and apply EXIF orientation, file position reset first"""
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+    image = Image.open(file)
+    image.load()
+
+    transposed = ImageOps.exif_transpose(image)
+    transposed.format = image.format
+    return transposed
+
+
+def resize(image, width, height=None, crop=False):
+    """
+    Fit inside width x height keeping ratio (never upscaled),
+    or crop to exactly width x height
+    """
+    height = height or width
+    if crop:
+        return ImageOps.fit(image, (width, height), method=Image.LANCZOS)
+
+    image = image.copy()
+    image.thumbnail((width, height), Image.LANCZOS)
+    return image
+
+
+def encode(image, format):
+    """Return bytes without metadata"""
+    pil_format, _mimetype, options = FORMATS[format]
+
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA')
+
+    output = io.BytesIO()
+    image.save(output, format=pil_format, **options)
+    return output.getvalue()
+
+
+def make_thumbnail(file, width, height=None, format='webp', crop=False):
+    return encode(resize(open_image(file), width, height=height, crop=crop), format)
+
+
+def source_format(image, default='jpeg'):
+    """Derivative format closest to source format"""
+    format = (image.format or '').lower()
+    return format if format in FORMATS else default
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """sha256 hex of file content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def derivative_path(directory, digest, width, height, format, crop=False):
+    """Cache path of derivative, content of source and spec only"""
+    name = '{}_{}x{}{}.{}'.format(digest, width, height, 'c' if crop else '', format)
+    return os.path.join(directory, digest[:2], name)
+
+
+def write_atomic(path, content):
+    """Reader never see partial file"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def render_derivatives(source, directory, specs, digest=None):
+    """
+    Run inside worker process, Django not required.
+    Decode source once and write each missing (width, height, format, crop)
+    derivative. Return (digest, [path, ...]) same order as specs
+    """
+    digest = digest or file_digest(source)
+    paths = [derivative_path(directory, digest, *spec) for spec in specs]
+    missing = [(spec, path) for spec, path in zip(specs, paths) if not os.path.exists(path)]
+
+    if missing:
+        with open(source, 'rb') as f:
+            image = open_image(f)
+
+        for (width, height, format, crop), path in missing:
+            write_atomic(path, encode(resize(image, width, height=height, crop=crop), format))
+    return digest, paths
@@ -0,0 +1,173 @@
+"""
+Serve MEDIA_ROOT
+
+With MEDIA_SENDFILE_BACKEND front server send the file, worker only
+return headers:
+
+    nginx       X-Accel-Redirect to MEDIA_ACCEL_REDIRECT_URL + path,
+                location must be `internal` and alias MEDIA_ROOT
+    apache      X-Sendfile with absolute path (mod_xsendfile)
+
+Without it FileResponse used, single `Range` and conditional request
+supported so client can resume and revalidate.
+
+Content addressed blob never change, cached as immutable. Media hold user
+document too, so only private cache allowed.
+"""
+import os
+import re
+import stat
+import mimetypes
+
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from utils.files import ContentAddressedStorage
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def _etag(stat_result):
+    return '"%x-%x"' % (int(stat_result.st_mtime), stat_result.st_size)
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) inclusive of single range, None when header absent
+    or not supported (whole file sent), raise ValueError if not satisfiable
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # suffix, last n bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return if_none_match.strip() == '*' or etag in if_none_match
+
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def _sendfile(path, name):
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend == 'nginx':
+        return {'X-Accel-Redirect': quote(settings.MEDIA_ACCEL_REDIRECT_URL + name)}
+    if backend == 'apache':
+        return {'X-Sendfile': path}
+    return None
+
+
+@require_safe
+def serve(request, path):
+    # dot directory private, ie: upload part file
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404
+
+    try:
+        stat_result = os.stat(fullpath)
+    except OSError:
+        raise Http404
+
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+
+    name = os.path.relpath(fullpath, settings.MEDIA_ROOT).replace(os.sep, '/')
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    etag = _etag(stat_result)
+
+    if _not_modified(request, etag, stat_result.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        sendfile = _sendfile(fullpath, name)
+        if sendfile:
+            # front server handle Range itself
+            response = HttpResponse(content_type=content_type)
+            for header, value in sendfile.items():
+                response[header] = value
+        else:
+            response = _file_response(request, fullpath, stat_result.st_size,
+                                      content_type, etag)
+
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat_result.st_mtime)
+
+    if name.startswith(ContentAddressedStorage.BLOB_DIR + '/'):
+        patch_cache_control(response, private=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+def _file_response(request, fullpath, size, content_type, etag):
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */%s' % size
+        return response
+
+    # If-Range with other validator, whole file
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range != etag:
+        byte_range = None
+
+    f = open(fullpath, 'rb')
+    if byte_range is None:
+        response = FileResponse(f, content_type=content_type)
+    else:
+        start, end = byte_range
+        f.seek(start)
+        response = FileResponse(_read_range(f, end - start + 1), status=206,
+                                content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = 'bytes %s-%s/%s' % (start, end, size)
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _read_range(f, length, chunk_size=FileResponse.block_size):
+    try:
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
@@ -44,3 +44,56 @@ class ModelDiffMixin(object):
     def _dict(self):
         return model_to_dict(self, fields=[field.name for field in
                              self._meta.fields])
+
+
+# loaded value not known, field was deferred
+DEFERRED = object()
+
+
+class TrackedFieldsMixin(object):
+    """
+    Keep value loaded from database only for `tracked_fields`,
+    in a tuple, so status change hook can check `has_changed('status')`
+    without copy of the whole row on every instance.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def _tracked_attnames(cls):
+        attnames = cls.__dict__.get('_tracked_attnames_cache')
+        if attnames is None:
+            attnames = tuple(cls._meta.get_field(name).attname
+                             for name in cls.tracked_fields)
+            cls._tracked_attnames_cache = attnames
+        return attnames
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._set_tracked_values()
+        return instance
+
+    def _set_tracked_values(self):
+        self._tracked_values = tuple(self.__dict__.get(attname, DEFERRED)
+                                     for attname in self._tracked_attnames())
+
+    def loaded_value(self, field_name):
+        """Value when loaded or last saved, DEFERRED if unknown"""
+        tracked_values = getattr(self, '_tracked_values', None)
+        if tracked_values is None:
+            return DEFERRED
+        return tracked_values[self.tracked_fields.index(field_name)]
+
+    def has_changed(self, field_name):
+        if self._state.adding:
+            return True
+
+        attname = self._tracked_attnames()[self.tracked_fields.index(field_name)]
+        if attname not in self.__dict__:
+            # still deferred, never touched
+            return False
+        return self.loaded_value(field_name) != self.__dict__[attname]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._set_tracked_values()
@@ -33,3 +33,18 @@ class ViewSetDestroyObjMixin(ViewSet):
             raise NotAcceptable(detail=' '.join(e))
         return Response({'detail': _("Delete success!")},
                         status=response_status.HTTP_200_OK)
+
+
+class ThrottleActionMixin:
+    """
+    Throttle by `action`, ie:
+        throttle_action = {'create': [IPRedisThrottle]}
+        throttle_scope_action = {'create': 'securecode'}
+    """
+    throttle_action = {}
+
+    def get_throttles(self):
+        try:
+            return [throttle() for throttle in self.throttle_action[self.action]]
+        except KeyError:
+            return super().get_throttles()
@@ -0,0 +1,136 @@
+import time
+import hashlib
+import logging
+
+import redis
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+from utils.cache import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_KEY = 'throttle:{}:{}:{}:{}'
+REJECTED_KEY = 'throttle:rejected:{}'
+REJECTED_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def record_rejection(scope, kind):
+    """Count rejected request per day, ie: HGETALL throttle:rejected:20210101"""
+    key = REJECTED_KEY.format(time.strftime('%Y%m%d'))
+    try:
+        pipe = get_redis_connection().pipeline(transaction=False)
+        pipe.hincrby(key, '{}.{}'.format(scope, kind), 1)
+        pipe.expire(key, REJECTED_TIMEOUT)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+    logger.warning('Throttled %s by %s', scope, kind)
+
+
+class BaseRedisThrottle(BaseThrottle):
+    """
+    Sliding window counter on redis, two fixed window counter
+    weighted by elapsed time. One round trip for each request.
+
+    Scope taken from view `throttle_scope_action` by action,
+    fallback to view `throttle_scope`. Rate read from
+    DEFAULT_THROTTLE_RATES with key `<scope>.<kind>` or `<scope>`.
+    """
+    kind = None
+    parse_rate = SimpleRateThrottle.parse_rate
+
+    def __init__(self):
+        self.duration = None
+        self.elapsed = None
+
+    def get_scope(self, view):
+        scopes = getattr(view, 'throttle_scope_action', {})
+        return scopes.get(getattr(view, 'action', None),
+                          getattr(view, 'throttle_scope', None))
+
+    def get_rate(self, scope):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        return rates.get('{}.{}'.format(scope, self.kind), rates.get(scope))
+
+    def get_ident_value(self, request, view):
+        raise NotImplementedError('.get_ident_value() must be overridden')
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = self.get_rate(scope) if scope else None
+        if rate is None:
+            return True
+
+        ident = self.get_ident_value(request, view)
+        if ident is None:
+            return True
+
+        num_requests, self.duration = self.parse_rate(rate)
+        now = time.time()
+        window = int(now // self.duration)
+        self.elapsed = now - (window * self.duration)
+
+        current_key = THROTTLE_KEY.format(scope, self.kind, ident, window)
+        previous_key = THROTTLE_KEY.format(scope, self.kind, ident, window - 1)
+
+        try:
+            pipe = get_redis_connection().pipeline(transaction=True)
+            pipe.incr(current_key)
+            pipe.expire(current_key, self.duration * 2)
+            pipe.get(previous_key)
+            current, _expire, previous = pipe.execute()
+        except redis.RedisError as e:
+            # don't block user when redis down
+            logger.error('Throttle unavailable: %s', e)
+            return True
+
+        weight = (self.duration - self.elapsed) / self.duration
+        estimated = int(previous or 0) * weight + current
+
+        if estimated > num_requests:
+            record_rejection(scope, self.kind)
+            return False
+        return True
+
+    def wait(self):
+        if self.duration is None:
+            return None
+        return self.duration - self.elapsed
+
+
+class UserRedisThrottle(BaseRedisThrottle):
+    """Limit per authenticated user, anonymous limited by IP"""
+    kind = 'user'
+
+    def get_ident_value(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+
+class IPRedisThrottle(BaseRedisThrottle):
+    kind = 'ip'
+
+    def get_ident_value(self, request, view):
+        return self.get_ident(request)
+
+
+class IdentifierRedisThrottle(BaseRedisThrottle):
+    """
+    Limit per target identifier in payload, ie: email or msisdn,
+    so single account can't be flooded from many IP
+    """
+    kind = 'identifier'
+    identifier_fields = ('email', 'msisdn', 'credential', 'username',)
+
+    def get_ident_value(self, request, view):
+        fields = getattr(view, 'throttle_identifier_fields', self.identifier_fields)
+        for field in fields:
+            value = request.data.get(field)
+            if value and isinstance(value, str):
+                value = value.strip().lower().encode('utf-8')
+                return hashlib.sha1(value).hexdigest()
+        return None